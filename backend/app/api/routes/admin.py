@@ -12,10 +12,20 @@ router = APIRouter(dependencies=[Depends(require_role("controller", "admin"))])
 def trigger_seed(db: Session = Depends(get_db)) -> dict:
     # Import inside handler to avoid import at startup if file not present in some deployments
     from seed_train_data import seed_data
+    from app.services.rollups import rebuild
     seed_data()
+    # Seeded rows carry historical timestamps the incremental compactor would not revisit
+    rebuild(db)
     return {"ok": True}
 
 
+@router.post("/rollups/rebuild")
+def rebuild_rollups(db: Session = Depends(get_db)) -> dict:
+    # Recompute report rollups from raw rows, e.g. after a backfill older than the compactor's lateness window
+    from app.services.rollups import rebuild
+    return rebuild(db)
+
+
 @router.post("/simulate_quick")
 def simulate_quick() -> dict:
     # Run a quick synthetic scenario to generate positions/logs dynamics
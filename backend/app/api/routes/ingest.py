@@ -8,6 +8,8 @@ from datetime import datetime, timezone
 from .users import require_role
 from app.db.session import get_db
 from app.db.models import TrainPosition as TrainPositionModel, TrainSchedule as TrainScheduleModel
+from app.services.congestion import section_occupancy
+from app.services.twin import digital_twin
 
 router = APIRouter()
 
@@ -52,6 +54,10 @@ def ingest_positions(batch: List[TrainPosition], db: Session = Depends(get_db))
 	for r in rows:
 		db.add(r)
 	db.commit()
+	# Pull the digital twin towards the reported positions
+	digital_twin.observe((p.id, p.section_id, p.location_km, p.speed_kmph, p.timestamp) for p in batch)
+	# Stored rows are stamped at insert time; count them in the same minute
+	section_occupancy.record((p.section_id, p.id) for p in batch)
 	return {"received": len(batch)}
 
 
@@ -105,6 +111,9 @@ def get_schedules(db: Session = Depends(get_db)) -> List[dict]:
 
 @router.post("/batch")
 def ingest_batch(batch: IngestBatch) -> dict:
+	# Nothing here is stored, so these positions only steer the twin; section occupancy counts
+	# stored positions alone, matching its database seed and tail and the long-window fallback
+	digital_twin.observe((p.id, p.section_id, p.location_km, p.speed_kmph, p.timestamp) for p in batch.positions)
 	return {
 		"positions_received": len(batch.positions),
 		"schedules_received": len(batch.schedules),
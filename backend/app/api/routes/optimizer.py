@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional, Dict, Any
+import time
 
 
 from .users import require_role
@@ -11,11 +12,14 @@ router = APIRouter(dependencies=[Depends(require_role("controller", "admin"))])
 
 
 class OptimizeRequest(BaseModel):
+	# Backend tunables (milp_max_precedence, qubo_*, cpsat_*, hybrid_*) pass through as extra fields
+	model_config = ConfigDict(extra="allow")
+
 	section_id: str
 	lookahead_minutes: int = 30
 	objectives: List[str] = ["throughput", "delay_min"]
 	constraints: Dict[str, Any] = {}
-	method: str = "heuristic"  # heuristic | qubo | milp | gnn | hybrid
+	method: str = "heuristic"  # heuristic | qubo | milp | cpsat | gnn | hybrid | rolling
 
 
 class Recommendation(BaseModel):
@@ -31,6 +35,23 @@ class OptimizeResponse(BaseModel):
 	recommendations: List[Recommendation]
 	explanations: List[str] = []
 	latency_ms: int
+	solver: Optional[Dict[str, Any]] = None
+
+
+class ScoreSectionsRequest(BaseModel):
+	section_ids: List[str] = []  # empty: every section with recent positions
+	lookahead_minutes: int = 30
+	gnn_top_k: int = 5
+
+
+class SectionScores(BaseModel):
+	recommendations: List[Recommendation]
+	explanations: List[str] = []
+
+
+class ScoreSectionsResponse(BaseModel):
+	sections: Dict[str, SectionScores]
+	latency_ms: int
 
 
 @router.post("/optimize", response_model=OptimizeResponse)
@@ -53,6 +74,23 @@ def optimize(req: OptimizeRequest, db: Session = Depends(get_db)) -> OptimizeRes
 		recommendations=recs,
 		explanations=result.get("explanations", []),
 		latency_ms=5,
+		solver=result.get("solver"),
 	)
 
 
+
+
+@router.post("/score_sections", response_model=ScoreSectionsResponse)
+def score_sections(req: ScoreSectionsRequest, db: Session = Depends(get_db)) -> ScoreSectionsResponse:
+	from app.services.optimizer import optimizer_service
+
+	started = time.perf_counter()
+	result = optimizer_service.score_sections(req.model_dump(), db)
+	sections = {
+		section_id: SectionScores(
+			recommendations=[Recommendation(**r) for r in res.get("recommendations", [])],
+			explanations=res.get("explanations", []),
+		)
+		for section_id, res in result.items()
+	}
+	return ScoreSectionsResponse(sections=sections, latency_ms=int((time.perf_counter() - started) * 1000))
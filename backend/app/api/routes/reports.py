@@ -1,57 +1,85 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func, or_, select
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 from .users import require_role
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.db.session import get_db
-from app.db.models import TrainPosition, TrainSchedule, Train, TrainLog
+from app.db.models import DelaySketch, TrainSchedule, SectionRollup
+from app.services.congestion import section_occupancy
+from app.services.rollups import MINUTE, ensure_fresh, floor_hour, parse_bucket, window_filter
+from app.services.sketches import TDigest
 
 router = APIRouter(dependencies=[Depends(require_role("controller", "admin"))])
 
 
+# Shared by every client polling the dashboard; see get_kpis
+kpi_cache: TTLCache[dict] = TTLCache(settings.KPI_CACHE_TTL_SECONDS)
+
+
 @router.get("/kpis")
-def get_kpis(db: Session = Depends(get_db)) -> dict:
+def get_kpis(request: Request, db: Session = Depends(get_db)) -> Response:
+	"""KPIs computed at most once per KPI_CACHE_TTL_SECONDS however many clients poll.
+
+	Requests arriving during a recompute wait for it. Responses carry an
+	ETag and Cache-Control; a matching If-None-Match gets 304 with no body.
+	"""
+	cached = kpi_cache.get_or_compute("kpis", lambda: _compute_kpis(db))
+	headers = {"ETag": cached.etag, "Cache-Control": f"private, max-age={cached.max_age}"}
+	if_none_match = request.headers.get("if-none-match", "")
+	tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+	if "*" in tags or cached.etag in tags:
+		return Response(status_code=304, headers=headers)
+	return JSONResponse(cached.value, headers=headers)
+
+
+def _compute_kpis(db: Session) -> dict:
 	"""Compute KPIs from recent data instead of placeholders.
 
 	- throughput_per_hour: count of TrainPosition events in last 60 minutes
 	- avg_delay_minutes: average TrainLog.delay_minutes in last 24 hours
+	  (both read from section_rollups at minute precision)
 	- on_time_percentage: share of TrainSchedule items with delay_minutes <= 5 in last 24 hours
 	- congestion_index: peak number of distinct trains per section in last 30 minutes, normalized 0..1
 	"""
 	now = datetime.now(timezone.utc)
 	last_hour = now - timedelta(hours=1)
 	last_day = now - timedelta(hours=24)
-	last_30m = now - timedelta(minutes=30)
-
-	throughput_per_hour = int(
-		(db.query(TrainPosition.id).filter(TrainPosition.timestamp >= last_hour).count())
-	)
 
-	avg_delay_row = (
-		db.query(func.avg(TrainLog.delay_minutes))
-		.filter(TrainLog.timestamp >= last_day)
-		.filter(TrainLog.delay_minutes.isnot(None))
-		.scalar()
+	# One pass over the rollup rows of both windows; each sum only takes its own window's rows
+	# (the two windows pick different grains for the same minutes, so neither filter covers the other)
+	ensure_fresh(db)
+	in_hour, in_day = window_filter(last_hour, now), window_filter(last_day, now)
+	throughput_per_hour, delay_sum, delay_count = (
+		db.query(
+			func.sum(case((in_hour, SectionRollup.position_count), else_=0)),
+			func.sum(case((in_day, SectionRollup.delay_sum), else_=0)),
+			func.sum(case((in_day, SectionRollup.delay_count), else_=0)),
+		)
+		.filter(or_(in_hour, in_day))
+		.one()
 	)
-	avg_delay_minutes = float(avg_delay_row or 0.0)
-
-	# On-time percentage based on schedules updated in last day
-	total_sched = db.query(TrainSchedule.id).filter(
-		(TrainSchedule.actual_departure.isnot(None)) | (TrainSchedule.actual_arrival.isnot(None))
-	).count()
-	on_time_sched = db.query(TrainSchedule.id).filter(
-		((TrainSchedule.actual_departure.isnot(None)) | (TrainSchedule.actual_arrival.isnot(None)))
-	).filter((TrainSchedule.delay_minutes.is_(None)) | (TrainSchedule.delay_minutes <= 5)).count()
-	on_time_percentage = round((on_time_sched / total_sched) * 100.0, 1) if total_sched else 0.0
-
-	# Congestion index: for each section, count distinct trains in last 30 min; normalize by 10 trains
-	rows = (
-		db.query(TrainPosition.section_id, func.count(func.distinct(TrainPosition.train_id)))
-		.filter(TrainPosition.timestamp >= last_30m)
-		.group_by(TrainPosition.section_id)
-		.all()
+	throughput_per_hour = int(throughput_per_hour or 0)
+	avg_delay_minutes = float(delay_sum or 0.0) / delay_count if delay_count else 0.0
+
+	# On-time percentage over schedules that arrived or departed in the last day, in one pass
+	total_sched, on_time_sched = (
+		db.query(
+			func.count(TrainSchedule.id),
+			func.sum(case((or_(TrainSchedule.delay_minutes.is_(None), TrainSchedule.delay_minutes <= 5), 1), else_=0)),
+		)
+		.filter(or_(TrainSchedule.actual_departure >= last_day, TrainSchedule.actual_arrival >= last_day))
+		.one()
 	)
-	peak = max((int(c) for (_s, c) in rows), default=0)
+	on_time_percentage = round((int(on_time_sched or 0) / total_sched) * 100.0, 1) if total_sched else 0.0
+
+	# Congestion index: peak distinct trains in any section over the last 30 min, from the
+	# in-memory section counters; normalize by 10 trains
+	section_occupancy.refresh(db)
+	peak = max(section_occupancy.counts(30).values(), default=0)
 	congestion_index = round(min(1.0, peak / 10.0), 2)
 
 	return {
@@ -66,34 +94,27 @@ def get_kpis(db: Session = Depends(get_db)) -> dict:
 def delay_trends(hours: int = Query(24, ge=1, le=168), db: Session = Depends(get_db)) -> dict:
     now = datetime.now(timezone.utc)
     start = now - timedelta(hours=hours)
-    # Dialect-aware hourly bucketing (SQLite uses strftime; Postgres uses date_trunc)
-    dialect = db.bind.dialect.name if db.bind is not None else "sqlite"
-    if dialect == "postgresql":
-        bucket_col = func.date_trunc('hour', TrainPosition.timestamp).label('bucket')
-    else:
-        bucket_col = func.strftime('%Y-%m-%d %H:00', TrainPosition.timestamp).label('bucket')
-
-    hour_buckets = (
+    # Hourly average speed from the rollups; minute rows at the window edges fold into their hour
+    ensure_fresh(db)
+    rows = (
         db.query(
-            bucket_col,
-            func.avg(TrainPosition.speed_kmph).label('avg_speed'),
-            func.count().label('cnt'),
+            SectionRollup.bucket_start,
+            func.sum(SectionRollup.speed_sum).label('speed_sum'),
+            func.sum(SectionRollup.position_count).label('cnt'),
         )
-        .filter(TrainPosition.timestamp >= start)
-        .group_by(bucket_col)
-        .order_by(bucket_col)
+        .filter(window_filter(start, now))
+        .group_by(SectionRollup.bucket_start)
         .all()
     )
-
-    # Normalize bucket keys to a consistent hour string
-    def normalize_bucket(b: object) -> str:
-        if isinstance(b, datetime):
-            return b.replace(minute=0, second=0, microsecond=0, tzinfo=timezone.utc if b.tzinfo else None).strftime('%Y-%m-%d %H:00')
-        return str(b)
+    hour_totals: dict[str, list[float]] = {}
+    for row in rows:
+        totals = hour_totals.setdefault(parse_bucket(row.bucket_start, MINUTE).strftime('%Y-%m-%d %H:00'), [0.0, 0.0])
+        totals[0] += float(row.speed_sum or 0.0)
+        totals[1] += float(row.cnt or 0)
 
     labels: list[str] = []
     series: list[float] = []
-    bucket_to_speed = {normalize_bucket(row.bucket): float(row.avg_speed or 0.0) for row in hour_buckets}
+    bucket_to_speed = {key: speed_sum / cnt for key, (speed_sum, cnt) in hour_totals.items() if cnt}
 
     speeds = [v for v in bucket_to_speed.values() if v is not None]
     max_speed = max(speeds) if speeds else 1.0
@@ -113,11 +134,12 @@ def throughput(hours: int = Query(24, ge=1, le=168), db: Session = Depends(get_d
     now = datetime.now(timezone.utc)
     start = now - timedelta(hours=hours)
     # Throughput by train class based on position events in window
+    ensure_fresh(db)
     rows = (
-        db.query(Train.class_type, func.count(TrainPosition.id))
-        .join(Train, Train.id == TrainPosition.train_id, isouter=True)
-        .filter(TrainPosition.timestamp >= start)
-        .group_by(Train.class_type)
+        db.query(SectionRollup.class_type, func.sum(SectionRollup.position_count))
+        .filter(window_filter(start, now))
+        .group_by(SectionRollup.class_type)
+        .having(func.sum(SectionRollup.position_count) > 0)
         .all()
     )
     data = []
@@ -138,43 +160,27 @@ def throughput(hours: int = Query(24, ge=1, le=168), db: Session = Depends(get_d
 def hotspots(hours: int = Query(24, ge=1, le=168), top_sections: int = Query(4, ge=1, le=12), buckets: int = Query(5, ge=2, le=24), db: Session = Depends(get_db)) -> dict:
     now = datetime.now(timezone.utc)
     start = now - timedelta(hours=hours)
-    # Determine top sections by activity in window
-    section_counts = (
-        db.query(TrainPosition.section_id, func.count(TrainPosition.id).label('cnt'))
-        .filter(TrainPosition.timestamp >= start)
-        .group_by(TrainPosition.section_id)
-        .order_by(func.count(TrainPosition.id).desc())
-        .limit(top_sections)
+    bucket_seconds = hours * 3600.0 / buckets
+    # Section x rollup-bucket counts in one grouped query; an hour row lands in the bucket holding its start
+    ensure_fresh(db)
+    rows = (
+        db.query(SectionRollup.section_id, SectionRollup.bucket_start, func.sum(SectionRollup.position_count))
+        .filter(window_filter(start, now))
+        .group_by(SectionRollup.section_id, SectionRollup.bucket_start)
+        .having(func.sum(SectionRollup.position_count) > 0)
         .all()
     )
-    y_labels = [row.section_id for row in section_counts] or ["S1", "S2", "S3", "S4"]
-    # Time buckets within window
-    bucket_duration = hours / buckets
-    x_labels: list[str] = []
-    bucket_starts: list[datetime] = []
-    t = start
-    for i in range(buckets):
-        bucket_starts.append(t)
-        x_labels.append(t.strftime('%H:%M'))
-        t += timedelta(hours=bucket_duration)
+    counts: dict[str, list[int]] = {}
+    for section, bucket_start, cnt in rows:
+        elapsed = (parse_bucket(bucket_start, MINUTE) - start).total_seconds()
+        b = min(max(int(elapsed // bucket_seconds), 0), buckets - 1)
+        counts.setdefault(section, [0] * buckets)[b] += int(cnt)
+    top = sorted(counts, key=lambda sec: sum(counts[sec]), reverse=True)[:top_sections]
+    y_labels = top or ["S1", "S2", "S3", "S4"]
+
+    x_labels = [(start + timedelta(seconds=i * bucket_seconds)).strftime('%H:%M') for i in range(buckets)]
     x_labels[-1] = now.strftime('%H:%M')
-
-    # Initialize matrix
-    data_matrix: list[list[int]] = [[0 for _ in range(buckets)] for _ in range(len(y_labels))]
-
-    # For each section and bucket, count events
-    for s_idx, section in enumerate(y_labels):
-        for b_idx in range(buckets):
-            b_start = bucket_starts[b_idx]
-            b_end = bucket_starts[b_idx + 1] if b_idx + 1 < buckets else now
-            cnt = (
-                db.query(func.count(TrainPosition.id))
-                .filter(TrainPosition.section_id == section)
-                .filter(TrainPosition.timestamp >= b_start)
-                .filter(TrainPosition.timestamp < b_end)
-                .scalar()
-            )
-            data_matrix[s_idx][b_idx] = int(cnt or 0)
+    data_matrix: list[list[int]] = [counts.get(section, [0] * buckets) for section in y_labels]
 
     # Fallback demo grid if no data
     if all(all(v == 0 for v in row) for row in data_matrix):
@@ -189,3 +195,34 @@ def hotspots(hours: int = Query(24, ge=1, le=168), top_sections: int = Query(4,
 
     return {"xLabels": x_labels, "yLabels": y_labels, "data": data_matrix}
 
+
+
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+@router.get("/delay_percentiles")
+def delay_percentiles(
+    hours: int = Query(24, ge=1, le=168),
+    section_id: Optional[str] = Query(None, description="Limit to one section"),
+    db: Session = Depends(get_db),
+) -> dict:
+    now = datetime.now(timezone.utc)
+    start = floor_hour(now - timedelta(hours=hours))
+    # Merge the hourly per-section t-digests; memory stays constant however long the window
+    ensure_fresh(db)
+    query = select(DelaySketch.section_id, DelaySketch.digest).where(DelaySketch.hour_start >= start)
+    if section_id is not None:
+        query = query.where(DelaySketch.section_id == section_id)
+    overall = TDigest()
+    sections: dict[str, TDigest] = {}
+    for sec, payload in db.execute(query.execution_options(yield_per=1000)):
+        digest = TDigest.from_bytes(payload)
+        sections.setdefault(sec, TDigest()).merge(digest)
+        overall.merge(digest)
+
+    def summary(digest: TDigest) -> dict:
+        return {"count": int(digest.count), **{name: digest.quantile(q) for name, q in PERCENTILES.items()}}
+
+    rows = [{"section_id": sec, **summary(digest)} for sec, digest in sections.items()]
+    rows.sort(key=lambda r: r["p95"], reverse=True)
+    return {"start": start.isoformat(), "end": now.isoformat(), "overall": summary(overall), "sections": rows}
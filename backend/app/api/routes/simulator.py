@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel
-from typing import List, Optional, Literal
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Literal
+from sqlalchemy.orm import Session
 
 
 from .users import require_role
+from app.db.session import get_db
 
 router = APIRouter(dependencies=[Depends(require_role("controller", "admin"))])
 
@@ -11,6 +13,7 @@ router = APIRouter(dependencies=[Depends(require_role("controller", "admin"))])
 class Disruption(BaseModel):
 	type: Literal["delay", "track_block", "platform_issue", "rolling_stock", "signal_failure"]
 	description: Optional[str] = None
+	# Epoch seconds; values below 1e9 are read as seconds from now
 	start_ts: float
 	duration_seconds: int
 	section_id: Optional[str] = None
@@ -21,6 +24,10 @@ class Disruption(BaseModel):
 class Scenario(BaseModel):
 	name: str
 	disruptions: List[Disruption]
+	# Monte Carlo replications; results then carry a distribution across them
+	replications: int = Field(1, ge=1, le=10000)
+	# Defaults to a hash of the disruptions, so repeated runs of a what-if agree
+	seed: Optional[int] = None
 
 
 class TimelineEvent(BaseModel):
@@ -48,11 +55,42 @@ class Metrics(BaseModel):
 	passenger_delay_hours: float
 
 
+class MetricStats(BaseModel):
+	mean: float
+	p50: float
+	p90: float
+	p99: float
+
+
+class TrainDelayStats(MetricStats):
+	train_id: str
+
+
+class Distribution(BaseModel):
+	replications: int
+	seed: int
+	representative_replication: int
+	total_delay_minutes: MetricStats
+	missed_connections: MetricStats
+	train_delays: List[TrainDelayStats]
+
+
+class LiveStateSummary(BaseModel):
+	# Epoch seconds the live state was captured at
+	taken_at: float
+	delayed_trains: int
+	mean_delay_minutes: float
+	occupied_platforms: int
+
+
 class SimulationResult(BaseModel):
 	id: str
 	impacted_trains: List[str]
 	metrics: Metrics
 	predictions: Predictions
+	distribution: Optional[Distribution] = None
+	# Live state the run started from
+	live_state: Optional[LiveStateSummary] = None
 
 
 class ApplyRequest(BaseModel):
@@ -65,18 +103,222 @@ class ApplyResponse(BaseModel):
 
 
 @router.post("/run", response_model=SimulationResult)
-def run_simulation(scenario: Scenario) -> SimulationResult:
+def run_simulation(scenario: Scenario, db: Session = Depends(get_db)) -> SimulationResult:
 	from app.services.simulator import simulator_service
 
-	res = simulator_service.run(scenario.model_dump())
+	res = simulator_service.run(scenario.model_dump(), db)
 	return SimulationResult(**res)
 
 
 @router.post("/apply", response_model=ApplyResponse)
-def apply_simulation_to_real(request: ApplyRequest) -> ApplyResponse:
+def apply_simulation_to_real(request: ApplyRequest, db: Session = Depends(get_db)) -> ApplyResponse:
 	from app.services.simulator import simulator_service
 
-	res = simulator_service.apply_to_real(request.simulation_id)
+	res = simulator_service.apply_to_real(request.simulation_id, db)
 	return ApplyResponse(**res)
 
 
+# Upper bound on severities x durations per sweep; each cell adds a column to the batched run
+MAX_SWEEP_CELLS = 500
+
+
+class DurationRange(BaseModel):
+	start: int = Field(5, ge=1)
+	stop: int = Field(120, ge=1)
+	step: int = Field(5, ge=1)
+
+
+class SweepAxes(BaseModel):
+	severities: List[Literal["low", "medium", "high"]] = ["low", "medium", "high"]
+	# Explicit minutes, or an inclusive start/stop/step range
+	durations_minutes: List[float] | DurationRange = DurationRange()
+
+
+class SweepRequest(BaseModel):
+	scenario: Scenario
+	axes: SweepAxes = SweepAxes()
+	# Disruption the axes apply to; all disruptions when omitted
+	disruption_index: Optional[int] = Field(None, ge=0)
+
+
+class SweepMetrics(BaseModel):
+	# Rows follow severities, columns follow durations_minutes
+	total_delay_minutes: List[List[float]]
+	missed_connections: List[List[int]]
+	platform_conflicts: List[List[int]]
+	throughput_impact_percent: List[List[float]]
+	passenger_delay_hours: List[List[float]]
+
+
+class SweepResult(BaseModel):
+	name: str
+	severities: List[str]
+	durations_minutes: List[float]
+	metrics: SweepMetrics
+	latency_ms: int
+
+
+@router.post("/sweep", response_model=SweepResult)
+def sweep_scenario(request: SweepRequest, db: Session = Depends(get_db)) -> SweepResult:
+	from app.services.simulator import simulator_service
+
+	durations = request.axes.durations_minutes
+	if isinstance(durations, DurationRange):
+		durations = [float(m) for m in range(durations.start, durations.stop + 1, durations.step)]
+	severities = list(dict.fromkeys(request.axes.severities))
+	if not severities or not durations:
+		raise HTTPException(status_code=400, detail="Sweep axes must not be empty")
+	if any(m <= 0 for m in durations):
+		raise HTTPException(status_code=400, detail="Durations must be positive")
+	if len(severities) * len(durations) > MAX_SWEEP_CELLS:
+		raise HTTPException(status_code=400, detail=f"Sweep is limited to {MAX_SWEEP_CELLS} cells")
+	if request.disruption_index is not None and request.disruption_index >= len(request.scenario.disruptions):
+		raise HTTPException(status_code=400, detail="disruption_index out of range")
+
+	res = simulator_service.sweep(
+		request.scenario.model_dump(), severities, durations, request.disruption_index, db
+	)
+	return SweepResult(**res)
+
+
+# Upper bound on plans per evaluation, generated ones included
+MAX_EVALUATED_PLANS = 50
+
+
+class PlanAction(BaseModel):
+	train_id: str
+	action: str  # give_precedence | hold_for_clearance
+	eta_change_seconds: Optional[int] = None
+
+
+class CandidatePlan(BaseModel):
+	name: Optional[str] = None
+	# Optimizer recommendations pass through as-is; only the fields above are used
+	recommendations: List[PlanAction]
+
+
+class EvaluateRequest(BaseModel):
+	plans: List[CandidatePlan] = []
+	# Optimizer backends to generate a plan from for section_id (heuristic, milp, cpsat, qubo, gnn, hybrid, rolling)
+	methods: List[str] = []
+	section_id: Optional[str] = None
+	lookahead_minutes: int = 30
+	# Disruptions every plan is evaluated under; none means the live network as is
+	disruptions: List[Disruption] = []
+	seed: Optional[int] = None
+
+
+class PlanMetrics(BaseModel):
+	total_delay_minutes: float
+	missed_connections: int
+	platform_conflicts: int
+	# Departures made inside the simulation horizon
+	throughput_departures: int
+
+
+class PlanEvaluation(PlanMetrics):
+	name: str
+	rank: int
+	# Relative to taking no action (negative is better for delay)
+	delay_change_minutes: float
+	throughput_change: int
+	actions_applied: int
+	# Trains with no stop inside the horizon
+	skipped_trains: List[str]
+
+
+class EvaluateResponse(BaseModel):
+	plans: List[PlanEvaluation]
+	no_action: PlanMetrics
+	seed: int
+	live_state: LiveStateSummary
+	latency_ms: int
+
+
+@router.post("/evaluate", response_model=EvaluateResponse)
+def evaluate_plans(request: EvaluateRequest, db: Session = Depends(get_db)) -> EvaluateResponse:
+	from app.services.optimizer import optimizer_service
+	from app.services.simulator import simulator_service
+
+	if request.methods and not request.section_id:
+		raise HTTPException(status_code=400, detail="section_id is required to generate plans from methods")
+	plans = [p.model_dump() for p in request.plans]
+	for method in request.methods:
+		result = optimizer_service.optimize(
+			{"section_id": request.section_id, "lookahead_minutes": request.lookahead_minutes, "method": method}, db
+		)
+		plans.append({"name": method, "recommendations": result.get("recommendations", [])})
+	if not plans:
+		raise HTTPException(status_code=400, detail="Provide plans or methods to evaluate")
+	if len(plans) > MAX_EVALUATED_PLANS:
+		raise HTTPException(status_code=400, detail=f"At most {MAX_EVALUATED_PLANS} plans per evaluation")
+
+	res = simulator_service.evaluate_plans(
+		plans, [d.model_dump() for d in request.disruptions], request.seed, db
+	)
+	return EvaluateResponse(**res)
+
+
+class JobStatus(BaseModel):
+	id: str
+	name: Optional[str] = None
+	status: Literal["queued", "running", "completed", "failed", "cancelled"]
+	progress: float
+	replications: int
+	replications_done: int
+	# Running percentiles of the replications finished so far
+	partial: Optional[Dict[str, Any]] = None
+	# Stored simulation id once completed (GET /api/simulator/{result_id})
+	result_id: Optional[str] = None
+	error: Optional[str] = None
+	created_at: float
+	started_at: Optional[float] = None
+	finished_at: Optional[float] = None
+	version: int
+
+
+@router.post("/jobs", response_model=JobStatus, status_code=202)
+def submit_simulation_job(scenario: Scenario) -> JobStatus:
+	# Runs in the background; progress streams on /ws/simulator/jobs/{id}
+	from app.services.simulation.jobs import job_manager
+
+	return JobStatus(**job_manager.submit(scenario.model_dump()).snapshot())
+
+
+@router.get("/jobs", response_model=List[JobStatus])
+def list_simulation_jobs() -> List[JobStatus]:
+	from app.services.simulation.jobs import job_manager
+
+	return [JobStatus(**job.snapshot()) for job in job_manager.recent()]
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+def get_simulation_job(job_id: str) -> JobStatus:
+	from app.services.simulation.jobs import job_manager
+
+	job = job_manager.get(job_id)
+	if job is None:
+		raise HTTPException(status_code=404, detail="Job not found")
+	return JobStatus(**job.snapshot())
+
+
+@router.delete("/jobs/{job_id}", response_model=JobStatus)
+def cancel_simulation_job(job_id: str) -> JobStatus:
+	from app.services.simulation.jobs import job_manager
+
+	job = job_manager.cancel(job_id)
+	if job is None:
+		raise HTTPException(status_code=404, detail="Job not found")
+	return JobStatus(**job.snapshot())
+
+
+@router.get("/{simulation_id}", response_model=SimulationResult)
+def get_simulation(simulation_id: str, db: Session = Depends(get_db)) -> SimulationResult:
+	from app.services.simulator import simulator_service
+
+	res = simulator_service.get(simulation_id, db)
+	if res is None:
+		raise HTTPException(status_code=404, detail="Simulation not found")
+	return SimulationResult(**res)
+
+
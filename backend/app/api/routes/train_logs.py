@@ -1,16 +1,124 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case, cast, literal, select, tuple_, BigInteger, Integer, String
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
+from itertools import groupby
+from operator import itemgetter
+import base64
+import json
 from .users import require_role
-from app.db.session import get_db
-from app.db.models import TrainLog, TrainSchedule, Train, Station
+from app.db.session import engine, get_db
+from app.core.config import settings
+from app.db.models import TrainLog, TrainSchedule, TrainPosition, Train, Station
+from app.services.exports import parquet_available, stream_export
+from app.services.timeline import columnar, downsample
 
 # Temporarily remove authentication for testing
 # router = APIRouter(dependencies=[Depends(require_role("controller", "admin"))])
 router = APIRouter()
 
+# Exports stream, so they may reach further back than the paged endpoints
+EXPORT_MAX_HOURS = 24 * 365
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+MATCH_PATTERN = "^(exact|prefix|contains)$"
+
+
+def _text_filter(column, value: str, match: str):
+    """exact and prefix are served by b-tree indexes; contains scans (or uses pg_trgm on Postgres)"""
+    if match == "exact":
+        return column == value
+    if match == "prefix":
+        if engine.dialect.name == "postgresql":
+            # Served by the text_pattern_ops indexes from ensure_search_indexes
+            escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            return column.like(f"{escaped}%")
+        # SQLite compares text bytewise, so a prefix is a contiguous index range
+        return and_(column >= value, column < value + chr(0x10FFFF))
+    return column.ilike(f"%{value}%")
+
+
+def _sort_key(column):
+    # SQLite sorts and compares datetimes as their stored text, which need not be the
+    # format SQLAlchemy binds (server-default timestamps carry no microseconds), so
+    # cursors carry that text there and the datetime itself elsewhere
+    return cast(column, String) if engine.dialect.name == "sqlite" else column
+
+
+def _sort_value(column, value):
+    if value is None:
+        return None
+    if engine.dialect.name == "sqlite":
+        return literal(str(value), String)
+    return literal(datetime.fromisoformat(value), column.type)
+
+
+def _epoch_seconds(column):
+    # Whole epoch seconds computed by the database (NULL stays NULL)
+    if engine.dialect.name == "postgresql":
+        return cast(func.extract("epoch", column), BigInteger)
+    return cast(func.strftime("%s", column), Integer)
+
+
+def _encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _log_filters(
+    start_time: datetime,
+    train_id: Optional[str],
+    section_id: Optional[str],
+    station_id: Optional[str],
+    event_type: Optional[str],
+    match: str = "contains",
+) -> list:
+    filters = [TrainLog.timestamp >= start_time]
+    if train_id:
+        filters.append(_text_filter(TrainLog.train_id, train_id, match))
+    if section_id:
+        filters.append(_text_filter(TrainLog.section_id, section_id, match))
+    if station_id:
+        filters.append(_text_filter(TrainLog.station_id, station_id, match))
+    if event_type:
+        filters.append(TrainLog.event_type == event_type)
+    return filters
+
+
+def _schedule_filters(
+    start_time: datetime,
+    train_id: Optional[str],
+    station_id: Optional[str],
+    status: Optional[str],
+    match: str = "contains",
+) -> list:
+    filters = [
+        or_(
+            TrainSchedule.planned_arrival >= start_time,
+            TrainSchedule.actual_arrival >= start_time
+        )
+    ]
+    if train_id:
+        filters.append(_text_filter(TrainSchedule.train_id, train_id, match))
+    if station_id:
+        filters.append(_text_filter(TrainSchedule.station_id, station_id, match))
+    if status:
+        filters.append(TrainSchedule.status == status)
+    return filters
+
 
 @router.get("/logs")
 def get_train_logs(
@@ -20,24 +128,24 @@ def get_train_logs(
     event_type: Optional[str] = Query(None, description="Filter by event type"),
     hours: int = Query(24, ge=1, le=168, description="Hours to look back"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records"),
+    match: str = Query("contains", pattern=MATCH_PATTERN, description="How the ID filters match"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     db: Session = Depends(get_db)
 ) -> dict:
-    """Get train logs with filtering options"""
+    """Get train logs with filtering options, newest first, in keyset pages on (timestamp, id)"""
     now = datetime.now(timezone.utc)
     start_time = now - timedelta(hours=hours)
     
-    query = db.query(TrainLog).filter(TrainLog.timestamp >= start_time)
-    
-    if train_id:
-        query = query.filter(TrainLog.train_id.ilike(f"%{train_id}%"))
-    if section_id:
-        query = query.filter(TrainLog.section_id.ilike(f"%{section_id}%"))
-    if station_id:
-        query = query.filter(TrainLog.station_id.ilike(f"%{station_id}%"))
-    if event_type:
-        query = query.filter(TrainLog.event_type == event_type)
+    query = db.query(TrainLog, _sort_key(TrainLog.timestamp)).filter(
+        *_log_filters(start_time, train_id, section_id, station_id, event_type, match)
+    )
+    if cursor:
+        after_ts, after_id = _decode_cursor(cursor, 2)
+        query = query.filter(tuple_(TrainLog.timestamp, TrainLog.id) < tuple_(_sort_value(TrainLog.timestamp, after_ts), after_id))
     
-    logs = query.order_by(TrainLog.timestamp.desc()).limit(limit).all()
+    rows = query.order_by(TrainLog.timestamp.desc(), TrainLog.id.desc()).limit(limit + 1).all()
+    next_cursor = _encode_cursor(rows[limit - 1][1], rows[limit - 1][0].id) if len(rows) > limit else None
+    logs = [log for log, _key in rows[:limit]]
     
     return {
         "logs": [
@@ -57,7 +165,8 @@ def get_train_logs(
             }
             for log in logs
         ],
-        "total": len(logs)
+        "total": len(logs),
+        "next_cursor": next_cursor
     }
 
 
@@ -68,27 +177,31 @@ def get_train_schedules(
     status: Optional[str] = Query(None, description="Filter by status"),
     hours: int = Query(24, ge=1, le=168, description="Hours to look back"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records"),
+    match: str = Query("contains", pattern=MATCH_PATTERN, description="How the ID filters match"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     db: Session = Depends(get_db)
 ) -> dict:
-    """Get train schedules with actual vs planned times"""
+    """Get train schedules with actual vs planned times, in keyset pages on (planned_arrival, id)"""
     now = datetime.now(timezone.utc)
     start_time = now - timedelta(hours=hours)
     
-    query = db.query(TrainSchedule).filter(
-        or_(
-            TrainSchedule.planned_arrival >= start_time,
-            TrainSchedule.actual_arrival >= start_time
-        )
+    query = db.query(TrainSchedule, _sort_key(TrainSchedule.planned_arrival)).filter(
+        *_schedule_filters(start_time, train_id, station_id, status, match)
     )
+    if cursor:
+        after_ts, after_id = _decode_cursor(cursor, 2)
+        if after_ts is None:
+            # Already in the trailing rows without a planned arrival
+            query = query.filter(TrainSchedule.planned_arrival.is_(None), TrainSchedule.id < after_id)
+        else:
+            query = query.filter(or_(
+                tuple_(TrainSchedule.planned_arrival, TrainSchedule.id) < tuple_(_sort_value(TrainSchedule.planned_arrival, after_ts), after_id),
+                TrainSchedule.planned_arrival.is_(None)
+            ))
     
-    if train_id:
-        query = query.filter(TrainSchedule.train_id.ilike(f"%{train_id}%"))
-    if station_id:
-        query = query.filter(TrainSchedule.station_id.ilike(f"%{station_id}%"))
-    if status:
-        query = query.filter(TrainSchedule.status == status)
-    
-    schedules = query.order_by(TrainSchedule.planned_arrival.desc()).limit(limit).all()
+    rows = query.order_by(TrainSchedule.planned_arrival.desc().nulls_last(), TrainSchedule.id.desc()).limit(limit + 1).all()
+    next_cursor = _encode_cursor(rows[limit - 1][1], rows[limit - 1][0].id) if len(rows) > limit else None
+    schedules = [schedule for schedule, _key in rows[:limit]]
     
     return {
         "schedules": [
@@ -107,7 +220,8 @@ def get_train_schedules(
             }
             for schedule in schedules
         ],
-        "total": len(schedules)
+        "total": len(schedules),
+        "next_cursor": next_cursor
     }
 
 
@@ -116,59 +230,115 @@ def get_timeline_data(
     train_id: Optional[str] = Query(None, description="Filter by train ID"),
     section_id: Optional[str] = Query(None, description="Filter by section ID"),
     hours: int = Query(12, ge=1, le=168, description="Hours to look back"),
+    match: str = Query("contains", pattern=MATCH_PATTERN, description="How the ID filters match"),
+    limit: Optional[int] = Query(None, ge=1, le=10000, description="Movements per page; all when omitted"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    max_points: Optional[int] = Query(None, ge=2, le=10000, description="Most movements returned per train"),
+    resolution_seconds: Optional[int] = Query(None, ge=1, le=86400, description="At most one movement per train per interval, besides delay changes"),
+    format: str = Query("rows", pattern="^(rows|columnar)$", description="rows: nested objects; columnar: parallel arrays"),
     db: Session = Depends(get_db)
-) -> dict:
-    """Get timeline data for Gantt-style visualization"""
+) -> ORJSONResponse:
+    """Get timeline data for Gantt-style visualization
+
+    Paged with ``limit`` in keyset order (train_id, timestamp, id); a train
+    can continue on the next page. ``max_points`` and ``resolution_seconds``
+    downsample each train on the server (per page when paging), keeping its
+    first and last movements and every change of delay. ``format=columnar``
+    returns parallel arrays with epoch-second times and dictionary-encoded
+    text columns.
+    """
     now = datetime.now(timezone.utc)
     start_time = now - timedelta(hours=hours)
     
-    # Get train movements with planned vs actual times
-    query = db.query(
+    # Get train movements with planned vs actual times; the columnar format takes epoch
+    # seconds straight from the database instead of parsing and converting datetimes
+    if format == "columnar":
+        time_columns = (_epoch_seconds(TrainLog.planned_time), _epoch_seconds(TrainLog.actual_time))
+    else:
+        time_columns = (TrainLog.planned_time, TrainLog.actual_time)
+    query = select(
         TrainLog.train_id,
         TrainLog.station_id,
         TrainLog.section_id,
         TrainLog.event_type,
-        TrainLog.planned_time,
-        TrainLog.actual_time,
+        *time_columns,
         TrainLog.delay_minutes,
         TrainLog.status,
-        TrainLog.platform
-    ).filter(
+        TrainLog.platform,
+        _epoch_seconds(func.coalesce(TrainLog.actual_time, TrainLog.planned_time)).label("event_s"),
+        TrainLog.id,
+        _sort_key(TrainLog.timestamp).label("sort_ts")
+    ).where(
         TrainLog.timestamp >= start_time
     )
     
     if train_id:
-        query = query.filter(TrainLog.train_id.ilike(f"%{train_id}%"))
+        query = query.where(_text_filter(TrainLog.train_id, train_id, match))
     if section_id:
-        query = query.filter(TrainLog.section_id.ilike(f"%{section_id}%"))
-    
-    movements = query.order_by(TrainLog.train_id, TrainLog.timestamp).all()
-    
-    # Group by train for timeline visualization
-    timeline_data = {}
-    for movement in movements:
-        train_id = movement.train_id
-        if train_id not in timeline_data:
-            timeline_data[train_id] = []
-        
-        timeline_data[train_id].append({
-            "station_id": movement.station_id,
-            "section_id": movement.section_id,
-            "event_type": movement.event_type,
-            "planned_time": movement.planned_time.isoformat() if movement.planned_time else None,
-            "actual_time": movement.actual_time.isoformat() if movement.actual_time else None,
-            "delay_minutes": movement.delay_minutes,
-            "status": movement.status,
-            "platform": movement.platform
+        query = query.where(_text_filter(TrainLog.section_id, section_id, match))
+    if cursor:
+        after_train, after_ts, after_id = _decode_cursor(cursor, 3)
+        query = query.where(
+            tuple_(TrainLog.train_id, TrainLog.timestamp, TrainLog.id)
+            > tuple_(after_train, _sort_value(TrainLog.timestamp, after_ts), after_id)
+        )
+    
+    query = query.order_by(TrainLog.train_id, TrainLog.timestamp, TrainLog.id)
+    # Plain Core rows: the ORM's per-row loading is a large share of the cost at this size
+    next_cursor = None
+    if limit is None:
+        movements = db.connection().execute(query).all()
+    else:
+        movements = db.connection().execute(query.limit(limit + 1)).all()
+        if len(movements) > limit:
+            last = movements[limit - 1]
+            next_cursor = _encode_cursor(last.train_id, last.sort_ts, last.id)
+            movements = movements[:limit]
+    
+    # Group by train for timeline visualization (rows arrive ordered by train)
+    by_train = {tid: list(rows) for tid, rows in groupby(movements, key=itemgetter(0))}
+    
+    points_in = len(movements)
+    if max_points or resolution_seconds:
+        # Per-train downsampling to what a chart can draw; delay changes always survive
+        for tid, rows in by_train.items():
+            keep = downsample([row.event_s for row in rows], [row.delay_minutes for row in rows], max_points, resolution_seconds)
+            by_train[tid] = [rows[i] for i in keep]
+    points_out = sum(len(rows) for rows in by_train.values())
+    
+    time_range = {"start": start_time.isoformat(), "end": now.isoformat()}
+    if format == "columnar":
+        return ORJSONResponse({
+            "format": "columnar",
+            **columnar(list(by_train), list(by_train.values())),
+            "points": {"in": points_in, "out": points_out},
+            "time_range": time_range,
+            "next_cursor": next_cursor,
         })
     
-    return {
-        "timeline": timeline_data,
-        "time_range": {
-            "start": start_time.isoformat(),
-            "end": now.isoformat()
-        }
+    timeline_data = {
+        tid: [
+            {
+                "station_id": row.station_id,
+                "section_id": row.section_id,
+                "event_type": row.event_type,
+                "planned_time": row.planned_time.isoformat() if row.planned_time else None,
+                "actual_time": row.actual_time.isoformat() if row.actual_time else None,
+                "delay_minutes": row.delay_minutes,
+                "status": row.status,
+                "platform": row.platform
+            }
+            for row in rows
+        ]
+        for tid, rows in by_train.items()
     }
+    
+    return ORJSONResponse({
+        "timeline": timeline_data,
+        "points": {"in": points_in, "out": points_out},
+        "time_range": time_range,
+        "next_cursor": next_cursor
+    })
 
 
 @router.get("/stats")
@@ -180,47 +350,26 @@ def get_log_stats(
     now = datetime.now(timezone.utc)
     start_time = now - timedelta(hours=hours)
     
-    # Total logs in time period
-    total_logs = db.query(func.count(TrainLog.id)).filter(
+    # Log counts and delay figures in one pass over the window
+    total_logs, delayed_trains, avg_delay = db.query(
+        func.count(TrainLog.id),
+        func.count(func.distinct(case((TrainLog.delay_minutes > 0, TrainLog.train_id)))),
+        func.avg(case((TrainLog.delay_minutes > 0, TrainLog.delay_minutes))),
+    ).filter(
         TrainLog.timestamp >= start_time
-    ).scalar()
-    
-    # Delayed trains
-    delayed_trains = db.query(func.count(func.distinct(TrainLog.train_id))).filter(
-        and_(
-            TrainLog.timestamp >= start_time,
-            TrainLog.delay_minutes > 0
-        )
-    ).scalar()
+    ).one()
     
-    # Average delay
-    avg_delay = db.query(func.avg(TrainLog.delay_minutes)).filter(
-        and_(
-            TrainLog.timestamp >= start_time,
-            TrainLog.delay_minutes > 0
-        )
-    ).scalar()
-    
-    # On-time percentage
-    total_schedules = db.query(func.count(TrainSchedule.id)).filter(
+    # On-time percentage, likewise one pass over the window's schedules
+    total_schedules, on_time_schedules = db.query(
+        func.count(TrainSchedule.id),
+        func.sum(case((or_(TrainSchedule.delay_minutes == 0, TrainSchedule.delay_minutes.is_(None)), 1), else_=0)),
+    ).filter(
         or_(
             TrainSchedule.planned_arrival >= start_time,
             TrainSchedule.actual_arrival >= start_time
         )
-    ).scalar()
-    
-    on_time_schedules = db.query(func.count(TrainSchedule.id)).filter(
-        and_(
-            or_(
-                TrainSchedule.planned_arrival >= start_time,
-                TrainSchedule.actual_arrival >= start_time
-            ),
-            or_(
-                TrainSchedule.delay_minutes == 0,
-                TrainSchedule.delay_minutes.is_(None)
-            )
-        )
-    ).scalar()
+    ).one()
+    on_time_schedules = on_time_schedules or 0
     
     on_time_percentage = (on_time_schedules / total_schedules * 100) if total_schedules > 0 else 0
     
@@ -231,3 +380,71 @@ def get_log_stats(
         "on_time_percentage": round(on_time_percentage, 1),
         "total_schedules": total_schedules or 0
     }
+
+
+def _export_response(query, name: str, fmt: str) -> StreamingResponse:
+    if fmt == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return StreamingResponse(
+        stream_export(query, fmt, settings.EXPORT_CHUNK_ROWS),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}-{stamp}.{fmt}"'},
+    )
+
+
+@router.get("/logs/export", dependencies=[Depends(require_role("controller", "admin"))])
+def export_train_logs(
+    train_id: Optional[str] = Query(None, description="Filter by train ID"),
+    section_id: Optional[str] = Query(None, description="Filter by section ID"),
+    station_id: Optional[str] = Query(None, description="Filter by station ID"),
+    event_type: Optional[str] = Query(None, description="Filter by event type"),
+    hours: int = Query(24, ge=1, le=EXPORT_MAX_HOURS, description="Hours to look back"),
+    match: str = Query("contains", pattern=MATCH_PATTERN, description="How the ID filters match"),
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+) -> StreamingResponse:
+    """Stream every matching train log as CSV or Parquet, in constant memory"""
+    start_time = datetime.now(timezone.utc) - timedelta(hours=hours)
+    query = (
+        select(*TrainLog.__table__.columns)
+        .where(*_log_filters(start_time, train_id, section_id, station_id, event_type, match))
+        .order_by(TrainLog.id)
+    )
+    return _export_response(query, "train_logs", format)
+
+
+@router.get("/schedules/export", dependencies=[Depends(require_role("controller", "admin"))])
+def export_train_schedules(
+    train_id: Optional[str] = Query(None, description="Filter by train ID"),
+    station_id: Optional[str] = Query(None, description="Filter by station ID"),
+    status: Optional[str] = Query(None, description="Filter by status"),
+    hours: int = Query(24, ge=1, le=EXPORT_MAX_HOURS, description="Hours to look back"),
+    match: str = Query("contains", pattern=MATCH_PATTERN, description="How the ID filters match"),
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+) -> StreamingResponse:
+    """Stream every matching schedule row as CSV or Parquet, in constant memory"""
+    start_time = datetime.now(timezone.utc) - timedelta(hours=hours)
+    query = (
+        select(*TrainSchedule.__table__.columns)
+        .where(*_schedule_filters(start_time, train_id, station_id, status, match))
+        .order_by(TrainSchedule.id)
+    )
+    return _export_response(query, "train_schedules", format)
+
+
+@router.get("/positions/export", dependencies=[Depends(require_role("controller", "admin"))])
+def export_train_positions(
+    train_id: Optional[str] = Query(None, description="Filter by train ID"),
+    section_id: Optional[str] = Query(None, description="Filter by section ID"),
+    hours: int = Query(24, ge=1, le=EXPORT_MAX_HOURS, description="Hours to look back"),
+    match: str = Query("contains", pattern=MATCH_PATTERN, description="How the ID filters match"),
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+) -> StreamingResponse:
+    """Stream every matching position report as CSV or Parquet, in constant memory"""
+    start_time = datetime.now(timezone.utc) - timedelta(hours=hours)
+    query = select(*TrainPosition.__table__.columns).where(TrainPosition.timestamp >= start_time)
+    if train_id:
+        query = query.where(_text_filter(TrainPosition.train_id, train_id, match))
+    if section_id:
+        query = query.where(_text_filter(TrainPosition.section_id, section_id, match))
+    return _export_response(query.order_by(TrainPosition.id), "train_positions", format)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+from typing import Dict, List
+
+
+from .users import require_role
+from app.services.twin import digital_twin
+
+router = APIRouter(dependencies=[Depends(require_role("controller", "admin"))])
+
+
+class TwinFrame(BaseModel):
+	type: str
+	ts: float
+	# Parallel columns, one entry per live train
+	train_id: List[str]
+	section_id: List[str]
+	location_km: List[float]
+	speed_kmph: List[float]
+
+
+class SpeedRestriction(BaseModel):
+	max_speed_kmph: float = Field(..., gt=0)
+
+
+@router.get("/state", response_model=TwinFrame)
+def get_twin_state() -> TwinFrame:
+	# Latest interpolated positions; the same frame streams on /ws/twin every tick
+	return TwinFrame(**digital_twin.frame())
+
+
+@router.get("/restrictions", response_model=Dict[str, float])
+def list_speed_restrictions() -> Dict[str, float]:
+	return digital_twin.speed_restrictions()
+
+
+@router.put("/restrictions/{section_id}", response_model=Dict[str, float])
+def set_speed_restriction(section_id: str, restriction: SpeedRestriction) -> Dict[str, float]:
+	digital_twin.set_speed_restriction(section_id, restriction.max_speed_kmph)
+	return digital_twin.speed_restrictions()
+
+
+@router.delete("/restrictions/{section_id}", response_model=Dict[str, float])
+def clear_speed_restriction(section_id: str) -> Dict[str, float]:
+	digital_twin.set_speed_restriction(section_id, None)
+	return digital_twin.speed_restrictions()
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from typing import Set
+import asyncio
+import json
 
 
 router = APIRouter()
@@ -25,6 +27,16 @@ class ConnectionManager:
 
 
 manager = ConnectionManager()
+# Digital twin frames go to their own channel so /ws/live clients are not flooded
+twin_manager = ConnectionManager()
+
+
+async def publish_twin_frame() -> None:
+	if not twin_manager.active_connections:
+		return
+	from app.services.twin import digital_twin
+
+	await twin_manager.broadcast(json.dumps(digital_twin.frame()))
 
 
 @router.websocket("/ws/live")
@@ -39,3 +51,38 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
 		manager.disconnect(websocket)
 
 
+@router.websocket("/ws/twin")
+async def twin_updates(websocket: WebSocket) -> None:
+	# Receives a column-oriented frame of interpolated train positions every twin tick
+	await twin_manager.connect(websocket)
+	try:
+		while True:
+			await websocket.receive_text()
+	except WebSocketDisconnect:
+		twin_manager.disconnect(websocket)
+
+
+@router.websocket("/ws/simulator/jobs/{job_id}")
+async def simulation_job_updates(websocket: WebSocket, job_id: str) -> None:
+	# Streams the job snapshot whenever it changes; closes once the job has finished
+	from app.services.simulation.jobs import FINISHED, job_manager
+
+	await websocket.accept()
+	job = job_manager.get(job_id)
+	if job is None:
+		await websocket.send_json({"id": job_id, "error": "Job not found"})
+		await websocket.close(code=4404)
+		return
+	sent_version = -1
+	try:
+		while True:
+			snapshot = job.snapshot()
+			if snapshot["version"] != sent_version:
+				await websocket.send_json(snapshot)
+				sent_version = snapshot["version"]
+			if snapshot["status"] in FINISHED:
+				await websocket.close()
+				return
+			await asyncio.sleep(0.25)
+	except WebSocketDisconnect:
+		return
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, Hashable, TypeVar
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class CachedValue(Generic[T]):
+	value: T
+	etag: str
+	computed_at: float
+	expires_at: float
+
+	@property
+	def max_age(self) -> int:
+		return max(0, int(self.expires_at - time.monotonic()))
+
+
+class _Flight:
+	def __init__(self) -> None:
+		self.done = threading.Event()
+		self.result: CachedValue | None = None
+		self.error: BaseException | None = None
+
+
+def etag_of(value: Any) -> str:
+	"""Strong ETag of a JSON-serializable value"""
+	body = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+	return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+
+class TTLCache(Generic[T]):
+	"""Per-key values recomputed at most once per ``ttl_s``, with single-flight misses
+
+	The first caller to find a key missing or expired computes it; callers
+	arriving meanwhile wait for that computation and share its result (or
+	its exception) instead of starting their own.
+	"""
+
+	def __init__(self, ttl_s: float) -> None:
+		self.ttl_s = ttl_s
+		self._lock = threading.Lock()
+		self._entries: Dict[Hashable, CachedValue[T]] = {}
+		self._flights: Dict[Hashable, _Flight] = {}
+
+	def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> CachedValue[T]:
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and entry.expires_at > time.monotonic():
+				return entry
+			flight = self._flights.get(key)
+			leader = flight is None
+			if leader:
+				flight = self._flights[key] = _Flight()
+		if not leader:
+			flight.done.wait()
+			if flight.error is not None:
+				raise flight.error
+			return flight.result
+		try:
+			value = compute()
+			now = time.monotonic()
+			flight.result = CachedValue(value=value, etag=etag_of(value), computed_at=time.time(), expires_at=now + self.ttl_s)
+			with self._lock:
+				self._entries[key] = flight.result
+			return flight.result
+		except BaseException as e:
+			flight.error = e
+			raise
+		finally:
+			with self._lock:
+				self._flights.pop(key, None)
+			flight.done.set()
+
+	def invalidate(self, key: Hashable | None = None) -> None:
+		with self._lock:
+			if key is None:
+				self._entries.clear()
+			else:
+				self._entries.pop(key, None)
@@ -27,6 +27,52 @@ class Settings:
 
 	SQLALCHEMY_ECHO: bool = os.getenv("SQLALCHEMY_ECHO", "false").lower() == "true"
 
+	# Shared process pool for CPU-bound work (0 = one worker per core)
+	WORKER_POOL_SIZE: int = int(os.getenv("WORKER_POOL_SIZE", "0"))
+	# Start the pool's workers at startup so the first ensemble race is not spent importing solvers
+	WORKER_POOL_PREWARM: bool = os.getenv("WORKER_POOL_PREWARM", "true").lower() == "true"
+
+	# Simulator reuses the loaded timetable and live-state snapshot (and its baseline run) for this long
+	SIM_NETWORK_TTL_SECONDS: int = int(os.getenv("SIM_NETWORK_TTL_SECONDS", "60"))
+	# Positions and train logs newer than this count as the network's live state
+	SIM_LIVE_WINDOW_MINUTES: int = int(os.getenv("SIM_LIVE_WINDOW_MINUTES", "30"))
+	# Simulation results kept decoded in memory, and how long an identical scenario is served from the store
+	SIM_RESULT_LRU_SIZE: int = int(os.getenv("SIM_RESULT_LRU_SIZE", "128"))
+	SIM_RESULT_CACHE_TTL_SECONDS: int = int(os.getenv("SIM_RESULT_CACHE_TTL_SECONDS", "300"))
+	# Background simulation jobs running at once; further submissions queue
+	SIM_MAX_CONCURRENT_JOBS: int = int(os.getenv("SIM_MAX_CONCURRENT_JOBS", "2"))
+
+	# Digital twin: loop period, and how long a train without position reports keeps being modelled
+	TWIN_ENABLED: bool = os.getenv("TWIN_ENABLED", "true").lower() == "true"
+	TWIN_TICK_SECONDS: float = float(os.getenv("TWIN_TICK_SECONDS", "1.0"))
+	TWIN_STALE_SECONDS: int = int(os.getenv("TWIN_STALE_SECONDS", "300"))
+
+	# Report rollups: compactor period, how late raw rows may arrive, how long rollups are kept,
+	# and how stale they may be before a report request compacts inline
+	ROLLUP_INTERVAL_SECONDS: int = int(os.getenv("ROLLUP_INTERVAL_SECONDS", "30"))
+	ROLLUP_LATENESS_SECONDS: int = int(os.getenv("ROLLUP_LATENESS_SECONDS", "120"))
+	ROLLUP_RETENTION_HOURS: int = int(os.getenv("ROLLUP_RETENTION_HOURS", "192"))
+	ROLLUP_MAX_LAG_SECONDS: int = int(os.getenv("ROLLUP_MAX_LAG_SECONDS", "60"))
+
+	# Dashboard KPIs are recomputed at most this often, shared by every polling client
+	KPI_CACHE_TTL_SECONDS: int = int(os.getenv("KPI_CACHE_TTL_SECONDS", "15"))
+
+	# Section congestion counters: longest window answered from memory, and how often
+	# readers pull positions written by other processes from the database
+	CONGESTION_WHEEL_MINUTES: int = int(os.getenv("CONGESTION_WHEEL_MINUTES", "180"))
+	CONGESTION_TAIL_SECONDS: float = float(os.getenv("CONGESTION_TAIL_SECONDS", "5"))
+
+	# Rows fetched per round trip by streaming exports, and rows per Parquet row group
+	EXPORT_CHUNK_ROWS: int = int(os.getenv("EXPORT_CHUNK_ROWS", "10000"))
+
+	# Postgres: build pg_trgm indexes so substring filters on ids are index-assisted
+	PG_TRIGRAM_SEARCH: bool = os.getenv("PG_TRIGRAM_SEARCH", "true").lower() == "true"
+
+	# Intra-op threads for GNN scoring; kept low so inference does not compete with web workers
+	GNN_NUM_THREADS: int = int(os.getenv("GNN_NUM_THREADS", "1"))
+	# TorchScript scorer exported by train_gnn.py; fixed weights are used when absent
+	GNN_MODEL_PATH: str = os.getenv("GNN_MODEL_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "gnn_scorer.pt"))
+
 	@property
 	def sync_database_uri(self) -> str:
 		# Prefer a provided DATABASE_URL when not using sqlite
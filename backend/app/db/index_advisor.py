@@ -0,0 +1,234 @@
+"""Index advisor: EXPLAIN the app's hot query shapes and flag table scans.
+
+Run from backend/ against the configured database:
+
+	python -m app.db.index_advisor            # report
+	python -m app.db.index_advisor --apply    # create missing model indexes first
+	python -m app.db.index_advisor --strict   # exit status 1 if any hot query scans a table
+
+SQLite plans come from EXPLAIN QUERY PLAN, Postgres plans from EXPLAIN
+(FORMAT JSON). Postgres legitimately prefers sequential scans on small or
+unanalyzed tables, so its findings carry the planner's row estimate.
+"""
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import String, func, literal, or_, select, tuple_
+from sqlalchemy.engine import Engine
+
+from app.db.models import Base, DelaySketch, SectionRollup, Station, TrainLog, TrainPosition, TrainSchedule
+from app.db.session import engine as default_engine, ensure_indexes, ensure_search_indexes
+
+
+@dataclass
+class HotQuery:
+	name: str
+	source: str  # where the app issues this shape
+	build: Callable[[datetime], Any]
+
+
+@dataclass
+class Finding:
+	query: HotQuery
+	plan: List[str]
+	scans: List[str] = field(default_factory=list)
+	sorts: List[str] = field(default_factory=list)
+
+
+def _ts(value: datetime) -> Any:
+	# Rendered as a plain literal so the statement can be EXPLAINed without bind processing
+	return literal(value.strftime("%Y-%m-%d %H:%M:%S"), String)
+
+
+HOT_QUERIES: List[HotQuery] = [
+	HotQuery(
+		"positions by section and time", "services/optimizer.py _section_congestion, _section_locations",
+		lambda now: select(TrainPosition.train_id, TrainPosition.location_km)
+		.where(TrainPosition.section_id == "S1", TrainPosition.timestamp >= _ts(now - timedelta(minutes=30)))
+		.order_by(TrainPosition.timestamp),
+	),
+	HotQuery(
+		"positions by train and time", "train_logs positions export, per-train history",
+		lambda now: select(TrainPosition.section_id, TrainPosition.location_km)
+		.where(TrainPosition.train_id == "T0001", TrainPosition.timestamp >= _ts(now - timedelta(hours=1)))
+		.order_by(TrainPosition.timestamp),
+	),
+	HotQuery(
+		"latest position per train", "services/twin.py load",
+		lambda now: select(TrainPosition.train_id, func.max(TrainPosition.timestamp))
+		.where(TrainPosition.timestamp >= _ts(now - timedelta(minutes=30)))
+		.group_by(TrainPosition.train_id),
+	),
+	HotQuery(
+		"positions in a rollup window", "services/rollups.py _aggregate",
+		lambda now: select(TrainPosition.section_id, func.count(TrainPosition.id))
+		.where(TrainPosition.timestamp >= _ts(now - timedelta(hours=1)), TrainPosition.timestamp < _ts(now))
+		.group_by(TrainPosition.section_id),
+	),
+	HotQuery(
+		"log page", "api/routes/train_logs.py get_train_logs",
+		lambda now: select(TrainLog.id)
+		.where(TrainLog.timestamp >= _ts(now - timedelta(hours=24)))
+		.order_by(TrainLog.timestamp.desc(), TrainLog.id.desc())
+		.limit(100),
+	),
+	HotQuery(
+		"log page after a cursor, exact train", "api/routes/train_logs.py get_train_logs (match=exact)",
+		lambda now: select(TrainLog.id)
+		.where(
+			TrainLog.train_id == "T0001",
+			TrainLog.timestamp >= _ts(now - timedelta(hours=24)),
+			tuple_(TrainLog.timestamp, TrainLog.id) < tuple_(_ts(now - timedelta(hours=1)), 1000),
+		)
+		.order_by(TrainLog.timestamp.desc(), TrainLog.id.desc())
+		.limit(100),
+	),
+	HotQuery(
+		"logs by section and time", "api/routes/train_logs.py get_timeline_data (match=exact)",
+		lambda now: select(TrainLog.id)
+		.where(TrainLog.section_id == "S1", TrainLog.timestamp >= _ts(now - timedelta(hours=12)))
+		.order_by(TrainLog.timestamp),
+	),
+	HotQuery(
+		"platform departures", "services/optimizer.py _platform_usage",
+		lambda now: select(TrainSchedule.train_id, TrainSchedule.station_id, TrainSchedule.planned_platform, TrainSchedule.planned_departure)
+		.where(TrainSchedule.planned_departure >= _ts(now - timedelta(minutes=30))),
+	),
+	HotQuery(
+		"platform occupancy at a station", "platform conflicts per station and platform",
+		lambda now: select(TrainSchedule.train_id, TrainSchedule.planned_departure)
+		.where(
+			TrainSchedule.station_id == "ST001",
+			TrainSchedule.planned_platform == "P1",
+			TrainSchedule.planned_departure >= _ts(now),
+			TrainSchedule.planned_departure <= _ts(now + timedelta(hours=1)),
+		)
+		.order_by(TrainSchedule.planned_departure),
+	),
+	HotQuery(
+		"section departures", "services/optimizer.py _schedule_events",
+		lambda now: select(TrainSchedule.train_id, TrainSchedule.planned_departure)
+		.join(Station, Station.id == TrainSchedule.station_id)
+		.where(
+			Station.section_id == "S1",
+			TrainSchedule.planned_departure >= _ts(now),
+			TrainSchedule.planned_departure <= _ts(now + timedelta(minutes=30)),
+		)
+		.order_by(TrainSchedule.planned_departure),
+	),
+	HotQuery(
+		"timetable horizon", "services/simulation/network.py load_network",
+		lambda now: select(TrainSchedule.train_id, TrainSchedule.station_id)
+		.where(or_(
+			TrainSchedule.planned_arrival.between(_ts(now), _ts(now + timedelta(hours=2))),
+			TrainSchedule.planned_departure.between(_ts(now), _ts(now + timedelta(hours=2))),
+		)),
+	),
+	HotQuery(
+		"recent actual arrivals", "api/routes/reports.py _compute_kpis",
+		lambda now: select(func.count(TrainSchedule.id))
+		.where(or_(
+			TrainSchedule.actual_departure >= _ts(now - timedelta(hours=24)),
+			TrainSchedule.actual_arrival >= _ts(now - timedelta(hours=24)),
+		)),
+	),
+	HotQuery(
+		"rollup window", "services/rollups.py window_filter",
+		lambda now: select(func.sum(SectionRollup.position_count))
+		.where(
+			SectionRollup.grain == "hour",
+			SectionRollup.bucket_start >= _ts(now - timedelta(hours=24)),
+			SectionRollup.bucket_start < _ts(now),
+		),
+	),
+	HotQuery(
+		"delay sketch window", "api/routes/reports.py delay_percentiles",
+		lambda now: select(DelaySketch.section_id, DelaySketch.digest).where(DelaySketch.hour_start >= _ts(now - timedelta(hours=24))),
+	),
+]
+
+
+def _sqlite_plan(conn: Any, query: HotQuery, sql: str, tables: set) -> Finding:
+	finding = Finding(query=query, plan=[])
+	for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all():
+		detail = str(row[-1])
+		finding.plan.append(detail)
+		words = detail.split()
+		# "SCAN t" reads the whole table; "SCAN t USING INDEX i" reads a whole index, which
+		# only pays off when the index also satisfies the ORDER BY and a LIMIT stops it early
+		if words[:1] == ["SCAN"] and len(words) > 1 and words[1] in tables:
+			if "INDEX" not in words:
+				finding.scans.append(f"full scan of {words[1]}")
+			elif "LIMIT" not in sql:
+				finding.scans.append(f"full index scan of {words[1]}")
+		if detail.startswith("USE TEMP B-TREE"):
+			finding.sorts.append(detail)
+	return finding
+
+
+def _postgres_plan(conn: Any, query: HotQuery, sql: str, tables: set) -> Finding:
+	finding = Finding(query=query, plan=[])
+	raw = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+	doc = raw if isinstance(raw, list) else json.loads(raw)
+
+	def walk(node: Dict[str, Any], depth: int) -> None:
+		relation = node.get("Relation Name")
+		label = node["Node Type"] + (f" on {relation}" if relation else "") + (f" using {node['Index Name']}" if node.get("Index Name") else "")
+		finding.plan.append("  " * depth + f"{label} (rows={node.get('Plan Rows')})")
+		if node["Node Type"] == "Seq Scan" and relation in tables:
+			finding.scans.append(f"sequential scan of {relation} (~{node.get('Plan Rows')} rows)")
+		if node["Node Type"] in ("Sort", "Incremental Sort"):
+			finding.sorts.append(f"{node['Node Type']} on {', '.join(node.get('Sort Key', []))}")
+		for child in node.get("Plans", []):
+			walk(child, depth + 1)
+
+	walk(doc[0]["Plan"], 0)
+	return finding
+
+
+def explain_hot_queries(engine: Engine | None = None, now: datetime | None = None) -> List[Finding]:
+	"""Plan every hot query shape on ``engine``; findings list table scans and extra sorts"""
+	engine = engine or default_engine
+	now = now or datetime.now(timezone.utc)
+	tables = set(Base.metadata.tables)
+	explain = _postgres_plan if engine.dialect.name == "postgresql" else _sqlite_plan
+	findings = []
+	with engine.connect() as conn:
+		for query in HOT_QUERIES:
+			sql = str(query.build(now).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+			findings.append(explain(conn, query, sql, tables))
+	return findings
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--apply", action="store_true", help="Create indexes declared on the models that the database lacks, then explain")
+	parser.add_argument("--strict", action="store_true", help="Exit with status 1 if any hot query scans a table")
+	parser.add_argument("--verbose", action="store_true", help="Print every plan, not only flagged ones")
+	args = parser.parse_args()
+
+	if args.apply:
+		ensure_indexes()
+		ensure_search_indexes()
+	findings = explain_hot_queries()
+	flagged = 0
+	for f in findings:
+		status = "SCAN" if f.scans else ("SORT" if f.sorts else "ok")
+		flagged += bool(f.scans)
+		print(f"[{status:4}] {f.query.name}  ({f.query.source})")
+		for note in f.scans + f.sorts:
+			print(f"         - {note}")
+		if args.verbose or f.scans:
+			for line in f.plan:
+				print(f"           {line}")
+	print(f"\n{len(findings)} hot queries on {default_engine.dialect.name}; {flagged} with table scans")
+	if args.strict and flagged:
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -14,6 +14,7 @@ CREATE TABLE IF NOT EXISTS train_positions (
 
 SELECT create_hypertable('train_positions', 'timestamp', if_not_exists => TRUE);
 CREATE INDEX IF NOT EXISTS idx_train_positions_train_time ON train_positions (train_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS ix_train_positions_section_timestamp ON train_positions (section_id, timestamp DESC);
 
 -- Reference tables and other logs (normal tables)
 CREATE TABLE IF NOT EXISTS trains (
@@ -35,6 +36,7 @@ CREATE TABLE IF NOT EXISTS train_schedules (
 	planned_departure TIMESTAMPTZ NULL,
 	planned_platform TEXT NULL
 );
+CREATE INDEX IF NOT EXISTS ix_train_schedules_station_platform_departure ON train_schedules (station_id, planned_platform, planned_departure);
 
 CREATE TABLE IF NOT EXISTS overrides (
 	id TEXT PRIMARY KEY,
@@ -55,4 +57,39 @@ CREATE TABLE IF NOT EXISTS optimizer_decisions (
 	created_at TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
+CREATE TABLE IF NOT EXISTS simulation_results (
+	id TEXT PRIMARY KEY,
+	scenario_hash TEXT NOT NULL,
+	name TEXT NULL,
+	payload BYTEA NOT NULL,
+	created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+	applied_at TIMESTAMPTZ NULL
+);
+CREATE INDEX IF NOT EXISTS idx_simulation_results_hash_time ON simulation_results (scenario_hash, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS section_rollups (
+	grain TEXT NOT NULL,
+	bucket_start TIMESTAMPTZ NOT NULL,
+	section_id TEXT NOT NULL,
+	class_type TEXT NOT NULL,
+	position_count INTEGER NOT NULL DEFAULT 0,
+	distinct_trains INTEGER NOT NULL DEFAULT 0,
+	speed_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+	log_count INTEGER NOT NULL DEFAULT 0,
+	delay_count INTEGER NOT NULL DEFAULT 0,
+	delay_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+	PRIMARY KEY (grain, bucket_start, section_id, class_type)
+);
 
+CREATE TABLE IF NOT EXISTS delay_sketches (
+	hour_start TIMESTAMPTZ NOT NULL,
+	section_id TEXT NOT NULL,
+	delay_count INTEGER NOT NULL DEFAULT 0,
+	digest BYTEA NOT NULL,
+	PRIMARY KEY (hour_start, section_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+	name TEXT PRIMARY KEY,
+	watermark TIMESTAMPTZ NOT NULL
+);
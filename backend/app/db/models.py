@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, relationship, Mapped, mapped_column
-from sqlalchemy import String, Integer, Float, DateTime, JSON, ForeignKey, text, Boolean
+from sqlalchemy import String, Integer, Float, DateTime, JSON, ForeignKey, Index, text, Boolean, LargeBinary
 from datetime import datetime
 
 
@@ -35,14 +35,20 @@ class Station(Base):
 
 class TrainSchedule(Base):
 	__tablename__ = "train_schedules"
+	__table_args__ = (
+		# Keyset pages of /train-logs/schedules, newest planned arrival first
+		Index("ix_train_schedules_planned_arrival_id", "planned_arrival", "id"),
+		# Platform occupancy: departures per station and platform in time order
+		Index("ix_train_schedules_station_platform_departure", "station_id", "planned_platform", "planned_departure"),
+	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 	train_id: Mapped[str] = mapped_column(String, ForeignKey("trains.id"), index=True)
 	station_id: Mapped[str] = mapped_column(String, ForeignKey("stations.id"), index=True)
-	planned_arrival: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
-	planned_departure: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
-	actual_arrival: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
-	actual_departure: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+	planned_arrival: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
+	planned_departure: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
+	actual_arrival: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
+	actual_departure: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
 	planned_platform: Mapped[str | None] = mapped_column(String, nullable=True)
 	actual_platform: Mapped[str | None] = mapped_column(String, nullable=True)
 	status: Mapped[str | None] = mapped_column(String, nullable=True, default="scheduled")  # scheduled, arrived, departed, delayed, cancelled
@@ -51,15 +57,22 @@ class TrainSchedule(Base):
 
 class TrainPosition(Base):
 	__tablename__ = "train_positions"
+	__table_args__ = (
+		# Section or train plus a time range, sorted by time; the train index keeps the
+		# name init_timescaledb.sql gives it so both schema paths end up with one index
+		Index("ix_train_positions_section_timestamp", "section_id", "timestamp"),
+		Index("idx_train_positions_train_time", "train_id", "timestamp"),
+	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-	train_id: Mapped[str] = mapped_column(String, ForeignKey("trains.id"), index=True)
-	section_id: Mapped[str] = mapped_column(String, index=True)
+	# No single-column indexes: both are left prefixes of the composite indexes above
+	train_id: Mapped[str] = mapped_column(String, ForeignKey("trains.id"))
+	section_id: Mapped[str] = mapped_column(String)
 	planned_block_id: Mapped[str | None] = mapped_column(String, nullable=True)
 	actual_block_id: Mapped[str | None] = mapped_column(String, nullable=True)
 	location_km: Mapped[float] = mapped_column(Float)
 	speed_kmph: Mapped[float] = mapped_column(Float)
-	timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
+	timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"), index=True)
 
 
 class Override(Base):
@@ -85,8 +98,25 @@ class OptimizerDecision(Base):
 	created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
 
 
+class SimulationRecord(Base):
+	__tablename__ = "simulation_results"
+
+	id: Mapped[str] = mapped_column(String, primary_key=True)
+	scenario_hash: Mapped[str] = mapped_column(String, index=True)
+	name: Mapped[str | None] = mapped_column(String, nullable=True)
+	payload: Mapped[bytes] = mapped_column(LargeBinary)  # zlib-compressed JSON result
+	created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"), index=True)
+	applied_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
 class TrainLog(Base):
 	__tablename__ = "train_logs"
+	__table_args__ = (
+		# Keyset pages on (timestamp, id), unfiltered and under an exact train or section match
+		Index("ix_train_logs_timestamp_id", "timestamp", "id"),
+		Index("ix_train_logs_train_timestamp_id", "train_id", "timestamp", "id"),
+		Index("ix_train_logs_section_timestamp_id", "section_id", "timestamp", "id"),
+	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 	train_id: Mapped[str] = mapped_column(String, ForeignKey("trains.id"), index=True)
@@ -102,3 +132,32 @@ class TrainLog(Base):
 	timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
 
 
+class SectionRollup(Base):
+	__tablename__ = "section_rollups"
+
+	grain: Mapped[str] = mapped_column(String, primary_key=True)  # minute | hour
+	bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+	section_id: Mapped[str] = mapped_column(String, primary_key=True)
+	class_type: Mapped[str] = mapped_column(String, primary_key=True)  # '' when the train has no class
+	position_count: Mapped[int] = mapped_column(Integer, default=0)
+	distinct_trains: Mapped[int] = mapped_column(Integer, default=0)
+	speed_sum: Mapped[float] = mapped_column(Float, default=0.0)
+	log_count: Mapped[int] = mapped_column(Integer, default=0)
+	delay_count: Mapped[int] = mapped_column(Integer, default=0)  # logs with delay_minutes set
+	delay_sum: Mapped[float] = mapped_column(Float, default=0.0)
+
+
+class DelaySketch(Base):
+	__tablename__ = "delay_sketches"
+
+	hour_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+	section_id: Mapped[str] = mapped_column(String, primary_key=True)
+	delay_count: Mapped[int] = mapped_column(Integer, default=0)
+	digest: Mapped[bytes] = mapped_column(LargeBinary)  # TDigest.to_bytes() of the hour's delay_minutes
+
+
+class RollupWatermark(Base):
+	__tablename__ = "rollup_watermarks"
+
+	name: Mapped[str] = mapped_column(String, primary_key=True)
+	watermark: Mapped[datetime] = mapped_column(DateTime(timezone=True))
@@ -1,8 +1,22 @@
-from sqlalchemy import create_engine
+import logging
+
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.db.models import Base
+
+
+logger = logging.getLogger(__name__)
 
+# Text columns the /train-logs filters match on
+SEARCH_COLUMNS = (
+	("train_logs", "train_id"),
+	("train_logs", "section_id"),
+	("train_logs", "station_id"),
+	("train_schedules", "train_id"),
+	("train_schedules", "station_id"),
+)
 
 engine = create_engine(settings.sync_database_uri, echo=settings.SQLALCHEMY_ECHO, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
@@ -16,3 +30,48 @@ def get_db():
 		db.close()
 
 
+# Indexes earlier models created that a composite index now covers as its left prefix;
+# they only slow inserts into the busiest table
+SUPERSEDED_INDEXES = (
+	"ix_train_positions_train_id",
+	"ix_train_positions_section_id",
+)
+
+
+def ensure_indexes() -> None:
+	"""Create model-declared indexes missing from an existing database
+
+	``create_all`` skips tables that already exist, so indexes added to the
+	models later would otherwise never reach deployed databases. Superseded
+	indexes are dropped once their replacements exist.
+	"""
+	for table in Base.metadata.sorted_tables:
+		for index in table.indexes:
+			index.create(bind=engine, checkfirst=True)
+	with engine.begin() as conn:
+		for name in SUPERSEDED_INDEXES:
+			conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def ensure_search_indexes() -> None:
+	"""Postgres indexes behind the /train-logs prefix and substring filters
+
+	``text_pattern_ops`` b-trees serve ``LIKE 'x%'`` under any database
+	collation. With ``PG_TRIGRAM_SEARCH``, pg_trgm GIN indexes also serve
+	``ILIKE '%x%'``; when the extension cannot be installed (it needs
+	privileges) substring search keeps working as a scan.
+	"""
+	if engine.dialect.name != "postgresql":
+		return
+	with engine.begin() as conn:
+		for table, column in SEARCH_COLUMNS:
+			conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_prefix ON {table} ({column} text_pattern_ops)"))
+	if not settings.PG_TRIGRAM_SEARCH:
+		return
+	try:
+		with engine.begin() as conn:
+			conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+			for table, column in SEARCH_COLUMNS:
+				conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)"))
+	except Exception:
+		logger.warning("pg_trgm unavailable; substring filters will not be index-assisted", exc_info=True)
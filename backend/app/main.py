@@ -1,10 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .api.routes import ingest, optimizer, simulator, overrides, ws, users, reports, train_logs, admin
-from .db.session import engine, SessionLocal
+from .api.routes import ingest, optimizer, simulator, overrides, ws, users, reports, train_logs, admin, twin
+from .db.session import engine, SessionLocal, ensure_indexes, ensure_search_indexes
 from .db.models import Base
 from sqlalchemy import text
+import asyncio
 import os
 
 from .core.config import settings
@@ -51,6 +52,7 @@ def create_app() -> FastAPI:
 	app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
 	app.include_router(train_logs.router, prefix="/api/train-logs", tags=["train-logs"])
 	app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+	app.include_router(twin.router, prefix="/api/twin", tags=["twin"])
 	app.include_router(ws.router, tags=["ws"])  # exposes /ws/live
 
 	# Ensure database tables exist on startup
@@ -71,6 +73,8 @@ def create_app() -> FastAPI:
 
 		# Ensure tables exist on current engine
 		Base.metadata.create_all(bind=engine)
+		ensure_indexes()
+		ensure_search_indexes()
 
 		# Optional: seed demo data once if enabled and database appears empty
 		if os.getenv("SEED_ON_STARTUP", "false").lower() == "true":
@@ -105,6 +109,36 @@ def create_app() -> FastAPI:
 				# Column likely exists; ignore
 				pass
 
+	# Backend motion model: advances all trains each tick and publishes on /ws/twin
+	@app.on_event("startup")
+	async def start_digital_twin() -> None:
+		if settings.TWIN_ENABLED:
+			from .services.twin import digital_twin, run_twin_loop
+			app.state.twin_task = asyncio.create_task(
+				run_twin_loop(digital_twin, ws.publish_twin_frame, settings.TWIN_TICK_SECONDS)
+			)
+
+	# Keeps the report rollups current so report endpoints rarely compact inline
+	@app.on_event("startup")
+	async def start_rollup_compactor() -> None:
+		if settings.ROLLUP_INTERVAL_SECONDS > 0:
+			from .services.rollups import run_compactor_loop
+			app.state.rollup_task = asyncio.create_task(run_compactor_loop(settings.ROLLUP_INTERVAL_SECONDS))
+
+	# Spawned workers import OR-Tools and torch before taking work; do it before the first request needs them
+	@app.on_event("startup")
+	async def prewarm_process_pool() -> None:
+		if settings.WORKER_POOL_PREWARM:
+			from .services.workers import warm_process_pool
+			warm_process_pool()
+
+	@app.on_event("shutdown")
+	async def stop_background_tasks() -> None:
+		for name in ("twin_task", "rollup_task"):
+			task = getattr(app.state, name, None)
+			if task is not None:
+				task.cancel()
+
 	@app.get("/health")
 	def health() -> dict:
 		return {"status": "ok"}
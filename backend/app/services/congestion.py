@@ -0,0 +1,143 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import TrainPosition
+from app.services.rollups import MINUTE, parse_bucket, truncate
+from app.services.sketches import HyperLogLog
+
+
+# A minute bucket switches from an exact set to a HyperLogLog past this many trains
+HLL_THRESHOLD = 1024
+
+Bucket = Set[str] | HyperLogLog
+
+
+class SectionOccupancy:
+	"""Distinct trains per section over sliding windows, held in memory
+
+	Each section has a time wheel of one-minute buckets covering
+	``span_minutes``; a bucket holds the train ids seen in its minute, as a
+	set or, for very large fleets, a HyperLogLog. "Distinct trains in X over
+	the last W minutes" is the union of W + 1 buckets, whatever the position
+	rate. Ingest records into the wheel directly; ``refresh`` seeds it from
+	``train_positions`` on first use and then tails rows written since (by
+	id), so positions stored by other processes or scripts are counted too.
+	"""
+
+	def __init__(self, span_minutes: int, tail_interval_s: float) -> None:
+		self.span_minutes = span_minutes
+		self.tail_interval_s = tail_interval_s
+		self._lock = threading.Lock()
+		self._tail_lock = threading.Lock()
+		self._buckets: Dict[str, List[Bucket | None]] = {}
+		self._minutes: Dict[str, np.ndarray] = {}
+		self._last_id: int | None = None
+		self._tailed_at = -np.inf
+
+	def covers(self, window_minutes: int) -> bool:
+		return 0 < window_minutes < self.span_minutes
+
+	def record(self, sightings: Iterable[Tuple[str, str]], ts: float | None = None) -> None:
+		"""Count each (section_id, train_id) as seen at ``ts`` (default now)"""
+		minute = int((time.time() if ts is None else ts) // 60)
+		with self._lock:
+			for section_id, train_id in sightings:
+				self._add(section_id, train_id, minute)
+
+	def _add(self, section_id: str, train_id: str, minute: int) -> None:
+		if minute <= int(time.time() // 60) - self.span_minutes:
+			return
+		buckets = self._buckets.get(section_id)
+		if buckets is None:
+			buckets = self._buckets[section_id] = [None] * self.span_minutes
+			self._minutes[section_id] = np.full(self.span_minutes, -1, dtype=np.int64)
+		minutes = self._minutes[section_id]
+		slot = minute % self.span_minutes
+		if minutes[slot] != minute:
+			if minutes[slot] > minute:
+				# The slot has already moved on to a later minute
+				return
+			buckets[slot], minutes[slot] = set(), minute
+		bucket = buckets[slot]
+		bucket.add(train_id)
+		if isinstance(bucket, set) and len(bucket) > HLL_THRESHOLD:
+			hll = HyperLogLog()
+			hll.update(bucket)
+			buckets[slot] = hll
+
+	def _window(self, section_id: str, window_minutes: int, now: float) -> List[Bucket]:
+		buckets = self._buckets.get(section_id)
+		if buckets is None:
+			return []
+		lo, hi = int((now - window_minutes * 60) // 60), int(now // 60)
+		minutes = self._minutes[section_id]
+		return [buckets[i] for i in np.flatnonzero((minutes >= lo) & (minutes <= hi))]
+
+	@staticmethod
+	def _union_count(buckets: List[Bucket]) -> int:
+		if all(isinstance(b, set) for b in buckets):
+			return len(set().union(*buckets))
+		hll = HyperLogLog()
+		for b in buckets:
+			if isinstance(b, set):
+				hll.update(b)
+			else:
+				hll.merge(b)
+		return hll.count()
+
+	def distinct_trains(self, section_id: str, window_minutes: int, now: float | None = None) -> int:
+		now = time.time() if now is None else now
+		with self._lock:
+			return self._union_count(self._window(section_id, window_minutes, now))
+
+	def counts(self, window_minutes: int, now: float | None = None) -> Dict[str, int]:
+		"""Distinct trains over the window for every section seen in it"""
+		now = time.time() if now is None else now
+		with self._lock:
+			out = {s: self._union_count(self._window(s, window_minutes, now)) for s in self._buckets}
+		return {s: n for s, n in out.items() if n}
+
+	def refresh(self, db: Session, force: bool = False) -> None:
+		"""Seed from the database on first use, then pull positions stored since the last pull"""
+		if not force and time.monotonic() - self._tailed_at < self.tail_interval_s:
+			return
+		with self._tail_lock:
+			if not force and time.monotonic() - self._tailed_at < self.tail_interval_s:
+				return
+			if self._last_id is None:
+				last_id = db.execute(select(func.coalesce(func.max(TrainPosition.id), 0))).scalar()
+				since = datetime.now(timezone.utc) - timedelta(minutes=self.span_minutes)
+				bucket = truncate(db, MINUTE, TrainPosition.timestamp)
+				rows = db.execute(
+					select(TrainPosition.section_id, TrainPosition.train_id, bucket)
+					.where(TrainPosition.timestamp >= since)
+					.distinct()
+				).all()
+				with self._lock:
+					for section_id, train_id, b in rows:
+						self._add(section_id, train_id, int(parse_bucket(b, MINUTE).timestamp() // 60))
+			else:
+				# Ids are assigned at insert, so this sees every row committed since the last pull
+				# (on Postgres a transaction committing after a later id can still be missed)
+				rows = db.execute(
+					select(TrainPosition.id, TrainPosition.section_id, TrainPosition.train_id, TrainPosition.timestamp)
+					.where(TrainPosition.id > self._last_id)
+					.order_by(TrainPosition.id)
+				).all()
+				last_id = rows[-1][0] if rows else self._last_id
+				with self._lock:
+					for _id, section_id, train_id, ts in rows:
+						ts = ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+						self._add(section_id, train_id, int(ts.timestamp() // 60))
+			self._last_id = last_id
+			self._tailed_at = time.monotonic()
+
+
+section_occupancy = SectionOccupancy(settings.CONGESTION_WHEEL_MINUTES, settings.CONGESTION_TAIL_SECONDS)
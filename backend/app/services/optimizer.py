@@ -1,13 +1,30 @@
 from dataclasses import dataclass
 from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta, timezone
+import numpy as np
 from sqlalchemy.orm import Session
 
-from app.db.models import TrainLog, TrainSchedule, TrainPosition
+from app.db.models import TrainLog, TrainSchedule, TrainPosition, Station
+from app.services.congestion import section_occupancy
 from app.services.optimizers.subqubo import QuboInspiredOptimizer
 from app.services.optimizers.milp import MilpOptimizer
+from app.services.optimizers.cpsat import CpSatOptimizer
+from app.services.optimizers.rolling_horizon import RollingHorizonScheduler
 from app.services.optimizers.gnn import SimpleGnnScorer
 from app.services.optimizers.hybrid import HybridOptimizer
+from app.services.optimizers.problem import OptimizationProblem
+
+
+def train_weight(avg_delay_minutes: float, in_platform_conflict: bool, congestion: int) -> float:
+	"""Per-train utility in [-1, 1] from delay, platform conflict and congestion cues."""
+	w = 0.0
+	if avg_delay_minutes > 0:
+		w += min(avg_delay_minutes / 10.0, 1.0) * 0.6
+	if in_platform_conflict:
+		w += 0.3
+	if congestion >= 3:
+		w += min((congestion - 2) * 0.1, 0.2)
+	return float(max(-1.0, min(1.0, w)))
 
 
 @dataclass
@@ -40,6 +57,10 @@ class OptimizerService:
 		return avg
 
 	def _section_congestion(self, db: Session, section_id: str, window_minutes: int) -> int:
+		# Answered from the in-memory time wheel unless the window is longer than it keeps
+		if section_occupancy.covers(window_minutes):
+			section_occupancy.refresh(db)
+			return section_occupancy.distinct_trains(section_id, window_minutes)
 		now = datetime.now(timezone.utc)
 		start = now - timedelta(minutes=window_minutes)
 		cnt = (
@@ -51,8 +72,8 @@ class OptimizerService:
 		)
 		return int(cnt)
 
-	def _platform_conflicts(self, db: Session, window_minutes: int) -> Dict[str, str]:
-		# naive: if two trains use same planned_platform at same station within 5 minutes
+	def _platform_usage(self, db: Session, window_minutes: int) -> Dict[Tuple[str, str], List[Tuple[str, datetime]]]:
+		# Planned departures per (station, platform), in time order
 		now = datetime.now(timezone.utc)
 		start = now - timedelta(minutes=window_minutes)
 		rows = (
@@ -61,15 +82,22 @@ class OptimizerService:
 			.filter(TrainSchedule.planned_departure >= start)
 			.all()
 		)
-		conflicts: Dict[str, str] = {}
 		by_key: Dict[Tuple[str, str], List[Tuple[str, datetime]]] = {}
 		for train_id, station_id, platform, dep in rows:
 			if not platform or not dep:
 				continue
 			key = (station_id, platform)
 			by_key.setdefault(key, []).append((train_id, dep))
-		for (_station, _plat), items in by_key.items():
+		for items in by_key.values():
 			items.sort(key=lambda x: x[1])
+		return by_key
+
+	def _platform_conflicts(self, db: Session, window_minutes: int, usage: Dict[Tuple[str, str], List[Tuple[str, datetime]]] | None = None) -> Dict[str, str]:
+		# naive: if two trains use same planned_platform at same station within 5 minutes
+		if usage is None:
+			usage = self._platform_usage(db, window_minutes)
+		conflicts: Dict[str, str] = {}
+		for (_station, _plat), items in usage.items():
 			for i in range(1, len(items)):
 				t_prev, ts_prev = items[i - 1]
 				t_curr, ts_curr = items[i]
@@ -78,6 +106,132 @@ class OptimizerService:
 					conflicts[t_curr] = _plat
 		return conflicts
 
+	def _graph_edges(
+		self,
+		index: Dict[str, int],
+		locations: Dict[str, float],
+		usage: Dict[Tuple[str, str], List[Tuple[str, datetime]]],
+	) -> List[Tuple[int, int]]:
+		"""Sparse train graph: section neighbours and platform neighbours.
+
+		Section and platform edges link consecutive trains (by location along the
+		section, by planned departure at a platform) rather than every pair, so the
+		edge count stays linear in the number of trains sharing a resource.
+		Conflict pairs are added by the caller; the problem de-duplicates edges.
+		"""
+		edges: List[Tuple[int, int]] = []
+		along = sorted((loc, index[t]) for t, loc in locations.items() if t in index)
+		edges.extend((a, b) for (_la, a), (_lb, b) in zip(along, along[1:]))
+		for items in usage.values():
+			seq = [index[t] for t, _dep in items if t in index]
+			edges.extend(zip(seq, seq[1:]))
+		return edges
+
+	def _schedule_events(self, db: Session, section_id: str, lookahead_minutes: int) -> List[Dict[str, Any]]:
+		# Next planned departure per train from stations in the section within the lookahead
+		now = datetime.now(timezone.utc)
+		end = now + timedelta(minutes=lookahead_minutes)
+		rows = (
+			db.query(TrainSchedule.train_id, TrainSchedule.station_id, TrainSchedule.planned_platform, TrainSchedule.planned_arrival, TrainSchedule.planned_departure)
+			.join(Station, Station.id == TrainSchedule.station_id)
+			.filter(Station.section_id == section_id)
+			.filter(TrainSchedule.planned_departure.isnot(None))
+			.filter(TrainSchedule.planned_departure >= now)
+			.filter(TrainSchedule.planned_departure <= end)
+			.order_by(TrainSchedule.planned_departure)
+			.all()
+		)
+		events: List[Dict[str, Any]] = []
+		seen: set[str] = set()
+		for train_id, station_id, platform, arr, dep in rows:
+			if train_id in seen:
+				continue
+			seen.add(train_id)
+			dep = dep if dep.tzinfo else dep.replace(tzinfo=timezone.utc)
+			dwell_s = None
+			if arr is not None:
+				arr = arr if arr.tzinfo else arr.replace(tzinfo=timezone.utc)
+				dwell_s = max(0.0, (dep - arr).total_seconds())
+			events.append({
+				"train_id": train_id,
+				"station_id": station_id,
+				"platform": platform,
+				"planned_ts": (dep - now).total_seconds(),
+				"dwell_s": dwell_s,
+			})
+		return events
+
+	def _section_locations(self, db: Session, section_ids: List[str], window_minutes: int) -> Dict[str, Dict[str, float]]:
+		# Latest reported location per train and section; dict order keeps first sighting
+		now = datetime.now(timezone.utc)
+		start = now - timedelta(minutes=window_minutes)
+		pos_rows = (
+			db.query(TrainPosition.section_id, TrainPosition.train_id, TrainPosition.location_km)
+			.filter(TrainPosition.section_id.in_(section_ids))
+			.filter(TrainPosition.timestamp >= start)
+			.order_by(TrainPosition.timestamp)
+			.all()
+		)
+		by_section: Dict[str, Dict[str, float]] = {}
+		for section_id, train_id, location_km in pos_rows:
+			by_section.setdefault(section_id, {})[train_id] = float(location_km or 0.0)
+		return by_section
+
+	def _build_context(
+		self,
+		candidate_trains: List[str],
+		locations: Dict[str, float],
+		congestion: int,
+		avg_delay: Dict[str, float],
+		platform_conf: Dict[str, str],
+		platform_usage: Dict[Tuple[str, str], List[Tuple[str, datetime]]],
+	) -> Dict[str, Any]:
+		# Build the shared problem once for all advanced backends
+		# Train weights: combine delay, platform conflict and congestion cues
+		index = {t: i for i, t in enumerate(candidate_trains)}
+		weights = [train_weight(float(avg_delay.get(t, 0.0)), t in platform_conf, congestion) for t in candidate_trains]
+
+		# Pairwise conflicts: any trains flagged in platform_conf treated as mutually exclusive
+		conflict_idx = np.array([i for t, i in index.items() if t in platform_conf], dtype=np.int64)
+		iu, ju = np.triu_indices(len(conflict_idx), k=1)
+		conflict_pairs = np.stack((conflict_idx[iu], conflict_idx[ju]), axis=1)
+
+		edges = self._graph_edges(index, locations, platform_usage)
+		problem = OptimizationProblem.build(
+			candidate_trains,
+			weights,
+			conflict_pairs,
+			np.concatenate((conflict_pairs, np.array(edges, dtype=np.int64).reshape(-1, 2))),
+		)
+		return {"problem": problem}
+
+	def score_sections(self, request: Dict[str, Any], db: Session) -> Dict[str, Dict[str, Any]]:
+		"""GNN-score many sections with shared lookups and one batched forward pass."""
+		section_ids: List[str] = list(request.get("section_ids") or [])
+		lookahead_minutes: int = int(request.get("lookahead_minutes", 30))
+
+		if not section_ids:
+			start = datetime.now(timezone.utc) - timedelta(minutes=lookahead_minutes)
+			section_ids = [
+				r[0]
+				for r in db.query(TrainPosition.section_id).filter(TrainPosition.timestamp >= start).distinct().all()
+			]
+		if not section_ids:
+			return {}
+
+		# Delay history and platform usage are network-wide: query them once for all sections
+		avg_delay = self._recent_delays_by_train(db, lookback_hours=max(1, lookahead_minutes // 60 or 1))
+		platform_usage = self._platform_usage(db, window_minutes=lookahead_minutes)
+		platform_conf = self._platform_conflicts(db, window_minutes=lookahead_minutes, usage=platform_usage)
+		by_section = self._section_locations(db, section_ids, window_minutes=lookahead_minutes)
+
+		contexts: Dict[str, Dict[str, Any]] = {}
+		for section_id in section_ids:
+			locations = by_section.get(section_id, {})
+			# Distinct trains seen in the window, same measure as _section_congestion
+			contexts[section_id] = self._build_context(list(locations), locations, len(locations), avg_delay, platform_conf, platform_usage)
+		return SimpleGnnScorer().score_batch(request, contexts)
+
 	def optimize(self, request: Dict[str, Any], db: Session) -> Dict[str, Any]:
 		section_id: str = request.get("section_id", "")
 		lookahead_minutes: int = int(request.get("lookahead_minutes", 30))
@@ -85,18 +239,11 @@ class OptimizerService:
 
 		avg_delay = self._recent_delays_by_train(db, lookback_hours=max(1, lookahead_minutes // 60 or 1))
 		congestion = self._section_congestion(db, section_id=section_id, window_minutes=lookahead_minutes)
-		platform_conf = self._platform_conflicts(db, window_minutes=lookahead_minutes)
+		platform_usage = self._platform_usage(db, window_minutes=lookahead_minutes)
+		platform_conf = self._platform_conflicts(db, window_minutes=lookahead_minutes, usage=platform_usage)
 
-		now = datetime.now(timezone.utc)
-		start = now - timedelta(minutes=lookahead_minutes)
-		pos_rows = (
-			db.query(TrainPosition.train_id)
-			.filter(TrainPosition.section_id == section_id)
-			.filter(TrainPosition.timestamp >= start)
-			.distinct()
-			.all()
-		)
-		candidate_trains = [r[0] for r in pos_rows]
+		locations = self._section_locations(db, [section_id], window_minutes=lookahead_minutes).get(section_id, {})
+		candidate_trains = list(locations)
 
 		# If no ML/MIP requested, keep existing heuristic
 		if method in ("", "heuristic"):
@@ -130,40 +277,24 @@ class OptimizerService:
 			explanations.append("Heuristic: score = delay_factor + platform_conflict + congestion_factor")
 			return {"recommendations": recommendations, "explanations": explanations}
 
-		# Build shared context for advanced backends
-		# Train weights: combine delay, platform conflict and congestion cues
-		train_weights: Dict[str, float] = {}
-		for t in candidate_trains:
-			w = 0.0
-			d = float(avg_delay.get(t, 0.0))
-			if d > 0:
-				w += min(d / 10.0, 1.0) * 0.6
-			if t in platform_conf:
-				w += 0.3
-			if congestion >= 3:
-				w += min((congestion - 2) * 0.1, 0.2)
-			train_weights[t] = float(max(-1.0, min(1.0, w)))
+		schedule_events: List[Dict[str, Any]] = []
+		if method == "rolling":
+			schedule_events = self._schedule_events(db, section_id=section_id, lookahead_minutes=lookahead_minutes)
+			candidate_trains += [e["train_id"] for e in schedule_events if e["train_id"] not in candidate_trains]
 
-		# Pairwise conflicts: any trains flagged in platform_conf treated as mutually exclusive
-		conflict_trains = [t for t in candidate_trains if t in platform_conf]
-		pairwise_conflicts: List[tuple[str, str]] = []
-		for i in range(len(conflict_trains)):
-			for j in range(i + 1, len(conflict_trains)):
-				pairwise_conflicts.append((conflict_trains[i], conflict_trains[j]))
-
-		context: Dict[str, Any] = {
-			"candidate_trains": candidate_trains,
-			"train_weights": train_weights,
-			"pairwise_conflicts": pairwise_conflicts,
-			"graph_edges": [],
-		}
+		context = self._build_context(candidate_trains, locations, congestion, avg_delay, platform_conf, platform_usage)
+		context["schedule_events"] = schedule_events
 
 		if method == "qubo":
 			backend = QuboInspiredOptimizer()
 		elif method == "milp":
 			backend = MilpOptimizer()
+		elif method == "cpsat":
+			backend = CpSatOptimizer()
 		elif method == "gnn":
 			backend = SimpleGnnScorer()
+		elif method == "rolling":
+			backend = RollingHorizonScheduler()
 		else:
 			backend = HybridOptimizer()
 
@@ -171,6 +302,7 @@ class OptimizerService:
 		return {
 			"recommendations": result.get("recommendations", []),
 			"explanations": result.get("explanations", []),
+			"solver": result.get("solver"),
 		}
 
 
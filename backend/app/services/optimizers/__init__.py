@@ -1,14 +1,21 @@
 from .base import OptimizerBackend, to_response
+from .problem import OptimizationProblem, problem_of
 from .subqubo import QuboInspiredOptimizer
 from .milp import MilpOptimizer
+from .cpsat import CpSatOptimizer
+from .rolling_horizon import RollingHorizonScheduler
 from .gnn import SimpleGnnScorer
 from .hybrid import HybridOptimizer
 
 __all__ = [
     "OptimizerBackend",
     "to_response",
+    "OptimizationProblem",
+    "problem_of",
     "QuboInspiredOptimizer",
     "MilpOptimizer",
+    "CpSatOptimizer",
+    "RollingHorizonScheduler",
     "SimpleGnnScorer",
     "HybridOptimizer",
 ]
@@ -1,64 +1,104 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Sequence, Tuple
 
+import numpy as np
 import torch
 
+from app.core.config import settings
+
 from .base import OptimizerBackend, to_response
+from .gnn_model import load_scorer
+from .problem import problem_of
+
+_torch_configured = False
+
+
+def _configure_torch() -> None:
+    # torch.set_num_threads is process-wide; apply it once on first use
+    global _torch_configured
+    if not _torch_configured:
+        torch.set_num_threads(max(1, settings.GNN_NUM_THREADS))
+        _torch_configured = True
+
+
+def build_edge_index(edges: Sequence[Tuple[int, int]] | np.ndarray, num_nodes: int) -> torch.Tensor:
+    """Undirected, de-duplicated COO edge index of shape [2, E] without self loops."""
+    if len(edges) == 0 or num_nodes <= 1:
+        return torch.empty((2, 0), dtype=torch.long)
+    e = torch.as_tensor(edges, dtype=torch.long).reshape(-1, 2)
+    u, v = e[:, 0], e[:, 1]
+    keep = (u != v) & (u >= 0) & (v >= 0) & (u < num_nodes) & (v < num_nodes)
+    u, v = u[keep], v[keep]
+    src = torch.cat((u, v))
+    dst = torch.cat((v, u))
+    # Duplicate edges would be double-counted by index_add_; dedupe on a flat key
+    key = torch.unique(src * num_nodes + dst)
+    return torch.stack((key // num_nodes, key % num_nodes))
 
 
 class SimpleGnnScorer(OptimizerBackend):
     """Lightweight placeholder GNN-like scorer using PyTorch tensors.
 
-    This is a stub that aggregates simplistic node/edge features to produce a bias
-    score per train. It does not implement a full GNN architecture but keeps
-    the integration points ready for future expansion.
+    Aggregates simplistic node/edge features to produce a bias score per train.
+    Aggregation is a self-inclusive neighbourhood mean over a sparse edge index
+    (the problem's ``edge_index`` node pairs), so memory grows with N + E rather
+    than N². The scoring model is the TorchScript artifact produced by
+    ``train_gnn.py`` when present, otherwise the original fixed weights
+    (see ``gnn_model.load_scorer``).
     """
 
     def optimize(self, request: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
-        trains: List[str] = context.get("candidate_trains", [])
-        base_weights: Dict[str, float] = context.get("train_weights", {})
-        # edge list: (u_index, v_index)
-        edges: List[tuple[int, int]] = context.get("graph_edges", [])
-
-        if not trains:
+        if not problem_of(context).size:
             return to_response([], ["GNN: no candidates"])
-
-        num_nodes = len(trains)
-        idx = {t: i for i, t in enumerate(trains)}
-
-        node_feat = torch.zeros((num_nodes, 2), dtype=torch.float32)
-        for t, i in idx.items():
-            w = float(base_weights.get(t, 0.0))
-            node_feat[i, 0] = w
-            node_feat[i, 1] = 1.0  # bias term
-
-        if edges:
-            adj = torch.zeros((num_nodes, num_nodes), dtype=torch.float32)
-            for u, v in edges:
-                if 0 <= u < num_nodes and 0 <= v < num_nodes and u != v:
-                    adj[u, v] = 1.0
-                    adj[v, u] = 1.0
-            agg = torch.matmul(adj, node_feat) / torch.clamp(adj.sum(dim=1, keepdim=True), min=1.0)
-        else:
-            agg = node_feat.clone()
-
-        # Simple linear layer stand-in
-        W = torch.tensor([[0.8, 0.2], [0.3, 0.1]], dtype=torch.float32)
-        out = torch.matmul(agg, W).sum(dim=1)
-        scores = torch.tanh(out)
-
-        recommendations: List[Dict[str, Any]] = []
-        for t, i in idx.items():
-            s = float(scores[i].item())
-            recommendations.append({
-                "train_id": t,
-                "action": "give_precedence" if s >= 0 else "hold_for_clearance",
-                "reason": f"GNN bias score={s:.2f}",
-                "priority_score": float(max(0.0, min(1.0, (s + 1.0) / 2.0))),
-            })
-
-        recommendations.sort(key=lambda r: r.get("priority_score", 0), reverse=True)
-        return to_response(recommendations[:5], ["GNN: simple neighborhood aggregation over weights"])
-
-
+        return self.score_batch(request, {"": context})[""]
+
+    def score_batch(self, request: Dict[str, Any], contexts: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Score several section graphs in one forward pass.
+
+        Each context (keyed by section) carries an ``OptimizationProblem``
+        (or its dict form). Graphs are packed into one block-diagonal sparse
+        graph by offsetting node indices, so sections never exchange
+        messages. Returns a response per section with its own top
+        ``gnn_top_k`` recommendations.
+        """
+        top_k = max(1, int(request.get("gnn_top_k", 5)))
+        keys = list(contexts)
+        problems = [problem_of(contexts[key]) for key in keys]
+        offsets: List[int] = [0]
+        for problem in problems:
+            offsets.append(offsets[-1] + problem.size)
+        # Problem edges are already canonical and in range, so offsetting keeps them inside their block
+        weights = np.concatenate([p.weights for p in problems]) if problems else np.zeros(0)
+        edges = np.concatenate([p.edge_index + off for p, off in zip(problems, offsets)]) if problems else np.zeros((0, 2), dtype=np.int64)
+
+        _configure_torch()
+        with torch.inference_mode():
+            w = torch.from_numpy(weights.astype(np.float32))
+            node_feat = torch.stack((w, torch.ones_like(w)), dim=1)  # [weight, bias term]
+            edge_index = build_edge_index(edges, len(weights))
+            model, source = load_scorer()
+            scores = model(node_feat, edge_index)
+            priority = torch.clamp((scores + 1.0) / 2.0, 0.0, 1.0)
+
+            degree = torch.bincount(edge_index[0], minlength=len(weights)) if edge_index.shape[1] else torch.zeros(len(weights), dtype=torch.long)
+            results: Dict[str, Dict[str, Any]] = {}
+            for n_key, key in enumerate(keys):
+                lo, hi = offsets[n_key], offsets[n_key + 1]
+                trains = problems[n_key].train_ids
+                if hi == lo:
+                    results[key] = to_response([], ["GNN: no candidates"])
+                    continue
+                top = torch.topk(priority[lo:hi], k=min(top_k, hi - lo))
+                recommendations: List[Dict[str, Any]] = []
+                for p, i in zip(top.values.tolist(), top.indices.tolist()):
+                    s = float(scores[lo + i])
+                    recommendations.append({
+                        "train_id": trains[i],
+                        "action": "give_precedence" if s >= 0 else "hold_for_clearance",
+                        "reason": f"GNN bias score={s:.2f}",
+                        "priority_score": float(p),
+                    })
+                n_edges = int(degree[lo:hi].sum()) // 2
+                results[key] = to_response(recommendations, [f"GNN: neighborhood aggregation over weights ({hi - lo} nodes, {n_edges} edges, {source})"])
+        return results
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Tuple
+
+import torch
+from torch import nn
+
+from app.core.config import settings
+
+
+def mean_aggregate(x: torch.Tensor, edge_index: torch.Tensor) -> torch.Tensor:
+    """Mean over each node and its neighbours in O(N + E) memory."""
+    src, dst = edge_index[0], edge_index[1]
+    agg = x.clone().index_add_(0, dst, x.index_select(0, src))
+    deg = torch.ones(x.shape[0], dtype=x.dtype).index_add_(0, dst, torch.ones(dst.shape[0], dtype=x.dtype))
+    return agg / deg.unsqueeze(1)
+
+
+class FixedWeightScorer(nn.Module):
+    """Untrained fallback: one aggregation round and the original hand-set weights."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.register_buffer("W", torch.tensor([[0.8, 0.2], [0.3, 0.1]], dtype=torch.float32))
+
+    def forward(self, x: torch.Tensor, edge_index: torch.Tensor) -> torch.Tensor:
+        agg = mean_aggregate(x, edge_index)
+        return torch.tanh(torch.matmul(agg, self.W).sum(dim=1))
+
+
+class MessagePassingScorer(nn.Module):
+    """Two rounds of mean message passing over [weight, bias] node features.
+
+    Returns one score in [-1, 1] per node; positive means give precedence.
+    Small enough to train on CPU and to export with ``torch.jit.script``.
+    """
+
+    def __init__(self, in_features: int = 2, hidden: int = 16) -> None:
+        super().__init__()
+        self.lin1 = nn.Linear(in_features, hidden)
+        self.lin2 = nn.Linear(hidden, hidden)
+        self.out = nn.Linear(hidden, 1)
+
+    def forward(self, x: torch.Tensor, edge_index: torch.Tensor) -> torch.Tensor:
+        h = torch.relu(self.lin1(mean_aggregate(x, edge_index)))
+        h = torch.relu(self.lin2(mean_aggregate(h, edge_index)))
+        return torch.tanh(self.out(h)).squeeze(1)
+
+
+_scorer: nn.Module | None = None
+_scorer_source = ""
+_scorer_lock = threading.Lock()
+
+
+def load_scorer() -> Tuple[nn.Module, str]:
+    """Return the process-wide scorer, loading the TorchScript artifact on first use.
+
+    Falls back to FixedWeightScorer when ``GNN_MODEL_PATH`` does not exist or
+    cannot be loaded.
+    """
+    global _scorer, _scorer_source
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                path = settings.GNN_MODEL_PATH
+                model: nn.Module = FixedWeightScorer()
+                source = "fixed weights"
+                if os.path.exists(path):
+                    try:
+                        model = torch.jit.load(path, map_location="cpu")
+                        source = f"trained model {os.path.basename(path)}"
+                    except Exception as e:
+                        source = f"fixed weights (failed to load {os.path.basename(path)}: {e})"
+                model.eval()
+                _scorer_source = source
+                _scorer = model
+    return _scorer, _scorer_source
+
+
+def reset_scorer() -> None:
+    """Forget the cached scorer so the next call reloads the artifact."""
+    global _scorer
+    with _scorer_lock:
+        _scorer = None
@@ -0,0 +1,256 @@
+"""Offline training for the GNN precedence scorer.
+
+Streams ``train_logs``, ``train_schedules`` and ``overrides`` in timestamp
+order with server-side chunking (``yield_per``), cuts the merged stream into
+fixed windows and turns each window into one small training graph:
+
+- nodes: trains seen in the window, features ``[train_weight, 1]`` computed
+  exactly as ``OptimizerService`` does at inference time (delay lookback from
+  ``train_logs``, platform conflicts from ``train_schedules``, section
+  congestion from distinct trains logged in the window)
+- edges: consecutive trains logged in the same section and consecutive
+  departures from the same station platform
+- labels: controller decisions from ``overrides`` (1 = give_precedence).
+  Rows where the controller disagreed with ``ai_action`` get a higher sample
+  weight. Departures that conflicted on a platform get a weak label from
+  whether they left on time.
+
+Only the current window and the delay lookback are held in memory while
+streaming; the compact per-window tensors are kept for the training epochs.
+"""
+from __future__ import annotations
+
+import heapq
+import os
+import random
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+import torch
+import torch.nn.functional as F
+from sqlalchemy.orm import Session
+
+from app.db.models import Override, TrainLog, TrainSchedule
+from app.services.optimizer import train_weight
+
+from .gnn import build_edge_index
+from .gnn_model import MessagePassingScorer, reset_scorer
+
+CORRECTION_WEIGHT = 2.0
+OVERRIDE_WEIGHT = 1.0
+WEAK_LABEL_WEIGHT = 0.25
+PLATFORM_CONFLICT_SECONDS = 5 * 60
+
+
+class TrainingGraph(NamedTuple):
+    x: torch.Tensor
+    edge_index: torch.Tensor
+    label_idx: torch.Tensor
+    labels: torch.Tensor
+    weights: torch.Tensor
+
+
+def _naive_utc(ts: datetime) -> datetime:
+    # SQLite returns naive datetimes, Postgres aware ones; compare everything as naive UTC
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _stream_events(db: Session, chunk_size: int) -> Iterator[Tuple[datetime, int, Tuple[Any, ...]]]:
+    logs = (
+        db.query(TrainLog.timestamp, TrainLog.train_id, TrainLog.section_id, TrainLog.delay_minutes)
+        .filter(TrainLog.timestamp.isnot(None))
+        .order_by(TrainLog.timestamp)
+        .yield_per(chunk_size)
+    )
+    schedules = (
+        db.query(TrainSchedule.planned_departure, TrainSchedule.train_id, TrainSchedule.station_id, TrainSchedule.planned_platform, TrainSchedule.delay_minutes, TrainSchedule.actual_departure)
+        .filter(TrainSchedule.planned_departure.isnot(None))
+        .order_by(TrainSchedule.planned_departure)
+        .yield_per(chunk_size)
+    )
+    overrides = (
+        db.query(Override.timestamp, Override.train_id, Override.action, Override.ai_action)
+        .filter(Override.timestamp.isnot(None))
+        .order_by(Override.timestamp)
+        .yield_per(chunk_size)
+    )
+    def tagged(kind: int, rows: Any) -> Iterator[Tuple[datetime, int, Tuple[Any, ...]]]:
+        for r in rows:
+            yield _naive_utc(r[0]), kind, tuple(r[1:])
+
+    # The int tag orders same-timestamp events: logs, then schedules, then overrides
+    return heapq.merge(tagged(0, logs), tagged(1, schedules), tagged(2, overrides), key=lambda e: (e[0], e[1]))
+
+
+def _action_label(action: str | None) -> float | None:
+    a = (action or "").lower()
+    if "precedence" in a:
+        return 1.0
+    if "hold" in a:
+        return 0.0
+    return None
+
+
+def iter_training_graphs(
+    db: Session,
+    window_minutes: int = 30,
+    delay_lookback_minutes: int = 60,
+    chunk_size: int = 5000,
+) -> Iterator[TrainingGraph]:
+    """Yield one labelled graph per window of the merged event stream."""
+    window = timedelta(minutes=window_minutes)
+    lookback = timedelta(minutes=delay_lookback_minutes)
+
+    recent_delays: deque[Tuple[datetime, str, int]] = deque()
+    delay_sums: Dict[str, Tuple[int, int]] = {}
+    last_departure: Dict[Tuple[str, str], Tuple[datetime, str]] = {}
+
+    bucket_end: datetime | None = None
+    nodes: Dict[str, int] = {}
+    section_of: Dict[str, str] = {}
+    section_seq: Dict[str, List[str]] = {}
+    platform_seq: Dict[Tuple[str, str], List[str]] = {}
+    conflicted: set[str] = set()
+    labels: Dict[str, Tuple[float, float]] = {}
+
+    def node(train_id: str) -> None:
+        if train_id not in nodes:
+            nodes[train_id] = len(nodes)
+
+    def label(train_id: str, y: float, weight: float) -> None:
+        if train_id not in labels or labels[train_id][1] <= weight:
+            labels[train_id] = (y, weight)
+
+    def close_bucket() -> TrainingGraph | None:
+        while recent_delays and recent_delays[0][0] < bucket_end - lookback:
+            _ts, t, d = recent_delays.popleft()
+            s, c = delay_sums[t]
+            delay_sums[t] = (s - d, c - 1)
+        if not labels:
+            return None
+        congestion = {sec: len(set(seq)) for sec, seq in section_seq.items()}
+        trains = list(nodes)
+        feats = []
+        for t in trains:
+            s, c = delay_sums.get(t, (0, 0))
+            w = train_weight(s / c if c > 0 else 0.0, t in conflicted, congestion.get(section_of.get(t, ""), 0))
+            feats.append((w, 1.0))
+        edges: List[Tuple[int, int]] = []
+        for seq in list(section_seq.values()) + list(platform_seq.values()):
+            edges.extend((nodes[a], nodes[b]) for a, b in zip(seq, seq[1:]) if a != b)
+        label_items = sorted(labels.items(), key=lambda kv: nodes[kv[0]])
+        return TrainingGraph(
+            x=torch.tensor(feats, dtype=torch.float32),
+            edge_index=build_edge_index(edges, len(trains)),
+            label_idx=torch.tensor([nodes[t] for t, _ in label_items], dtype=torch.long),
+            labels=torch.tensor([y for _, (y, _w) in label_items], dtype=torch.float32),
+            weights=torch.tensor([w for _, (_y, w) in label_items], dtype=torch.float32),
+        )
+
+    for ts, kind, row in _stream_events(db, chunk_size):
+        if bucket_end is None or ts >= bucket_end:
+            if bucket_end is not None:
+                graph = close_bucket()
+                if graph is not None:
+                    yield graph
+            epoch = datetime(1970, 1, 1)
+            bucket_end = epoch + ((ts - epoch) // window + 1) * window
+            nodes, section_of, section_seq, platform_seq, labels = {}, {}, {}, {}, {}
+            conflicted = set()
+
+        if kind == 0:
+            train_id, section_id, delay = row
+            node(train_id)
+            section_of[train_id] = section_id
+            section_seq.setdefault(section_id, []).append(train_id)
+            if delay is not None:
+                recent_delays.append((ts, train_id, int(delay)))
+                s, c = delay_sums.get(train_id, (0, 0))
+                delay_sums[train_id] = (s + int(delay), c + 1)
+        elif kind == 1:
+            train_id, station_id, platform, delay, actual_departure = row
+            node(train_id)
+            if not platform:
+                continue
+            key = (station_id, platform)
+            platform_seq.setdefault(key, []).append(train_id)
+            prev = last_departure.get(key)
+            last_departure[key] = (ts, train_id)
+            if prev is not None and (ts - prev[0]).total_seconds() <= PLATFORM_CONFLICT_SECONDS:
+                conflicted.update((train_id, prev[1]))
+                if actual_departure is not None:
+                    label(train_id, 1.0 if (delay or 0) <= 5 else 0.0, WEAK_LABEL_WEIGHT)
+        else:
+            train_id, action, ai_action = row
+            y = _action_label(action)
+            if y is None:
+                continue
+            node(train_id)
+            corrected = ai_action is not None and ai_action != action
+            label(train_id, y, CORRECTION_WEIGHT if corrected else OVERRIDE_WEIGHT)
+
+    if bucket_end is not None:
+        graph = close_bucket()
+        if graph is not None:
+            yield graph
+
+
+def _pack(graphs: Sequence[TrainingGraph]) -> TrainingGraph:
+    # Block-diagonal batch: shift node indices by the running node count
+    offset = 0
+    xs, edges, idx = [], [], []
+    for g in graphs:
+        xs.append(g.x)
+        edges.append(g.edge_index + offset)
+        idx.append(g.label_idx + offset)
+        offset += g.x.shape[0]
+    return TrainingGraph(
+        x=torch.cat(xs),
+        edge_index=torch.cat(edges, dim=1),
+        label_idx=torch.cat(idx),
+        labels=torch.cat([g.labels for g in graphs]),
+        weights=torch.cat([g.weights for g in graphs]),
+    )
+
+
+def train_scorer(
+    graphs: Sequence[TrainingGraph],
+    epochs: int = 50,
+    lr: float = 0.01,
+    hidden: int = 16,
+    batch_graphs: int = 64,
+    seed: int = 0,
+) -> Tuple[MessagePassingScorer, float]:
+    """Fit MessagePassingScorer with weighted BCE on labelled nodes. Returns (model, last epoch loss)."""
+    torch.manual_seed(seed)
+    rng = random.Random(seed)
+    model = MessagePassingScorer(hidden=hidden)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    order = list(range(len(graphs)))
+    epoch_loss = 0.0
+    model.train()
+    for _ in range(epochs):
+        rng.shuffle(order)
+        total, weight_sum = 0.0, 0.0
+        for start in range(0, len(order), batch_graphs):
+            batch = _pack([graphs[i] for i in order[start:start + batch_graphs]])
+            prob = (model(batch.x, batch.edge_index).index_select(0, batch.label_idx) + 1.0) / 2.0
+            loss = F.binary_cross_entropy(prob.clamp(1e-6, 1.0 - 1e-6), batch.labels, weight=batch.weights, reduction="sum") / batch.weights.sum()
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * float(batch.weights.sum())
+            weight_sum += float(batch.weights.sum())
+        epoch_loss = total / weight_sum if weight_sum else 0.0
+    model.eval()
+    return model, epoch_loss
+
+
+def export_scorer(model: MessagePassingScorer, path: str) -> None:
+    """Save a TorchScript artifact and make this process reload it on next use."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    torch.jit.script(model).save(path)
+    reset_scorer()
@@ -1,71 +1,202 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
 
 from .base import OptimizerBackend, to_response
 from .gnn import SimpleGnnScorer
 from .subqubo import QuboInspiredOptimizer
 from .milp import MilpOptimizer
+from .cpsat import CpSatOptimizer
+from .problem import problem_of
+
+
+ENSEMBLE_MEMBERS = {
+    "milp": MilpOptimizer,
+    "qubo": QuboInspiredOptimizer,
+    "cpsat": CpSatOptimizer,
+}
+
+
+# Request key carrying each member's solver time limit, and the member's default (None: unlimited)
+MEMBER_TIME_LIMITS = {
+    "milp": ("milp_time_limit_s", None),
+    "cpsat": ("cpsat_time_limit_s", 2.0),
+}
+
+
+def _run_member(
+    kind: str, request: Dict[str, Any], context: Dict[str, Any], deadline_ts: float | None = None
+) -> Tuple[Dict[str, Any], float]:
+    # Runs in a pool worker; returns the member result and its own runtime. A future
+    # that is already running cannot be cancelled, so the race deadline (wall clock,
+    # taken when the member actually starts) becomes the solver's own time limit
+    started = time.perf_counter()
+    if deadline_ts is not None and kind in MEMBER_TIME_LIMITS:
+        key, default = MEMBER_TIME_LIMITS[kind]
+        remaining = max(0.01, deadline_ts - time.time())
+        limit = request.get(key, default)
+        request = {**request, key: remaining if limit is None else min(float(limit), remaining)}
+    if kind == "cpsat" and not request.get("cpsat_num_workers"):
+        # Every pool worker may be searching at once; CP-SAT's default of one thread per core would oversubscribe
+        from app.services.workers import pool_size
+
+        request = {**request, "cpsat_num_workers": max(1, (os.cpu_count() or 1) // pool_size())}
+    result = ENSEMBLE_MEMBERS[kind]().optimize(request, context)
+    return result, time.perf_counter() - started
+
+
+def _merge(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Ensemble: combine by max priority_score; ties keep the earlier member (MILP first)
+    by_id: dict[str, dict] = {}
+    for res in results:
+        for r in res.get("recommendations", []):
+            t = r.get("train_id")
+            if not t:
+                continue
+            cur = by_id.get(t)
+            if cur is None or (r.get("priority_score", 0) or 0) > (cur.get("priority_score", 0) or 0):
+                by_id[t] = r
+    combined = list(by_id.values())
+    combined.sort(key=lambda r: r.get("priority_score", 0) or 0, reverse=True)
+    return combined
 
 
 class HybridOptimizer(OptimizerBackend):
     """Two-stage hybrid: GNN biases weights → MILP/QUBO final decision.
 
     - Stage 1: run GNN scorer to get bias scores b_i.
-    - Stage 2: adjust train_weights' w_i' = α w_i + (1-α) b_i.
-    - Stage 3: choose solver (MILP by default; QUBO if requested).
+    - Stage 2: reweight the shared problem w_i' = α w_i + (1-α) b_i.
+    - Stage 3: choose solver (MILP by default; QUBO or CP-SAT if requested).
+
+    With ``hybrid_solver`` "both"/"ensemble" (MILP + QUBO) or "all" (+ CP-SAT)
+    the members run concurrently in the shared process pool under one
+    ``hybrid_deadline_s``, which also caps each member's solver time limit.
+    Whatever finished by then is merged; the race ends early once a member
+    reports an OPTIMAL solution.
     """
 
     def optimize(self, request: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
         alpha = float(request.get("hybrid_alpha", 0.7))
         solver_kind = str(request.get("hybrid_solver", "milp")).lower()
 
+        # Built once; every stage and pool worker shares the same arrays
+        problem = problem_of(context)
+        stage_context = {"problem": problem, "schedule_events": context.get("schedule_events", [])}
+
         # Stage 1: GNN scorer
         gnn = SimpleGnnScorer()
-        gnn_res = gnn.optimize(request, context)
-        bias_by_train = {r["train_id"]: float((r.get("priority_score") or 0.5) * 2.0 - 1.0) for r in gnn_res.get("recommendations", [])}
+        gnn_res = gnn.optimize(request, stage_context)
+        bias = np.zeros(problem.size)
+        for r in gnn_res.get("recommendations", []):
+            i = problem.index.get(r["train_id"])
+            if i is not None:
+                bias[i] = float((r.get("priority_score") or 0.5) * 2.0 - 1.0)
 
         # Stage 2: reweight
-        base_weights = dict(context.get("train_weights", {}))
-        for t in list(base_weights.keys()):
-            b = bias_by_train.get(t, 0.0)
-            base_weights[t] = float(alpha * base_weights[t] + (1.0 - alpha) * b)
-
-        hybrid_context = dict(context)
-        hybrid_context["train_weights"] = base_weights
+        hybrid_context = dict(stage_context)
+        hybrid_context["problem"] = problem.with_weights(alpha * problem.weights + (1.0 - alpha) * bias)
 
         # Stage 3: final solver(s)
         explanations = ["Hybrid: GNN-bias + final MILP/QUBO", f"alpha={alpha}"] + gnn_res.get("explanations", [])
 
         if solver_kind in ("both", "ensemble", "all"):
-            milp = MilpOptimizer().optimize(request, hybrid_context)
-            qubo = QuboInspiredOptimizer().optimize(request, hybrid_context)
-            explanations += milp.get("explanations", []) + qubo.get("explanations", [])
-
-            # Ensemble: combine by max priority_score; break ties preferring MILP
-            by_id: dict[str, dict] = {}
-            for res in (milp, qubo):
-                for r in res.get("recommendations", []):
-                    t = r.get("train_id")
-                    if not t:
-                        continue
-                    cur = by_id.get(t)
-                    if cur is None or (r.get("priority_score", 0) or 0) > (cur.get("priority_score", 0) or 0):
-                        by_id[t] = r
-                    elif (r.get("priority_score", 0) or 0) == (cur.get("priority_score", 0) or 0):
-                        # tie: prefer MILP if present
-                        if res is milp:
-                            by_id[t] = r
-            combined = list(by_id.values())
-            combined.sort(key=lambda r: r.get("priority_score", 0) or 0, reverse=True)
-            return to_response(combined[:5], explanations)
+            kinds = ["milp", "qubo"] + (["cpsat"] if solver_kind == "all" else [])
+            deadline_s = float(request.get("hybrid_deadline_s", 2.0))
+            results, members = self._race(kinds, request, hybrid_context, deadline_s)
+            for res in results:
+                explanations += res.get("explanations", [])
+            explanations.append("Ensemble: " + ", ".join(
+                f"{m['member']} {m['runtime_ms']}ms{'' if m['made_cut'] else ' (' + m['status'].lower() + ')'}" for m in members
+            ))
+            response = to_response(_merge(results)[:5], explanations)
+            response["solver"] = {
+                "backend": "ensemble",
+                "status": "OPTIMAL" if any(m.get("status") == "OPTIMAL" for m in members) else ("FEASIBLE" if results else "NO_RESULT"),
+                "deadline_s": deadline_s,
+                "members": members,
+            }
+            return response
 
         # Single solver path
         if solver_kind == "qubo":
             final_res = QuboInspiredOptimizer().optimize(request, hybrid_context)
+        elif solver_kind == "cpsat":
+            final_res = CpSatOptimizer().optimize(request, hybrid_context)
         else:
             final_res = MilpOptimizer().optimize(request, hybrid_context)
         explanations += final_res.get("explanations", [])
-        return to_response(final_res.get("recommendations", []), explanations)
+        response = to_response(final_res.get("recommendations", []), explanations)
+        if final_res.get("solver"):
+            response["solver"] = final_res["solver"]
+        return response
+
+    def _race(
+        self, kinds: List[str], request: Dict[str, Any], context: Dict[str, Any], deadline_s: float
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Run members concurrently until the deadline or an optimality proof.
+
+        Returns the finished results (in member order) and a report per member.
+        """
+        from app.services.workers import get_process_pool, reset_process_pool
+
+        started = time.perf_counter()
+        deadline_ts = time.time() + deadline_s
+        finished: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        futures: Dict[Future, str] = {}
+        cancelled: set[str] = set()
+        proved = False
+        try:
+            pool = get_process_pool()
+            futures = {pool.submit(_run_member, kind, request, context, deadline_ts): kind for kind in kinds}
+            pending = set(futures)
+            while pending:
+                remaining = deadline_s - (time.perf_counter() - started)
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    try:
+                        finished[futures[fut]] = fut.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception:
+                        continue
+                    proved = proved or (finished[futures[fut]][0].get("solver") or {}).get("status") == "OPTIMAL"
+                if proved:
+                    break
+            # Only members still queued can be cancelled; running ones stop at their own time limit
+            cancelled = {futures[fut] for fut in pending if fut.cancel()}
+        except BrokenProcessPool:
+            reset_process_pool()
 
+        if not finished:
+            # Nothing made the cut (e.g. cold worker start): answer with the fast QUBO member inline
+            finished["qubo"] = _run_member("qubo", request, context)
 
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        members: List[Dict[str, Any]] = []
+        for kind in kinds:
+            if kind in finished:
+                res, runtime = finished[kind]
+                members.append({
+                    "member": kind,
+                    "runtime_ms": int(runtime * 1000),
+                    "made_cut": True,
+                    "status": (res.get("solver") or {}).get("status", "FEASIBLE" if res.get("recommendations") else "NO_RESULT"),
+                })
+            else:
+                if kind in cancelled:
+                    status = "CANCELLED"
+                elif proved:
+                    # Still running in the pool (until its time limit); its answer is not awaited
+                    status = "NOT_AWAITED"
+                else:
+                    status = "TIMEOUT"
+                members.append({"member": kind, "runtime_ms": elapsed_ms, "made_cut": False, "status": status})
+        return [finished[k][0] for k in kinds if k in finished], members
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List
 
 from ortools.linear_solver import pywraplp
 
 from .base import OptimizerBackend, to_response
+from .problem import problem_of
 
 
 class MilpOptimizer(OptimizerBackend):
@@ -13,54 +14,65 @@ class MilpOptimizer(OptimizerBackend):
     Binary y_i: give precedence to train i.
     Maximize Σ w_i y_i subject to:
       - For each conflict pair (i,j), y_i + y_j ≤ 1 (avoid simultaneous precedence)
+
+    CBC runs to optimality unless ``milp_time_limit_s`` bounds it, in which
+    case the best incumbent found by then is returned as FEASIBLE.
     """
 
     def optimize(self, request: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
-        candidates: List[str] = context.get("candidate_trains", [])
-        weights: Dict[str, float] = context.get("train_weights", {})
-        conflicts: List[Tuple[str, str]] = context.get("pairwise_conflicts", [])
+        problem = problem_of(context)
 
-        if not candidates:
+        if not problem.size:
             return to_response([], ["MILP: no candidates"])
 
         solver = pywraplp.Solver.CreateSolver("CBC")
         if solver is None:
             return to_response([], ["MILP: solver unavailable"])
 
-        vars_by_train: Dict[str, pywraplp.Variable] = {}
-        for t in candidates:
-            vars_by_train[t] = solver.BoolVar(f"y_{t}")
+        y: List[pywraplp.Variable] = [solver.BoolVar(f"y_{i}") for i in range(problem.size)]
 
         # Objective
         objective = solver.Objective()
-        for t in candidates:
-            objective.SetCoefficient(vars_by_train[t], float(weights.get(t, 0.0)))
+        for i, w in enumerate(problem.weights.tolist()):
+            objective.SetCoefficient(y[i], w)
         objective.SetMaximization()
 
         # Conflict constraints
-        for a, b in conflicts:
-            if a in vars_by_train and b in vars_by_train and a != b:
-                ct = solver.Constraint(-solver.infinity(), 1, f"conf_{a}_{b}")
-                ct.SetCoefficient(vars_by_train[a], 1)
-                ct.SetCoefficient(vars_by_train[b], 1)
+        for i, j in problem.conflict_pairs.tolist():
+            ct = solver.Constraint(-solver.infinity(), 1, f"conf_{i}_{j}")
+            ct.SetCoefficient(y[i], 1)
+            ct.SetCoefficient(y[j], 1)
 
         # Optional: limit number of precedence trains
         k_limit = int(request.get("milp_max_precedence", 5))
         if k_limit > 0:
             ct = solver.Constraint(-solver.infinity(), k_limit, "limit_precedence")
-            for t in candidates:
-                ct.SetCoefficient(vars_by_train[t], 1)
+            for var in y:
+                ct.SetCoefficient(var, 1)
+
+        time_limit_s = request.get("milp_time_limit_s")
+        if time_limit_s is not None:
+            solver.SetTimeLimit(max(1, int(float(time_limit_s) * 1000)))
 
         status = solver.Solve()
+        if status == pywraplp.Solver.NOT_SOLVED and time_limit_s is not None:
+            return to_response([], [f"MILP: no solution within {float(time_limit_s):g}s"])
         if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
             return to_response([], ["MILP: infeasible or no solution"])
+        solver_info: Dict[str, Any] = {
+            "backend": "milp",
+            "status": "OPTIMAL" if status == pywraplp.Solver.OPTIMAL else "FEASIBLE",
+            "objective": solver.Objective().Value(),
+            "best_bound": solver.Objective().BestBound(),
+            "wall_time_s": round(solver.wall_time() / 1000.0, 4),
+        }
 
         recommendations: List[Dict[str, Any]] = []
         explanations: List[str] = ["MILP: maximize weighted precedence under conflict constraints"]
-        for t in candidates:
-            val = vars_by_train[t].solution_value()
+        for i, (t, w) in enumerate(zip(problem.train_ids, problem.weights.tolist())):
+            val = y[i].solution_value()
             action = "give_precedence" if val >= 0.5 else "hold_for_clearance"
-            score = float(max(0.0, min(1.0, (weights.get(t, 0.0) + 1.0) / 2.0)))
+            score = float(max(0.0, min(1.0, (w + 1.0) / 2.0)))
             recommendations.append({
                 "train_id": t,
                 "action": action,
@@ -69,6 +81,8 @@ class MilpOptimizer(OptimizerBackend):
             })
 
         recommendations.sort(key=lambda r: r.get("priority_score", 0), reverse=True)
-        return to_response(recommendations[:5], explanations)
+        response = to_response(recommendations[:5], explanations)
+        response["solver"] = solver_info
+        return response
 
 
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import dataclasses
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+
+def _unique_pairs(pairs: np.ndarray, n: int) -> np.ndarray:
+    """Canonical (i < j), de-duplicated, in-range pairs as an int64 [P, 2] array."""
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    lo, hi = pairs.min(axis=1), pairs.max(axis=1)
+    keep = (lo != hi) & (lo >= 0) & (hi < n)
+    flat = np.unique(lo[keep] * n + hi[keep])
+    return np.stack((flat // n, flat % n), axis=1)
+
+
+def _readonly(a: np.ndarray) -> np.ndarray:
+    a.setflags(write=False)
+    return a
+
+
+@dataclass(frozen=True)
+class OptimizationProblem:
+    """Immutable, array-backed view of one optimization request.
+
+    Built once per request and shared by every backend (and shipped to pool
+    workers), so no stage rebuilds index maps, weight lists or pair lists:
+
+    - ``train_ids``: interned train ids; node i is ``train_ids[i]``
+    - ``weights``: float64 [N] utility per train
+    - ``conflict_pairs``: int64 [C, 2] mutually exclusive pairs with i < j
+    - ``conflict_indptr`` / ``conflict_indices``: symmetric CSR adjacency of the
+      conflict pairs (neighbours of i are ``indices[indptr[i]:indptr[i+1]]``)
+    - ``edge_index``: int64 [E, 2] graph edges with i < j for message passing
+
+    Arrays are read-only; use ``with_weights`` to derive a reweighted problem.
+    Only the arrays are pickled; ``index`` is rebuilt on load.
+    """
+
+    train_ids: Tuple[str, ...]
+    weights: np.ndarray
+    conflict_pairs: np.ndarray
+    conflict_indptr: np.ndarray
+    conflict_indices: np.ndarray
+    edge_index: np.ndarray
+    index: Dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "index", {t: i for i, t in enumerate(self.train_ids)})
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (
+            OptimizationProblem,
+            (self.train_ids, self.weights, self.conflict_pairs, self.conflict_indptr, self.conflict_indices, self.edge_index),
+        )
+
+    @classmethod
+    def build(
+        cls,
+        train_ids: Sequence[str],
+        weights: Sequence[float] | np.ndarray,
+        conflict_pairs: np.ndarray | Sequence[Tuple[int, int]] = (),
+        edges: np.ndarray | Sequence[Tuple[int, int]] = (),
+    ) -> "OptimizationProblem":
+        n = len(train_ids)
+        pairs = _unique_pairs(np.asarray(conflict_pairs, dtype=np.int64), n)
+        src = np.concatenate((pairs[:, 0], pairs[:, 1]))
+        dst = np.concatenate((pairs[:, 1], pairs[:, 0]))
+        order = np.argsort(src, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return cls(
+            train_ids=tuple(sys.intern(str(t)) for t in train_ids),
+            weights=_readonly(np.array(weights, dtype=np.float64).reshape(n)),
+            conflict_pairs=_readonly(pairs),
+            conflict_indptr=_readonly(indptr),
+            conflict_indices=_readonly(dst[order]),
+            edge_index=_readonly(_unique_pairs(np.asarray(edges, dtype=np.int64), n)),
+        )
+
+    @classmethod
+    def from_context(cls, context: Dict[str, Any]) -> "OptimizationProblem":
+        """Build from the dict form (candidate_trains / train_weights / pairwise_conflicts / graph_edges)."""
+        trains = list(context.get("candidate_trains", []))
+        base_weights: Dict[str, float] = context.get("train_weights", {})
+        index = {t: i for i, t in enumerate(trains)}
+        pairs = [(index[a], index[b]) for a, b in context.get("pairwise_conflicts", []) if a in index and b in index]
+        return cls.build(trains, [float(base_weights.get(t, 0.0)) for t in trains], pairs, context.get("graph_edges", []))
+
+    @property
+    def size(self) -> int:
+        return len(self.train_ids)
+
+    def neighbors(self, i: int) -> np.ndarray:
+        return self.conflict_indices[self.conflict_indptr[i]:self.conflict_indptr[i + 1]]
+
+    def with_weights(self, weights: np.ndarray) -> "OptimizationProblem":
+        return dataclasses.replace(self, weights=_readonly(np.array(weights, dtype=np.float64).reshape(self.size)))
+
+
+def problem_of(context: Dict[str, Any]) -> OptimizationProblem:
+    """The request's shared problem, or one built from a dict-style context."""
+    problem = context.get("problem")
+    if isinstance(problem, OptimizationProblem):
+        return problem
+    return OptimizationProblem.from_context(context)
@@ -5,6 +5,7 @@ import random
 from typing import Any, Dict, List, Tuple
 
 from .base import OptimizerBackend, to_response
+from .problem import problem_of
 
 
 class QuboInspiredOptimizer(OptimizerBackend):
@@ -20,23 +21,15 @@ class QuboInspiredOptimizer(OptimizerBackend):
     """
 
     def optimize(self, request: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
-        candidates: List[str] = context.get("candidate_trains", [])
-        weights: Dict[str, float] = context.get("train_weights", {})
-        conflicts: List[Tuple[str, str]] = context.get("pairwise_conflicts", [])
+        problem = problem_of(context)
 
-        if not candidates:
+        if not problem.size:
             return to_response([], ["QUBO: no candidates"])
 
-        # Build index for quick lookups
-        index_of: Dict[str, int] = {t: i for i, t in enumerate(candidates)}
-        w: List[float] = [float(weights.get(t, 0.0)) for t in candidates]
-        pairs: List[Tuple[int, int]] = []
-        for a, b in conflicts:
-            if a in index_of and b in index_of and a != b:
-                i, j = index_of[a], index_of[b]
-                if i > j:
-                    i, j = j, i
-                pairs.append((i, j))
+        w: List[float] = problem.weights.tolist()
+        pairs: List[Tuple[int, int]] = [(i, j) for i, j in problem.conflict_pairs.tolist()]
+        # Conflict neighbours per variable (CSR rows), so a flip costs O(degree)
+        neighbors: List[List[int]] = [problem.neighbors(k).tolist() for k in range(problem.size)]
 
         # Hyperparameters
         lambda_pair = float(request.get("qubo_lambda_pair", 0.7))
@@ -60,12 +53,7 @@ class QuboInspiredOptimizer(OptimizerBackend):
             xk = assign[k]
             new_xk = 1 - xk
             delta_linear = -w[k] * (new_xk - xk)
-            delta_quad = 0.0
-            for i, j in pairs:
-                if i == k:
-                    delta_quad += (new_xk - xk) * assign[j]
-                elif j == k:
-                    delta_quad += (new_xk - xk) * assign[i]
+            delta_quad = (new_xk - xk) * sum(assign[j] for j in neighbors[k])
             return delta_linear + lambda_pair * delta_quad
 
         best_x = list(x)
@@ -87,7 +75,7 @@ class QuboInspiredOptimizer(OptimizerBackend):
             "QUBO-inspired SA: minimize -Σ w_i x_i + λ Σ_{conflict} x_i x_j",
             f"lambda_pair={lambda_pair}, steps={max_steps}",
         ]
-        for i, train_id in enumerate(candidates):
+        for i, train_id in enumerate(problem.train_ids):
             action = "give_precedence" if best_x[i] == 1 else "hold_for_clearance"
             recommendations.append({
                 "train_id": train_id,
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import DelaySketch, RollupWatermark, SectionRollup, Train, TrainLog, TrainPosition
+from app.services.sketches import TDigest
+
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "section_rollups"
+MINUTE, HOUR = "minute", "hour"
+GRAIN_FORMAT = {MINUTE: "%Y-%m-%d %H:%M:00", HOUR: "%Y-%m-%d %H:00:00"}
+
+# One compaction at a time per process; report requests wait on an in-flight one.
+# Across processes (several workers, an admin rebuild) _lock_rollups serialises them
+_compact_lock = threading.Lock()
+
+
+def _utc(ts: datetime) -> datetime:
+	# SQLite returns naive datetimes (stored as UTC), Postgres aware ones in the session time zone
+	return ts.astimezone(timezone.utc) if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def floor_minute(ts: datetime) -> datetime:
+	return ts.replace(second=0, microsecond=0)
+
+
+def floor_hour(ts: datetime) -> datetime:
+	return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(ts: datetime) -> datetime:
+	floored = floor_hour(ts)
+	return floored if floored == ts else floored + timedelta(hours=1)
+
+
+def truncate(db: Session, grain: str, column: Any) -> Any:
+	# Dialect-aware truncation, as in the report endpoints
+	dialect = db.bind.dialect.name if db.bind is not None else "sqlite"
+	if dialect == "postgresql":
+		return func.date_trunc(grain, column)
+	return func.strftime(GRAIN_FORMAT[grain], column)
+
+
+def parse_bucket(value: Any, grain: str) -> datetime:
+	if isinstance(value, datetime):
+		return _utc(value)
+	return datetime.strptime(str(value), GRAIN_FORMAT[grain]).replace(tzinfo=timezone.utc)
+
+
+def _aggregate(db: Session, grain: str, lo: datetime, hi: datetime) -> Dict[Tuple[datetime, str, str], Dict[str, Any]]:
+	"""Rollup rows for [lo, hi) at one grain: one grouped query over positions, one over logs"""
+	rows: Dict[Tuple[datetime, str, str], Dict[str, Any]] = {}
+
+	def row(bucket: Any, section_id: str | None, class_type: str | None) -> Dict[str, Any]:
+		key = (parse_bucket(bucket, grain), section_id or "", class_type or "")
+		return rows.setdefault(key, {
+			"position_count": 0, "distinct_trains": 0, "speed_sum": 0.0,
+			"log_count": 0, "delay_count": 0, "delay_sum": 0.0,
+		})
+
+	bucket = truncate(db, grain, TrainPosition.timestamp)
+	for b, section_id, class_type, count, distinct, speed_sum in db.execute(
+		select(
+			bucket,
+			TrainPosition.section_id,
+			Train.class_type,
+			func.count(TrainPosition.id),
+			func.count(func.distinct(TrainPosition.train_id)),
+			func.sum(TrainPosition.speed_kmph),
+		)
+		.join(Train, Train.id == TrainPosition.train_id, isouter=True)
+		.where(TrainPosition.timestamp >= lo, TrainPosition.timestamp < hi)
+		.group_by(bucket, TrainPosition.section_id, Train.class_type)
+	):
+		r = row(b, section_id, class_type)
+		r.update(position_count=int(count), distinct_trains=int(distinct), speed_sum=float(speed_sum or 0.0))
+
+	bucket = truncate(db, grain, TrainLog.timestamp)
+	for b, section_id, class_type, count, delay_count, delay_sum in db.execute(
+		select(
+			bucket,
+			TrainLog.section_id,
+			Train.class_type,
+			func.count(TrainLog.id),
+			func.count(TrainLog.delay_minutes),
+			func.sum(TrainLog.delay_minutes),
+		)
+		.join(Train, Train.id == TrainLog.train_id, isouter=True)
+		.where(TrainLog.timestamp >= lo, TrainLog.timestamp < hi)
+		.group_by(bucket, TrainLog.section_id, Train.class_type)
+	):
+		r = row(b, section_id, class_type)
+		r.update(log_count=int(count), delay_count=int(delay_count), delay_sum=float(delay_sum or 0.0))
+	return rows
+
+
+def _delay_sketches(db: Session, lo: datetime, hi: datetime) -> List[DelaySketch]:
+	"""One t-digest of delay_minutes per (hour, section) for [lo, hi), streamed one group at a time"""
+	bucket = truncate(db, HOUR, TrainLog.timestamp)
+	rows = db.execute(
+		select(bucket, TrainLog.section_id, TrainLog.delay_minutes)
+		.where(TrainLog.timestamp >= lo, TrainLog.timestamp < hi, TrainLog.delay_minutes.isnot(None))
+		.order_by(bucket, TrainLog.section_id)
+		.execution_options(yield_per=5000)
+	)
+	sketches = []
+	for (b, section_id), group in itertools.groupby(rows, key=lambda r: (r[0], r[1])):
+		digest = TDigest.of([r[2] for r in group])
+		sketches.append(DelaySketch(
+			hour_start=parse_bucket(b, HOUR), section_id=section_id or "",
+			delay_count=int(digest.count), digest=digest.to_bytes(),
+		))
+	return sketches
+
+
+def _lock_rollups(db: Session) -> bool:
+	"""Hold the database-wide rollup lock until the transaction ends; False if SQLite stayed busy
+
+	Postgres takes a transaction-scoped advisory lock. SQLite takes its
+	write lock with a no-op write, so it is held before the watermark is
+	read rather than at the first delete.
+	"""
+	dialect = db.bind.dialect.name if db.bind is not None else "sqlite"
+	if dialect == "postgresql":
+		db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": WATERMARK_NAME})
+		return True
+	try:
+		db.execute(
+			update(RollupWatermark)
+			.where(RollupWatermark.name == WATERMARK_NAME)
+			.values(watermark=RollupWatermark.watermark)
+			.execution_options(synchronize_session=False)
+		)
+	except OperationalError as exc:
+		# Another process has been compacting for longer than the busy timeout
+		if "locked" not in str(exc):
+			raise
+		db.rollback()
+		return False
+	return True
+
+
+def compact(db: Session, now: datetime | None = None, max_lag_s: float | None = None) -> Dict[str, Any]:
+	"""Bring ``section_rollups`` and ``delay_sketches`` up to ``now``
+
+	Minute and hour rows and hourly sketches are recomputed from the hour
+	containing ``watermark - ROLLUP_LATENESS_SECONDS`` onwards, so raw rows
+	arriving up to that late are still counted and every run is idempotent. The first
+	run backfills ``ROLLUP_RETENTION_HOURS``; rows older than that are
+	dropped. With ``max_lag_s`` nothing is done if another caller brought
+	the watermark within that lag while this one waited. Compactions in
+	other processes are waited for too; if SQLite stays locked past its busy
+	timeout the rollups are left as they are.
+	"""
+	now = now or datetime.now(timezone.utc)
+	with _compact_lock:
+		if not _lock_rollups(db):
+			return {"from": None, "to": None, "rows": 0}
+		state = db.execute(
+			select(RollupWatermark).where(RollupWatermark.name == WATERMARK_NAME).execution_options(populate_existing=True)
+		).scalar()
+		if max_lag_s is not None and state is not None and now - _utc(state.watermark) <= timedelta(seconds=max_lag_s):
+			# Release the rollup lock rather than hold it for the rest of the caller's session
+			db.rollback()
+			return {"from": None, "to": _utc(state.watermark).isoformat(), "rows": 0}
+		retention_start = floor_hour(now - timedelta(hours=settings.ROLLUP_RETENTION_HOURS))
+		if state is None:
+			lo = retention_start
+		else:
+			lo = max(retention_start, floor_hour(_utc(state.watermark) - timedelta(seconds=settings.ROLLUP_LATENESS_SECONDS)))
+
+		written = 0
+		db.execute(delete(SectionRollup).where(or_(SectionRollup.bucket_start >= lo, SectionRollup.bucket_start < retention_start)))
+		db.execute(delete(DelaySketch).where(or_(DelaySketch.hour_start >= lo, DelaySketch.hour_start < retention_start)))
+		for grain in (MINUTE, HOUR):
+			rows = _aggregate(db, grain, lo, now)
+			db.add_all(
+				SectionRollup(grain=grain, bucket_start=b, section_id=section_id, class_type=class_type, **values)
+				for (b, section_id, class_type), values in rows.items()
+			)
+			written += len(rows)
+		sketches = _delay_sketches(db, lo, now)
+		db.add_all(sketches)
+		written += len(sketches)
+		if state is None:
+			db.add(RollupWatermark(name=WATERMARK_NAME, watermark=now))
+		else:
+			state.watermark = now
+		db.commit()
+		return {"from": lo.isoformat(), "to": now.isoformat(), "rows": written}
+
+
+def rebuild(db: Session, now: datetime | None = None) -> Dict[str, Any]:
+	"""Drop every rollup and the watermark, then backfill the retention window from raw rows"""
+	with _compact_lock:
+		if not _lock_rollups(db):
+			return {"from": None, "to": None, "rows": 0}
+		db.execute(delete(SectionRollup))
+		db.execute(delete(RollupWatermark).where(RollupWatermark.name == WATERMARK_NAME))
+		db.commit()
+	return compact(db, now)
+
+
+def ensure_fresh(db: Session) -> datetime:
+	"""Compact inline when the background compactor is behind; returns the watermark reports can rely on"""
+	now = datetime.now(timezone.utc)
+	watermark = db.execute(select(RollupWatermark.watermark).where(RollupWatermark.name == WATERMARK_NAME)).scalar()
+	if watermark is not None and now - _utc(watermark) <= timedelta(seconds=settings.ROLLUP_MAX_LAG_SECONDS):
+		return _utc(watermark)
+	done = compact(db, now, max_lag_s=settings.ROLLUP_MAX_LAG_SECONDS)
+	if done["to"] is None:
+		# Another process held the rollups too long; serve what they hold
+		return _utc(watermark) if watermark is not None else now
+	return datetime.fromisoformat(done["to"])
+
+
+def window_filter(start: datetime, end: datetime) -> Any:
+	"""Rollup rows covering [start, end) exactly once, at minute precision
+
+	Whole hours come from hour rows; the ragged minutes at either end come
+	from minute rows, so a week-long window reads at most 168 + 120 buckets
+	per section and class.
+	"""
+	m0, m1 = floor_minute(start), floor_minute(end)
+	h0, h1 = ceil_hour(m0), floor_hour(m1)
+	if h0 >= h1:
+		return and_(SectionRollup.grain == MINUTE, SectionRollup.bucket_start >= m0, SectionRollup.bucket_start <= m1)
+	return or_(
+		and_(SectionRollup.grain == HOUR, SectionRollup.bucket_start >= h0, SectionRollup.bucket_start < h1),
+		and_(
+			SectionRollup.grain == MINUTE,
+			or_(
+				and_(SectionRollup.bucket_start >= m0, SectionRollup.bucket_start < h0),
+				and_(SectionRollup.bucket_start >= h1, SectionRollup.bucket_start <= m1),
+			),
+		),
+	)
+
+
+async def run_compactor_loop(interval_s: float) -> None:
+	"""Compact every ``interval_s`` in a worker thread so the event loop never blocks on it"""
+	from app.db.session import SessionLocal
+
+	def run() -> None:
+		with SessionLocal() as db:
+			compact(db)
+
+	while True:
+		try:
+			await asyncio.to_thread(run)
+		except Exception:
+			logger.exception("Rollup compaction failed")
+		await asyncio.sleep(interval_s)
@@ -0,0 +1,47 @@
+from .network import Network, load_network
+from .engine import (
+    BatchRun,
+    Effects,
+    InitialState,
+    SimRun,
+    batch_missed_connections,
+    batch_train_delays,
+    compile_disruptions,
+    disruption_window,
+    missed_connections,
+    simulate,
+    simulate_batch,
+    stack_effects,
+    train_delays,
+)
+from .counterfactual import evaluate_states
+from .snapshot import LiveStateSnapshot, StateFork, take_snapshot
+from .montecarlo import SimulationCancelled, iter_replications, run_replication, run_replications, scenario_seed, summarize
+
+__all__ = [
+    "Network",
+    "load_network",
+    "BatchRun",
+    "Effects",
+    "InitialState",
+    "SimRun",
+    "batch_missed_connections",
+    "batch_train_delays",
+    "compile_disruptions",
+    "disruption_window",
+    "missed_connections",
+    "simulate",
+    "simulate_batch",
+    "stack_effects",
+    "train_delays",
+    "evaluate_states",
+    "LiveStateSnapshot",
+    "StateFork",
+    "take_snapshot",
+    "SimulationCancelled",
+    "iter_replications",
+    "run_replication",
+    "run_replications",
+    "scenario_seed",
+    "summarize",
+]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List
+
+import numpy as np
+
+from .engine import Effects, InitialState, SimRun, missed_connections, simulate, train_delays
+from .network import MIN_TRANSFER_S, Network
+
+
+def _run_states(network: Network, baseline: SimRun, effects: Effects, states: List[InitialState]) -> Dict[str, np.ndarray]:
+    # Runs in a pool worker; one simulation per state, compact measures only
+    n = len(states)
+    out = {
+        "total_delay_minutes": np.empty(n),
+        "missed_connections": np.empty(n, dtype=np.int64),
+        "platform_waits": np.empty(n, dtype=np.int64),
+        "departures": np.empty(n, dtype=np.int64),
+    }
+    for row, state in enumerate(states):
+        run = simulate(network, effects, initial=state)
+        out["total_delay_minutes"][row] = train_delays(network, baseline, run).sum()
+        out["missed_connections"][row] = missed_connections(network, baseline, run, MIN_TRANSFER_S)
+        out["platform_waits"][row] = run.platform_waits
+        out["departures"][row] = np.count_nonzero(run.dep <= network.horizon_s)
+    return out
+
+
+def evaluate_states(
+    network: Network, baseline: SimRun, effects: Effects, states: List[InitialState]
+) -> Dict[str, np.ndarray]:
+    """Simulate every starting state under the same compiled effects.
+
+    The network, baseline and effects are built once by the caller. States
+    are split into one contiguous chunk per pool worker, so each worker
+    receives the shared setup once however many plans it runs. Returns
+    ``total_delay_minutes``, ``missed_connections``, ``platform_waits``
+    and ``departures`` (inside the horizon), one entry per state in order.
+    """
+    from app.services.workers import get_process_pool, pool_size, reset_process_pool
+
+    chunks = [c.tolist() for c in np.array_split(np.arange(len(states)), min(len(states), pool_size())) if len(c)]
+    if len(chunks) > 1:
+        try:
+            pool = get_process_pool()
+            futures = [pool.submit(_run_states, network, baseline, effects, [states[i] for i in c]) for c in chunks]
+            parts = [f.result() for f in futures]
+            return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+        except BrokenProcessPool:
+            reset_process_pool()
+    return _run_states(network, baseline, effects, states)
@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from .network import Network
+
+DEFAULT_HEADWAY_S = 180.0
+MIN_DWELL_S = 30.0
+# Late trains may claw back this share of a link's running time
+RUN_RECOVERY = 0.05
+SEVERITY = {"low": 0.5, "medium": 1.0, "high": 2.0}
+
+ARRIVE, READY, DEPART, RELEASE = 0, 1, 2, 3
+
+
+@dataclass
+class Effects:
+    """Disruptions compiled to per-stop and per-link effects.
+
+    - ``extra_dwell``: float64 [S] seconds added before a stop can depart
+    - ``closures``: link -> sorted (start, end) windows with no departures
+    - ``slow``: link -> (start, end, run factor, headway factor) windows
+    """
+
+    extra_dwell: np.ndarray
+    closures: Dict[int, List[Tuple[float, float]]] = field(default_factory=dict)
+    slow: Dict[int, List[Tuple[float, float, float, float]]] = field(default_factory=dict)
+
+
+class InitialState(NamedTuple):
+    """Live conditions at t0 that a run starts from.
+
+    - ``train_delay_s``: float64 [T] current delay; a train's first stop
+      inside the horizon is reached that much later than planned
+    - ``platform_busy_until``: float64 [P] simulation seconds until which a
+      platform is held by a train outside the horizon (-inf when free)
+    - ``train_priority``: int [T] replacing the class priorities at
+      contested platforms (None keeps the network's)
+    """
+
+    train_delay_s: np.ndarray
+    platform_busy_until: np.ndarray
+    train_priority: np.ndarray | None = None
+
+
+class SimRun(NamedTuple):
+    arr: np.ndarray
+    dep: np.ndarray
+    platform_waits: int
+    # Stops in the order they departed; a valid evaluation order for simulate_batch
+    order: np.ndarray
+
+
+def disruption_window(network: Network, disruption: Dict[str, Any]) -> Tuple[float, float]:
+    """(start, end) in simulation seconds; start_ts below 1e9 is read as seconds from now."""
+    start_ts = float(disruption.get("start_ts") or 0.0)
+    start = start_ts if start_ts < 1e9 else start_ts - network.t0
+    return start, start + max(0.0, float(disruption.get("duration_seconds") or 0))
+
+
+def compile_disruptions(
+    network: Network, disruptions: List[Dict[str, Any]], rng: np.random.Generator | None, expected: bool = False
+) -> Effects:
+    """Translate scenario disruptions into engine effects.
+
+    - track_block: links touching the area are closed for the window, then run
+      slow (x1.25 time, x1.5 headway) for half the duration times severity
+    - signal_failure: running time x(1 + 0.5m), headway x(1 + m) in the window
+    - platform_issue: +240·m s dwell for stops in the area during the window
+    - delay: each stop in the area and window is hit with probability 0.25·m
+      by an exponential primary delay (mean max(60 s, 0.2 · duration) · m)
+    - rolling_stock: round(2·m) trains in the area lose U(0.5, 1) · duration
+
+    m is the severity multiplier (low 0.5, medium 1, high 2). With
+    ``expected`` the random primary delays are replaced by their expected
+    value spread over the exposed stops (no rng needed).
+    """
+    effects = Effects(extra_dwell=np.zeros(network.n_stops))
+    link_from = np.array([a for a, _b in network.link_keys], dtype=np.int64)
+    link_to = np.array([b for _a, b in network.link_keys], dtype=np.int64)
+
+    for d in disruptions:
+        kind = d.get("type", "delay")
+        m = SEVERITY.get(d.get("severity", "medium"), 1.0)
+        start, end = disruption_window(network, d)
+        duration = end - start
+        area = network.stations_matching(d.get("section_id"), d.get("station_id"))
+        stops = np.flatnonzero(area[network.stop_station] & (network.arr >= start) & (network.arr < end))
+        links = np.flatnonzero(area[link_from] | area[link_to]).tolist() if len(link_from) else []
+
+        if kind == "track_block":
+            for l in links:
+                effects.closures.setdefault(l, []).append((start, end))
+                effects.slow.setdefault(l, []).append((end, end + 0.5 * duration * m, 1.25, 1.5))
+        elif kind == "signal_failure":
+            for l in links:
+                effects.slow.setdefault(l, []).append((start, end, 1.0 + 0.5 * m, 1.0 + m))
+        elif kind == "platform_issue":
+            effects.extra_dwell[stops] += 240.0 * m
+        elif kind == "delay":
+            p_hit, mean = min(1.0, 0.25 * m), max(60.0, 0.2 * duration) * m
+            if expected:
+                effects.extra_dwell[stops] += p_hit * mean
+                continue
+            hit = stops[rng.random(len(stops)) < p_hit]
+            effects.extra_dwell[hit] += rng.exponential(mean, len(hit))
+        elif kind == "rolling_stock":
+            trains, first = np.unique(network.stop_train[stops], return_index=True)
+            k = min(len(trains), max(1, int(round(2 * m))))
+            if expected:
+                if len(trains):
+                    effects.extra_dwell[stops[first]] += k / len(trains) * 0.75 * duration
+                continue
+            pick = rng.choice(len(trains), size=k, replace=False) if k else np.zeros(0, dtype=np.int64)
+            effects.extra_dwell[stops[first[pick]]] += rng.uniform(0.5, 1.0, k) * duration
+
+    for windows in effects.closures.values():
+        windows.sort()
+    return effects
+
+
+def simulate(
+    network: Network,
+    effects: Effects | None = None,
+    headway_s: float = DEFAULT_HEADWAY_S,
+    min_dwell_s: float = MIN_DWELL_S,
+    initial: InitialState | None = None,
+) -> SimRun:
+    """Run the timetable through a heap-based discrete-event simulation.
+
+    Events are (time, seq, kind, stop) tuples. A train arriving at a stop
+    takes its platform or queues for it (higher class first, then FIFO) and
+    holds it until departure. It may leave once the planned departure is
+    reached and at least ``min(planned dwell, min_dwell_s)`` has passed
+    (dwell recovery), plus any extra dwell from disruptions. Departures
+    reserve the directional link for one headway and wait out closures;
+    running time on a link may recover ``RUN_RECOVERY`` when late but never
+    arrives ahead of plan. ``initial`` starts from live conditions instead
+    of an empty, on-time network.
+    """
+    lists = network.as_lists()
+    arr_p: List[float] = lists["arr"]
+    dep_p: List[float] = lists["dep"]
+    run_p: List[float] = lists["run"]
+    stop_platform: List[int] = lists["stop_platform"]
+    stop_link: List[int] = lists["stop_link"]
+    stop_train: List[int] = lists["stop_train"]
+    priority: List[int] = lists["train_priority"]
+    if initial is not None and initial.train_priority is not None:
+        priority = initial.train_priority.tolist()
+
+    n = network.n_stops
+    extra: List[float] = effects.extra_dwell.tolist() if effects is not None else [0.0] * n
+    closures = effects.closures if effects is not None else {}
+    slow = effects.slow if effects is not None else {}
+
+    act_arr = arr_p[:]
+    act_dep = dep_p[:]
+    run_factor = [1.0] * n
+    holder = [-1] * len(network.platform_keys)
+    queues: Dict[int, List[Tuple[int, float, int]]] = {}
+    link_free = [float("-inf")] * len(network.link_keys)
+    waits = 0
+    departed: List[int] = []
+
+    first_stops: List[int] = lists["first_stops"]
+    if initial is None:
+        heap: List[Tuple[float, int, int, int]] = [(arr_p[k], k, ARRIVE, k) for k in first_stops]
+    else:
+        late = initial.train_delay_s.tolist()
+        heap = [(arr_p[k] + late[stop_train[k]], k, ARRIVE, k) for k in first_stops]
+        # Platforms held by trains outside the horizon; -2 marks such a holder until its RELEASE
+        for p in np.flatnonzero(np.isfinite(initial.platform_busy_until)).tolist():
+            holder[p] = -2
+            heap.append((float(initial.platform_busy_until[p]), n + p, RELEASE, p))
+    heapq.heapify(heap)
+    seq = n + len(holder)
+    push, pop = heapq.heappush, heapq.heappop
+
+    def ready_at(k: int, t: float) -> float:
+        dwell = min(dep_p[k] - arr_p[k], min_dwell_s)
+        return max(dep_p[k], t + dwell) + extra[k]
+
+    def release(p: int, t: float) -> None:
+        nonlocal seq
+        q = queues.get(p)
+        if q:
+            _pr, _tq, k2 = pop(q)
+            holder[p] = k2
+            act_arr[k2] = t
+            seq += 1
+            push(heap, (ready_at(k2, t), seq, READY, k2))
+        else:
+            holder[p] = -1
+
+    while heap:
+        t, _s, kind, k = pop(heap)
+        seq += 1
+        if kind == ARRIVE:
+            p = stop_platform[k]
+            if p >= 0:
+                # -1 is free; a stop index or -2 (held by the live state) is occupied
+                if holder[p] != -1:
+                    waits += 1
+                    push(queues.setdefault(p, []), (priority[stop_train[k]], t, k))
+                    continue
+                holder[p] = k
+            act_arr[k] = t
+            push(heap, (ready_at(k, t), seq, READY, k))
+        elif kind == READY:
+            l = stop_link[k]
+            td = t
+            if l >= 0:
+                # Closures and the headway reservation can push each other out; settle both
+                moved = True
+                while moved:
+                    moved = False
+                    for a, b in closures.get(l, ()):
+                        if a <= td < b:
+                            td, moved = b, True
+                    if td < link_free[l]:
+                        td, moved = link_free[l], True
+                rf = hf = 1.0
+                for a, b, r, h in slow.get(l, ()):
+                    if a <= td < b:
+                        rf, hf = rf * r, hf * h
+                run_factor[k] = rf
+                link_free[l] = td + headway_s * hf
+            push(heap, (td, seq, DEPART, k))
+        elif kind == DEPART:
+            act_dep[k] = t
+            departed.append(k)
+            p = stop_platform[k]
+            if p >= 0 and holder[p] == k:
+                release(p, t)
+            if stop_link[k] >= 0:
+                nxt = k + 1
+                run = run_p[k] * run_factor[k]
+                if t > dep_p[k]:
+                    run *= 1.0 - RUN_RECOVERY
+                seq += 1
+                push(heap, (max(t + run, arr_p[nxt]), seq, ARRIVE, nxt))
+        else:
+            # RELEASE: k is a platform freed by a train outside the horizon
+            if holder[k] == -2:
+                release(k, t)
+
+    return SimRun(arr=np.array(act_arr), dep=np.array(act_dep), platform_waits=waits, order=np.array(departed, dtype=np.int64))
+
+
+class BatchRun(NamedTuple):
+    arr: np.ndarray  # [S, G]
+    dep: np.ndarray  # [S, G]
+    platform_waits: np.ndarray  # [G]
+
+
+def stack_effects(variants: List[Effects]) -> Effects:
+    """Stack G compiled variants of the same scenario into one batched Effects.
+
+    Variants must differ only in numbers (severity, duration), so each link
+    has the same windows in the same order; window bounds and factors
+    become [G] arrays and ``extra_dwell`` becomes [G, S].
+    """
+    first = variants[0]
+
+    def stack(windows_by_variant: List[List[Tuple[float, ...]]]) -> List[Tuple[np.ndarray, ...]]:
+        return [tuple(np.array(col) for col in zip(*per_window)) for per_window in zip(*windows_by_variant)]
+
+    return Effects(
+        extra_dwell=np.stack([v.extra_dwell for v in variants]),
+        closures={l: stack([v.closures[l] for v in variants]) for l in first.closures},
+        slow={l: stack([v.slow[l] for v in variants]) for l in first.slow},
+    )
+
+
+def simulate_batch(
+    network: Network,
+    baseline: SimRun,
+    effects: Effects,
+    headway_s: float = DEFAULT_HEADWAY_S,
+    min_dwell_s: float = MIN_DWELL_S,
+    initial: InitialState | None = None,
+) -> BatchRun:
+    """Propagate G variants of the timetable in lockstep, one vector op per stop and rule.
+
+    ``effects`` comes from ``stack_effects`` (extra dwell [G, S], window
+    bounds and factors [G]). Trains keep the order in which the baseline run
+    used each platform and link (max-plus delay propagation), so every stop
+    is evaluated once, in the baseline's departure order, against
+    per-resource "free at" vectors of shape [G]. Dwell, headway, closure and
+    recovery rules match ``simulate``; re-sequencing at contested resources
+    is not modelled, so use it to compare variants rather than as a
+    replacement for a full run. ``baseline`` must have been run from the
+    same ``initial`` state; its priorities are implied by that order.
+    """
+    lists = network.as_lists()
+    arr_p: List[float] = lists["arr"]
+    dep_p: List[float] = lists["dep"]
+    run_p: List[float] = lists["run"]
+    stop_platform: List[int] = lists["stop_platform"]
+    stop_link: List[int] = lists["stop_link"]
+
+    extra = np.ascontiguousarray(np.atleast_2d(effects.extra_dwell).T)  # [S, G], a row per stop
+    n_stops, variants = extra.shape
+    arr = np.empty((n_stops, variants))
+    dep = np.empty((n_stops, variants))
+    waits = np.zeros(variants, dtype=np.int64)
+    # A train's first stop arrives as planned; later arrivals are written by the previous departure
+    first = lists["first_stops"]
+    arr[first] = network.arr[first, None]
+    platform_free: Dict[int, np.ndarray] = {}
+    if initial is not None:
+        arr[first] += initial.train_delay_s[network.stop_train[first], None]
+        for p in np.flatnonzero(np.isfinite(initial.platform_busy_until)).tolist():
+            platform_free[p] = np.full(variants, initial.platform_busy_until[p])
+    link_free: Dict[int, np.ndarray] = {}
+    maximum, where = np.maximum, np.where
+
+    for k in baseline.order.tolist():
+        a = arr[k]
+        p = stop_platform[k]
+        if p >= 0:
+            free = platform_free.get(p)
+            if free is not None:
+                waits += free > a
+                a = maximum(a, free)
+                arr[k] = a
+        dwell = min(dep_p[k] - arr_p[k], min_dwell_s)
+        d = maximum(a + dwell, dep_p[k]) + extra[k]
+        l = stop_link[k]
+        if l >= 0:
+            windows = effects.closures.get(l, ())
+            lf = link_free.get(l)
+            for _ in range(2):
+                for a0, b0 in windows:
+                    d = where((d >= a0) & (d < b0), b0, d)
+                if lf is not None:
+                    d = maximum(d, lf)
+            rf = hf = 1.0
+            for a0, b0, r, h in effects.slow.get(l, ()):
+                inside = (d >= a0) & (d < b0)
+                rf = rf * where(inside, r, 1.0)
+                hf = hf * where(inside, h, 1.0)
+            link_free[l] = d + headway_s * hf
+            run = run_p[k] * rf * where(d > dep_p[k], 1.0 - RUN_RECOVERY, 1.0)
+            arr[k + 1] = maximum(d + run, arr_p[k + 1])
+        dep[k] = d
+        if p >= 0:
+            platform_free[p] = d
+    return BatchRun(arr=arr, dep=dep, platform_waits=waits)
+
+
+def train_delays(network: Network, baseline: SimRun, run: SimRun) -> np.ndarray:
+    """Per-train delay (minutes, >= 0) at the last stop inside the horizon, relative to the baseline run."""
+    if network.n_trains == 0:
+        return np.zeros(0)
+    last = network.train_indptr[1:] - 1
+    return np.maximum(0.0, run.arr[last] - baseline.arr[last]) / 60.0
+
+
+def missed_connections(network: Network, baseline: SimRun, run: SimRun, min_transfer_s: float) -> int:
+    """Planned connections that hold in the baseline but break in this run."""
+    if not len(network.connections):
+        return 0
+    a, d = network.connections[:, 0], network.connections[:, 1]
+    ok_base = baseline.arr[a] + min_transfer_s <= baseline.dep[d]
+    ok_run = run.arr[a] + min_transfer_s <= run.dep[d]
+    return int(np.count_nonzero(ok_base & ~ok_run))
+
+
+def batch_train_delays(network: Network, baseline: SimRun, batch: BatchRun) -> np.ndarray:
+    """``train_delays`` for every variant of a batch, as [G, T] minutes."""
+    if network.n_trains == 0:
+        return np.zeros((batch.arr.shape[1], 0))
+    last = network.train_indptr[1:] - 1
+    return (np.maximum(0.0, batch.arr[last] - baseline.arr[last, None]) / 60.0).T
+
+
+def batch_missed_connections(network: Network, baseline: SimRun, batch: BatchRun, min_transfer_s: float) -> np.ndarray:
+    """``missed_connections`` for every variant of a batch, as [G] counts."""
+    if not len(network.connections):
+        return np.zeros(batch.arr.shape[1], dtype=np.int64)
+    a, d = network.connections[:, 0], network.connections[:, 1]
+    ok_base = baseline.arr[a] + min_transfer_s <= baseline.dep[d]
+    broken = (batch.arr[a] + min_transfer_s > batch.dep[d]) & ok_base[:, None]
+    return broken.sum(axis=0)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from app.core.config import settings
+
+from .montecarlo import SimulationCancelled
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINISHED = {COMPLETED, FAILED, CANCELLED}
+# Finished jobs kept for status lookups before the oldest are dropped
+MAX_FINISHED_JOBS = 200
+
+
+@dataclass
+class SimulationJob:
+    id: str
+    scenario: Dict[str, Any]
+    replications: int
+    status: str = QUEUED
+    replications_done: int = 0
+    partial: Dict[str, Any] | None = None
+    result_id: str | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    # Bumped on every change so watchers only send updates
+    version: int = 0
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: Future | None = field(default=None, repr=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.scenario.get("name"),
+            "status": self.status,
+            "progress": round(self.replications_done / self.replications, 3) if self.replications else 0.0,
+            "replications": self.replications,
+            "replications_done": self.replications_done,
+            "partial": self.partial,
+            "result_id": self.result_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "version": self.version,
+        }
+
+
+class JobManager:
+    """Runs simulations in the background, at most ``max_concurrent`` at a time.
+
+    Submissions beyond the limit wait in the executor queue, so heavy
+    what-ifs never take more than their share of threads from interactive
+    requests; replication chunks themselves run in the shared process pool.
+    Job state lives in this process. Finished results go to the simulation
+    store, so ``result_id`` resolves from any worker.
+    """
+
+    def __init__(self, max_concurrent: int) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, SimulationJob] = {}
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="sim-job")
+            return self._executor
+
+    def submit(self, scenario: Dict[str, Any]) -> SimulationJob:
+        job = SimulationJob(
+            id=f"job-{uuid.uuid4().hex}",
+            scenario=scenario,
+            replications=max(1, int(scenario.get("replications") or 1)),
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._get_executor().submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> SimulationJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def recent(self) -> List[SimulationJob]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> SimulationJob | None:
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        job.cancel_event.set()
+        # A queued job never starts; a running one stops after its current chunk
+        if job.future is not None and job.future.cancel():
+            self._update(job, status=CANCELLED, finished_at=time.time())
+        return job
+
+    def _update(self, job: SimulationJob, **changes: Any) -> None:
+        with self._lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.version += 1
+
+    def _prune(self) -> None:
+        finished = sorted((j for j in self._jobs.values() if j.status in FINISHED), key=lambda j: j.created_at)
+        for job in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+    def _run(self, job: SimulationJob) -> None:
+        from app.services.simulator import simulator_service
+
+        if job.cancel_event.is_set():
+            self._update(job, status=CANCELLED, finished_at=time.time())
+            return
+        self._update(job, status=RUNNING, started_at=time.time())
+
+        def progress(done: int, total: int, partial: Dict[str, Any] | None) -> None:
+            self._update(job, replications_done=done, partial=partial)
+
+        try:
+            result = simulator_service.run(job.scenario, progress=progress, cancel=job.cancel_event)
+        except SimulationCancelled:
+            self._update(job, status=CANCELLED, finished_at=time.time())
+        except Exception as e:
+            self._update(job, status=FAILED, error=str(e), finished_at=time.time())
+        else:
+            self._update(
+                job,
+                status=COMPLETED,
+                replications_done=job.replications,
+                result_id=result["id"],
+                finished_at=time.time(),
+            )
+
+
+job_manager = JobManager(settings.SIM_MAX_CONCURRENT_JOBS)
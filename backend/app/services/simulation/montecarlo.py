@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Deque, Dict, Iterator, List
+
+import numpy as np
+
+from .engine import InitialState, SimRun, compile_disruptions, missed_connections, simulate, train_delays
+from .network import MIN_TRANSFER_S, Network
+
+# Replications per pool task; large enough to amortize shipping the network
+CHUNK_SIZE = 100
+# Disruption types that draw from the rng; without them every replication is identical
+STOCHASTIC_TYPES = {"delay", "rolling_stock"}
+
+
+def scenario_seed(scenario: Dict[str, Any]) -> int:
+    """Stable default seed from the canonical disruptions, so repeated runs agree."""
+    canonical = json.dumps(
+        scenario.get("disruptions", []),
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return int(hashlib.sha256(canonical.encode()).hexdigest()[:8], 16)
+
+
+def replication_rng(seed: int, replication: int) -> np.random.Generator:
+    # Independent stream per (seed, replication), the same whichever worker runs it
+    return np.random.default_rng([seed, replication])
+
+
+def run_replication(
+    network: Network,
+    disruptions: List[Dict[str, Any]],
+    seed: int,
+    replication: int,
+    initial: InitialState | None = None,
+) -> SimRun:
+    effects = compile_disruptions(network, disruptions, replication_rng(seed, replication))
+    return simulate(network, effects, initial=initial)
+
+
+def _run_chunk(
+    network: Network,
+    baseline: SimRun,
+    disruptions: List[Dict[str, Any]],
+    seed: int,
+    start: int,
+    stop: int,
+    initial: InitialState | None = None,
+) -> Dict[str, np.ndarray]:
+    # Runs in a pool worker; returns compact per-replication measures only
+    delays = np.empty((stop - start, network.n_trains), dtype=np.float32)
+    missed = np.empty(stop - start, dtype=np.int64)
+    waits = np.empty(stop - start, dtype=np.int64)
+    departures = np.empty(stop - start, dtype=np.int64)
+    for row, r in enumerate(range(start, stop)):
+        run = run_replication(network, disruptions, seed, r, initial)
+        delays[row] = train_delays(network, baseline, run)
+        missed[row] = missed_connections(network, baseline, run, MIN_TRANSFER_S)
+        waits[row] = run.platform_waits
+        departures[row] = np.count_nonzero(run.dep <= network.horizon_s)
+    return {"train_delays": delays, "missed_connections": missed, "platform_waits": waits, "departures": departures}
+
+
+class SimulationCancelled(Exception):
+    """Raised between chunks once the caller's cancel event is set."""
+
+
+def iter_replications(
+    network: Network,
+    baseline: SimRun,
+    disruptions: List[Dict[str, Any]],
+    seed: int,
+    replications: int,
+    chunk_size: int = CHUNK_SIZE,
+    cancel: threading.Event | None = None,
+    initial: InitialState | None = None,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield per-replication measures chunk by chunk, in replication order.
+
+    Each chunk holds ``train_delays`` [r, T] (minutes) and
+    ``missed_connections``, ``platform_waits``, ``departures`` [r]. With more
+    than one chunk they run in the shared process pool, at most one per
+    worker in flight at a time; those still pending are cancelled when the
+    consumer stops early or ``cancel`` is set. A scenario without stochastic disruptions is simulated once and
+    repeated. ``initial`` is the live state every replication starts from
+    (``baseline`` must come from the same state).
+    """
+    replications = max(1, int(replications))
+    if not any(d.get("type", "delay") in STOCHASTIC_TYPES for d in disruptions):
+        one = _run_chunk(network, baseline, disruptions, seed, 0, 1, initial)
+        yield {k: np.repeat(v, replications, axis=0) for k, v in one.items()}
+        return
+
+    from app.services.workers import get_process_pool, pool_size, reset_process_pool
+
+    bounds = [(lo, min(lo + chunk_size, replications)) for lo in range(0, replications, chunk_size)]
+    # At most one chunk per worker in flight, the next submitted as each is consumed: the
+    # pool is FIFO and shared with interactive runs, which would otherwise queue behind
+    # the whole job, and cancelling only ever has this window left to drop
+    window = min(pool_size(), len(bounds)) if len(bounds) > 1 else 0
+    pool = None
+    futures: Deque[Future] = deque()
+
+    def submit(i: int) -> None:
+        nonlocal pool
+        if pool is None or i >= len(bounds):
+            return
+        try:
+            futures.append(pool.submit(_run_chunk, network, baseline, disruptions, seed, *bounds[i], initial))
+        except BrokenProcessPool:
+            drop()
+
+    def drop() -> None:
+        nonlocal pool
+        reset_process_pool()
+        pool = None
+        for fut in futures:
+            fut.cancel()
+        futures.clear()
+
+    if window:
+        try:
+            pool = get_process_pool()
+        except BrokenProcessPool:
+            reset_process_pool()
+        for i in range(window):
+            submit(i)
+    try:
+        for i, (lo, hi) in enumerate(bounds):
+            if cancel is not None and cancel.is_set():
+                raise SimulationCancelled()
+            part = None
+            if futures:
+                try:
+                    part = futures.popleft().result()
+                    submit(i + window)
+                except BrokenProcessPool:
+                    drop()
+            yield part if part is not None else _run_chunk(network, baseline, disruptions, seed, lo, hi, initial)
+    finally:
+        for fut in futures:
+            fut.cancel()
+
+
+def run_replications(
+    network: Network,
+    baseline: SimRun,
+    disruptions: List[Dict[str, Any]],
+    seed: int,
+    replications: int,
+    chunk_size: int = CHUNK_SIZE,
+    initial: InitialState | None = None,
+) -> Dict[str, np.ndarray]:
+    """All replications of ``iter_replications`` concatenated along the first axis."""
+    parts = list(iter_replications(network, baseline, disruptions, seed, replications, chunk_size, initial=initial))
+    return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+
+
+def summarize(values: np.ndarray) -> Dict[str, Any]:
+    """Mean and p50/p90/p99 of a sample (along the first axis)."""
+    p50, p90, p99 = np.percentile(values, [50, 90, 99], axis=0)
+    return {"mean": np.mean(values, axis=0), "p50": p50, "p90": p90, "p99": p99}
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.db.models import Station, Train, TrainSchedule
+
+DEFAULT_DWELL_S = 60.0
+MIN_RUN_S = 30.0
+# Connections: a passenger arriving on one train can make a departure at the
+# same station leaving between MIN_TRANSFER_S and MAX_TRANSFER_S later
+MIN_TRANSFER_S = 5 * 60.0
+MAX_TRANSFER_S = 15 * 60.0
+MAX_CONNECTIONS_PER_ARRIVAL = 3
+# Lower value wins a contested platform
+CLASS_PRIORITY = {"express": 0, "local": 1, "freight": 2}
+
+
+def _epoch(ts: datetime | None) -> float | None:
+    if ts is None:
+        return None
+    # SQLite returns naive datetimes (stored as UTC), Postgres aware ones
+    return (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp()
+
+
+@dataclass
+class Network:
+    """Compact, array-backed timetable of every stop inside the horizon.
+
+    Stops are flat arrays sorted by (train, planned time); times are seconds
+    relative to ``t0`` (epoch seconds). ``stop_link`` is the directional
+    link from a stop to the train's next stop (-1 at its last stop), and
+    ``run`` the planned running time on it. Resources are small integer ids
+    so the engine never touches strings or ORM objects.
+    """
+
+    t0: float
+    horizon_s: float
+    train_ids: List[str]
+    station_ids: List[str]
+    station_section: List[str | None]
+    platform_keys: List[Tuple[int, str]]
+    link_keys: List[Tuple[int, int]]
+    train_priority: np.ndarray
+    train_indptr: np.ndarray
+    stop_train: np.ndarray
+    stop_station: np.ndarray
+    stop_platform: np.ndarray
+    stop_link: np.ndarray
+    arr: np.ndarray
+    dep: np.ndarray
+    run: np.ndarray
+    connections: np.ndarray
+    _lists: Dict[str, list] = field(default_factory=dict, repr=False, compare=False)
+
+    def __getstate__(self) -> Dict[str, object]:
+        # Ship only the arrays to pool workers; the list views are rebuilt on demand
+        state = dict(self.__dict__)
+        state["_lists"] = {}
+        return state
+
+    @property
+    def n_stops(self) -> int:
+        return int(self.stop_train.shape[0])
+
+    @property
+    def n_trains(self) -> int:
+        return len(self.train_ids)
+
+    def as_lists(self) -> Dict[str, list]:
+        # Python lists index an order of magnitude faster than numpy scalars in the event loop
+        if not self._lists:
+            self._lists.update(
+                stop_train=self.stop_train.tolist(),
+                stop_platform=self.stop_platform.tolist(),
+                stop_link=self.stop_link.tolist(),
+                arr=self.arr.tolist(),
+                dep=self.dep.tolist(),
+                run=self.run.tolist(),
+                train_priority=self.train_priority.tolist(),
+                first_stops=self.train_indptr[:-1][np.diff(self.train_indptr) > 0].tolist(),
+            )
+        return self._lists
+
+    def stations_matching(self, section_id: str | None, station_id: str | None) -> np.ndarray:
+        """Boolean mask over stations addressed by a disruption (all when neither is given)."""
+        if station_id:
+            return np.array([s == station_id for s in self.station_ids], dtype=bool)
+        if section_id:
+            return np.array([s == section_id for s in self.station_section], dtype=bool)
+        return np.ones(len(self.station_ids), dtype=bool)
+
+
+def load_network(db: Session, start: datetime | None = None, horizon_minutes: int = 120) -> Network:
+    """Load trains, stations and the schedule stops inside [start, start + horizon].
+
+    One query per table; rows come back as plain tuples and are packed into
+    numpy arrays, so no ORM entities are built.
+    """
+    start = start or datetime.now(timezone.utc)
+    end = start + timedelta(minutes=horizon_minutes)
+    t0 = start.timestamp()
+
+    stations = db.execute(select(Station.id, Station.section_id)).all()
+    classes = dict(db.execute(select(Train.id, Train.class_type)).all())
+    rows = db.execute(
+        select(
+            TrainSchedule.train_id,
+            TrainSchedule.station_id,
+            TrainSchedule.planned_platform,
+            TrainSchedule.planned_arrival,
+            TrainSchedule.planned_departure,
+        ).where(
+            or_(
+                TrainSchedule.planned_arrival.between(start, end),
+                TrainSchedule.planned_departure.between(start, end),
+            )
+        )
+    ).all()
+
+    station_index: Dict[str, int] = {}
+    station_ids: List[str] = []
+    station_section: List[str | None] = []
+    for sid, section in stations:
+        station_index[sid] = len(station_ids)
+        station_ids.append(sid)
+        station_section.append(section)
+
+    train_index: Dict[str, int] = {}
+    platform_index: Dict[Tuple[int, str], int] = {}
+    n = len(rows)
+    s_train = np.empty(n, dtype=np.int32)
+    s_station = np.empty(n, dtype=np.int32)
+    s_platform = np.full(n, -1, dtype=np.int32)
+    s_arr = np.empty(n, dtype=np.float64)
+    s_dep = np.empty(n, dtype=np.float64)
+    for k, (train_id, station_id, platform, arr, dep) in enumerate(rows):
+        ti = train_index.setdefault(train_id, len(train_index))
+        si = station_index.get(station_id)
+        if si is None:
+            si = station_index[station_id] = len(station_ids)
+            station_ids.append(station_id)
+            station_section.append(None)
+        a, d = _epoch(arr), _epoch(dep)
+        if a is None:
+            a = d - DEFAULT_DWELL_S
+        if d is None:
+            d = a + DEFAULT_DWELL_S
+        s_train[k], s_station[k] = ti, si
+        s_arr[k], s_dep[k] = a - t0, max(a, d) - t0
+        if platform:
+            s_platform[k] = platform_index.setdefault((si, platform), len(platform_index))
+
+    order = np.lexsort((s_arr, s_train))
+    s_train, s_station, s_platform = s_train[order], s_station[order], s_platform[order]
+    s_arr, s_dep = s_arr[order], s_dep[order]
+
+    train_ids = list(train_index)
+    train_priority = np.array(
+        [CLASS_PRIORITY.get((classes.get(t) or "").lower(), 1) for t in train_ids], dtype=np.int8
+    )
+    train_indptr = np.zeros(len(train_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(s_train, minlength=len(train_ids)), out=train_indptr[1:])
+
+    # Directional links between consecutive stops of the same train
+    has_next = np.zeros(n, dtype=bool)
+    if n > 1:
+        has_next[:-1] = s_train[:-1] == s_train[1:]
+    nxt = np.flatnonzero(has_next)
+    link_pairs = np.stack((s_station[nxt], s_station[nxt + 1]), axis=1)
+    uniq, inverse = np.unique(link_pairs, axis=0, return_inverse=True) if len(nxt) else (np.zeros((0, 2), dtype=np.int32), np.zeros(0, dtype=np.int64))
+    s_link = np.full(n, -1, dtype=np.int32)
+    s_link[nxt] = inverse.reshape(-1)
+    s_run = np.zeros(n, dtype=np.float64)
+    s_run[nxt] = np.maximum(MIN_RUN_S, s_arr[nxt + 1] - s_dep[nxt])
+
+    return Network(
+        t0=t0,
+        horizon_s=horizon_minutes * 60.0,
+        train_ids=train_ids,
+        station_ids=station_ids,
+        station_section=station_section,
+        platform_keys=list(platform_index),
+        link_keys=[(int(a), int(b)) for a, b in uniq],
+        train_priority=train_priority,
+        train_indptr=train_indptr,
+        stop_train=s_train,
+        stop_station=s_station,
+        stop_platform=s_platform,
+        stop_link=s_link,
+        arr=s_arr,
+        dep=s_dep,
+        run=s_run,
+        connections=_connections(s_train, s_station, s_arr, s_dep),
+    )
+
+
+def _connections(s_train: np.ndarray, s_station: np.ndarray, s_arr: np.ndarray, s_dep: np.ndarray) -> np.ndarray:
+    """(arriving stop, departing stop) pairs of planned connections as int64 [C, 2].
+
+    Per station, departures are sorted once and each arrival takes the first
+    few other-train departures inside the transfer window (searchsorted).
+    """
+    pairs: List[np.ndarray] = []
+    by_station = np.argsort(s_station, kind="stable")
+    bounds = np.flatnonzero(np.diff(s_station[by_station])) + 1
+    for group in np.split(by_station, bounds):
+        if len(group) < 2:
+            continue
+        deps = group[np.argsort(s_dep[group])]
+        dep_t = s_dep[deps]
+        lo = np.searchsorted(dep_t, s_arr[group] + MIN_TRANSFER_S, side="left")
+        hi = np.searchsorted(dep_t, s_arr[group] + MAX_TRANSFER_S, side="right")
+        for off in range(MAX_CONNECTIONS_PER_ARRIVAL):
+            ok = lo + off < hi
+            a = group[ok]
+            d = deps[(lo + off)[ok]]
+            keep = s_train[a] != s_train[d]
+            pairs.append(np.stack((a[keep], d[keep]), axis=1))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.concatenate(pairs).astype(np.int64)
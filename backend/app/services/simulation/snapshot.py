@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from app.db.models import TrainLog
+
+from .engine import InitialState, SimRun, simulate
+from .network import DEFAULT_DWELL_S, Network, load_network
+
+
+@dataclass(frozen=True)
+class LiveStateSnapshot:
+    """The timetable plus the network's live state at ``taken_at``, captured once.
+
+    ``train_delay_s`` is aligned with ``network.train_ids``,
+    ``platform_busy_until`` with ``network.platform_keys``. Every array is read-only: simulations take a
+    ``fork()`` and only the arrays a fork writes to are copied, so any
+    number of concurrent what-ifs share one capture. ``baseline`` is the
+    undisrupted run from this state, which scenario delays are measured
+    against.
+    """
+
+    network: Network
+    baseline: SimRun
+    taken_at: float
+    train_delay_s: np.ndarray
+    platform_busy_until: np.ndarray
+
+    def __post_init__(self) -> None:
+        for a in (self.train_delay_s, self.platform_busy_until):
+            a.setflags(write=False)
+
+    @property
+    def train_priority(self) -> np.ndarray:
+        return self.network.train_priority
+
+    def initial_state(self) -> InitialState:
+        return InitialState(self.train_delay_s, self.platform_busy_until)
+
+    def fork(self) -> "StateFork":
+        return StateFork(self)
+
+    def summary(self) -> Dict[str, float]:
+        late = self.train_delay_s > 0
+        return {
+            "taken_at": self.taken_at,
+            "delayed_trains": int(np.count_nonzero(late)),
+            "mean_delay_minutes": round(float(self.train_delay_s[late].mean() / 60.0), 1) if late.any() else 0.0,
+            "occupied_platforms": int(np.count_nonzero(np.isfinite(self.platform_busy_until))),
+        }
+
+
+class StateFork:
+    """A what-if's private view of a snapshot, copy-on-write.
+
+    Reads go to the snapshot's arrays until the fork first changes one;
+    only that array is then copied, so untouched forks cost nothing.
+    """
+
+    def __init__(self, snapshot: LiveStateSnapshot) -> None:
+        self.snapshot = snapshot
+        self._own: Dict[str, np.ndarray] = {}
+
+    @property
+    def network(self) -> Network:
+        return self.snapshot.network
+
+    @property
+    def baseline(self) -> SimRun:
+        return self.snapshot.baseline
+
+    @property
+    def copied(self) -> List[str]:
+        return list(self._own)
+
+    def _read(self, name: str) -> np.ndarray:
+        own = self._own.get(name)
+        return own if own is not None else getattr(self.snapshot, name)
+
+    def _write(self, name: str) -> np.ndarray:
+        own = self._own.get(name)
+        if own is None:
+            own = self._own[name] = getattr(self.snapshot, name).copy()
+        return own
+
+    @property
+    def train_delay_s(self) -> np.ndarray:
+        return self._read("train_delay_s")
+
+    @property
+    def platform_busy_until(self) -> np.ndarray:
+        return self._read("platform_busy_until")
+
+    @property
+    def train_priority(self) -> np.ndarray:
+        return self._read("train_priority")
+
+    def delay_train(self, train: int, seconds: float) -> None:
+        self._write("train_delay_s")[train] += seconds
+
+    def occupy_platform(self, platform: int, until_s: float) -> None:
+        busy = self._write("platform_busy_until")
+        busy[platform] = max(busy[platform], until_s)
+
+    def give_precedence(self, train: int) -> None:
+        # Ahead of every class at contested platforms
+        self._write("train_priority")[train] = -1
+
+    def initial_state(self) -> InitialState:
+        priority = self._own.get("train_priority")
+        return InitialState(self.train_delay_s, self.platform_busy_until, priority)
+
+
+def _latest(db: Session, model: type, columns: list, since: datetime) -> list:
+    # Newest row per train inside the window: a grouped max joined back, one round trip
+    newest = (
+        select(model.train_id, func.max(model.timestamp).label("ts"))
+        .where(model.timestamp >= since)
+        .group_by(model.train_id)
+        .subquery()
+    )
+    return db.execute(
+        select(model.train_id, *columns, model.timestamp)
+        .join(newest, and_(model.train_id == newest.c.train_id, model.timestamp == newest.c.ts))
+        .order_by(model.id)
+    ).all()
+
+
+def take_snapshot(
+    db: Session,
+    start: datetime | None = None,
+    horizon_minutes: int = 120,
+    live_window_minutes: int = 30,
+) -> LiveStateSnapshot:
+    """Load the timetable and the live state (last ``live_window_minutes``) into a snapshot.
+
+    - delays: each train's latest logged ``delay_minutes`` (never negative)
+    - platforms: a train whose latest log is an arrival with a platform
+      holds it. If the train's first stop inside the horizon is at that
+      station the engine models the stay itself; otherwise the platform is
+      blocked for ``DEFAULT_DWELL_S``.
+
+    Raw positions are not modelled: stations carry no kilometre posts, so a
+    ``location_km`` cannot be turned into a distance or ETA to the next stop.
+    """
+    start = start or datetime.now(timezone.utc)
+    network = load_network(db, start, horizon_minutes)
+    since = start - timedelta(minutes=live_window_minutes)
+    train_index = {t: i for i, t in enumerate(network.train_ids)}
+    station_index = {s: i for i, s in enumerate(network.station_ids)}
+    platform_index = {key: p for p, key in enumerate(network.platform_keys)}
+
+    delay = np.zeros(network.n_trains)
+    busy = np.full(len(network.platform_keys), -np.inf)
+
+    first_station = network.stop_station[network.train_indptr[:-1].clip(max=max(0, network.n_stops - 1))]
+    columns = [TrainLog.station_id, TrainLog.event_type, TrainLog.delay_minutes, TrainLog.platform]
+    for train_id, station_id, event_type, delay_minutes, platform, _ts in _latest(db, TrainLog, columns, since):
+        i = train_index.get(train_id)
+        if i is not None:
+            delay[i] = max(0, delay_minutes or 0) * 60.0
+        si = station_index.get(station_id)
+        if event_type != "arrival" or not platform or si is None:
+            continue
+        p = platform_index.get((si, platform))
+        if p is None or (i is not None and first_station[i] == si):
+            continue
+        busy[p] = max(busy[p], DEFAULT_DWELL_S)
+
+    state = InitialState(delay, busy)
+    return LiveStateSnapshot(
+        network=network,
+        baseline=simulate(network, initial=state),
+        taken_at=start.timestamp(),
+        train_delay_s=delay,
+        platform_busy_until=busy,
+    )
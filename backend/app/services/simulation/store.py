@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.models import SimulationRecord
+
+
+def scenario_hash(scenario: Dict[str, Any], state_taken_at: float | None = None) -> str:
+    """Hash of the canonical scenario: everything that changes the result, not its name.
+
+    Disruption times are relative to the live state the run starts from, so
+    ``state_taken_at`` (the snapshot's capture time) is part of the key: a
+    result is only reused while runs still start from the same snapshot.
+    """
+    canonical = json.dumps(
+        {
+            "disruptions": scenario.get("disruptions", []),
+            "replications": int(scenario.get("replications") or 1),
+            "seed": scenario.get("seed"),
+            "state_taken_at": state_taken_at,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def encode_result(result: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(result, separators=(",", ":")).encode(), 6)
+
+
+def decode_result(payload: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(payload))
+
+
+@contextmanager
+def _session(db: Session | None) -> Iterator[Session]:
+    if db is not None:
+        yield db
+        return
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as session:
+        yield session
+
+
+class SimulationStore:
+    """Simulation results in the ``simulation_results`` table behind an in-memory LRU.
+
+    Payloads are zlib-compressed JSON. The LRU keeps recently used results
+    decoded; ``find`` serves an identical scenario (same ``scenario_hash``)
+    simulated less than ``ttl_s`` ago, checking this process first and then
+    the table, so other workers' results are reused too.
+    """
+
+    def __init__(self, capacity: int, ttl_s: float) -> None:
+        self.capacity = max(1, capacity)
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_hash: Dict[str, Tuple[float, str]] = {}
+
+    def _remember(self, simulation_id: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._lru[simulation_id] = result
+            self._lru.move_to_end(simulation_id)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+
+    def put(self, result: Dict[str, Any], key: str, name: str | None = None, db: Session | None = None) -> None:
+        with _session(db) as session:
+            session.add(SimulationRecord(id=result["id"], scenario_hash=key, name=name, payload=encode_result(result)))
+            session.commit()
+        self._remember(result["id"], result)
+        with self._lock:
+            self._by_hash[key] = (time.monotonic(), result["id"])
+
+    def get(self, simulation_id: str, db: Session | None = None) -> Dict[str, Any] | None:
+        with self._lock:
+            cached = self._lru.get(simulation_id)
+            if cached is not None:
+                self._lru.move_to_end(simulation_id)
+                return cached
+        with _session(db) as session:
+            payload = session.execute(select(SimulationRecord.payload).where(SimulationRecord.id == simulation_id)).scalar()
+        if payload is None:
+            return None
+        result = decode_result(payload)
+        self._remember(simulation_id, result)
+        return result
+
+    def find(self, key: str, db: Session | None = None) -> Dict[str, Any] | None:
+        """Latest result for this scenario hash if it is fresher than the TTL."""
+        if self.ttl_s <= 0:
+            return None
+        with self._lock:
+            hit = self._by_hash.get(key)
+        if hit is not None and time.monotonic() - hit[0] < self.ttl_s:
+            found = self.get(hit[1], db)
+            if found is not None:
+                return found
+        since = datetime.now(timezone.utc) - timedelta(seconds=self.ttl_s)
+        with _session(db) as session:
+            row = session.execute(
+                select(SimulationRecord.id, SimulationRecord.payload)
+                .where(SimulationRecord.scenario_hash == key)
+                .where(SimulationRecord.created_at >= since)
+                .order_by(SimulationRecord.created_at.desc())
+                .limit(1)
+            ).first()
+        if row is None:
+            return None
+        result = decode_result(row.payload)
+        self._remember(row.id, result)
+        return result
+
+    def mark_applied(self, simulation_id: str, db: Session | None = None) -> None:
+        with _session(db) as session:
+            record = session.get(SimulationRecord, simulation_id)
+            if record is not None:
+                record.applied_at = datetime.now(timezone.utc)
+                session.commit()
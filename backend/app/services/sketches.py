@@ -0,0 +1,171 @@
+import hashlib
+import math
+import struct
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+DEFAULT_COMPRESSION = 100
+# version, compression, count, min, max; then float32 means followed by float32 weights
+_HEADER = struct.Struct("<BHddd")
+_VERSION = 1
+
+
+class TDigest:
+	"""Mergeable quantile sketch (merging t-digest with the k1 scale function)
+
+	Holds at most about ``compression`` centroids however many values it has
+	seen, so a digest serializes to a few hundred bytes and merging digests
+	over any number of hours runs in constant memory. Tails are kept
+	sharpest: centroids near q=0 and q=1 stay small, which is where p95/p99
+	come from. Exact while the distinct values fit in the centroid budget,
+	which is the usual case for whole-minute delays.
+	"""
+
+	def __init__(self, compression: int = DEFAULT_COMPRESSION) -> None:
+		self.compression = compression
+		self.means = np.empty(0)
+		self.weights = np.empty(0)
+		self.min = math.inf
+		self.max = -math.inf
+		self._pending: List[tuple[np.ndarray, np.ndarray]] = []
+		self._pending_n = 0
+
+	@classmethod
+	def of(cls, values: Iterable[float], compression: int = DEFAULT_COMPRESSION) -> "TDigest":
+		digest = cls(compression)
+		digest.add(values)
+		return digest
+
+	@property
+	def count(self) -> float:
+		self._compress()
+		return float(self.weights.sum())
+
+	def add(self, values: Iterable[float]) -> None:
+		values = np.asarray(list(values) if not isinstance(values, np.ndarray) else values, dtype=float)
+		if len(values) == 0:
+			return
+		# Repeated values collapse to one weighted centroid before compression
+		means, weights = np.unique(values, return_counts=True)
+		self._push(means, weights.astype(float), float(means[0]), float(means[-1]))
+
+	def merge(self, other: "TDigest") -> None:
+		other._compress()
+		if len(other.means):
+			self._push(other.means, other.weights, other.min, other.max)
+
+	def _push(self, means: np.ndarray, weights: np.ndarray, lo: float, hi: float) -> None:
+		self.min, self.max = min(self.min, lo), max(self.max, hi)
+		self._pending.append((means, weights))
+		self._pending_n += len(means)
+		if self._pending_n > 10 * self.compression:
+			self._compress()
+
+	def _compress(self) -> None:
+		if not self._pending:
+			return
+		means = np.concatenate([self.means] + [m for m, _ in self._pending])
+		weights = np.concatenate([self.weights] + [w for _, w in self._pending])
+		self._pending, self._pending_n = [], 0
+		order = np.argsort(means, kind="stable")
+		means, weights = means[order], weights[order]
+		total = weights.sum()
+
+		def k(q: float) -> float:
+			return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+		out_m: List[float] = [float(means[0])]
+		out_w: List[float] = [float(weights[0])]
+		left = 0.0  # weight before the open centroid
+		k_left = k(0.0)
+		for m, w in zip(means[1:].tolist(), weights[1:].tolist()):
+			if k((left + out_w[-1] + w) / total) - k_left <= 1.0 or m == out_m[-1]:
+				merged = out_w[-1] + w
+				out_m[-1] += (m - out_m[-1]) * w / merged
+				out_w[-1] = merged
+			else:
+				left += out_w[-1]
+				k_left = k(left / total)
+				out_m.append(m)
+				out_w.append(w)
+		self.means, self.weights = np.array(out_m), np.array(out_w)
+
+	def quantile(self, q: float) -> float | None:
+		"""Estimated value at quantile ``q`` in [0, 1]; None when empty
+
+		Answers with the mean of the centroid covering rank ``q * count``
+		rather than interpolating between centroids, so whole-minute delays
+		come back as whole minutes.
+		"""
+		self._compress()
+		if len(self.means) == 0:
+			return None
+		if q <= 0:
+			return self.min
+		if q >= 1:
+			return self.max
+		i = int(np.searchsorted(np.cumsum(self.weights), q * self.weights.sum(), side="left"))
+		return float(self.means[min(i, len(self.means) - 1)])
+
+	def quantiles(self, qs: Iterable[float]) -> Dict[float, float | None]:
+		return {q: self.quantile(q) for q in qs}
+
+	def to_bytes(self) -> bytes:
+		self._compress()
+		header = _HEADER.pack(_VERSION, self.compression, float(self.weights.sum()), self.min, self.max)
+		return header + self.means.astype("<f4").tobytes() + self.weights.astype("<f4").tobytes()
+
+	@classmethod
+	def from_bytes(cls, payload: bytes) -> "TDigest":
+		version, compression, _count, lo, hi = _HEADER.unpack_from(payload)
+		if version != _VERSION:
+			raise ValueError(f"Unsupported t-digest encoding version {version}")
+		body = np.frombuffer(payload, dtype="<f4", offset=_HEADER.size)
+		n = len(body) // 2
+		digest = cls(compression)
+		digest.means, digest.weights = body[:n].astype(float), body[n:].astype(float)
+		digest.min, digest.max = lo, hi
+		return digest
+
+
+def _hash64(item: str) -> int:
+	return int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "little")
+
+
+class HyperLogLog:
+	"""Distinct-count sketch: ``2**precision`` one-byte registers, about 1.04/sqrt(m) relative error
+
+	Merging is a register-wise max, so sketches of disjoint or overlapping
+	time buckets union exactly as the sets they stand for would.
+	"""
+
+	def __init__(self, precision: int = 12) -> None:
+		self.precision = precision
+		self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+	def add(self, item: str) -> None:
+		h = _hash64(item)
+		index = h >> (64 - self.precision)
+		rest = h & ((1 << (64 - self.precision)) - 1)
+		rank = (64 - self.precision) - rest.bit_length() + 1
+		if rank > self.registers[index]:
+			self.registers[index] = rank
+
+	def update(self, items: Iterable[str]) -> None:
+		for item in items:
+			self.add(item)
+
+	def merge(self, other: "HyperLogLog") -> None:
+		np.maximum(self.registers, other.registers, out=self.registers)
+
+	def count(self) -> int:
+		m = len(self.registers)
+		alpha = 0.7213 / (1 + 1.079 / m)
+		estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+		zeros = int(np.count_nonzero(self.registers == 0))
+		if estimate <= 2.5 * m and zeros:
+			# Linear counting is far more accurate while many registers are still empty
+			estimate = m * math.log(m / zeros)
+		return int(round(estimate))
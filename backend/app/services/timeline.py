@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+
+def _spread(idx: np.ndarray, count: int) -> np.ndarray:
+	# ``count`` of ``idx`` evenly spaced, always including both ends
+	if count >= len(idx):
+		return idx
+	if count <= 1:
+		return idx[:count]
+	return idx[np.unique(np.linspace(0, len(idx) - 1, count).round().astype(int))]
+
+
+def downsample(times: Sequence[int | None], delays: Sequence[int | None], max_points: int | None, resolution_s: int | None) -> np.ndarray:
+	"""Indices of one train's movements worth drawing, in order
+
+	The first and last movements and every movement whose delay differs from
+	the one before are kept. Of the rest, at most one per ``resolution_s``
+	time bucket survives, and those are then thinned evenly so the train
+	stays within ``max_points``. Only when delay changes alone exceed
+	``max_points`` are they thinned too (still keeping both ends).
+	"""
+	n = len(times)
+	if n <= 2:
+		return np.arange(n)
+	d = np.array([-1 if v is None else v for v in delays])
+	must = np.zeros(n, dtype=bool)
+	must[0] = must[-1] = True
+	must[1:] |= d[1:] != d[:-1]
+	candidate = ~must
+	if resolution_s:
+		t = np.array([np.nan if v is None else v for v in times], dtype=float)
+		bucket = np.floor(t / resolution_s)
+		first_in_bucket = np.ones(n, dtype=bool)
+		# NaN never equals, so movements without a time each stay their own bucket
+		first_in_bucket[1:] = bucket[1:] != bucket[:-1]
+		candidate &= first_in_bucket
+	kept, extra = np.flatnonzero(must), np.flatnonzero(candidate)
+	if max_points:
+		if len(kept) >= max_points:
+			return _spread(kept, max_points)
+		extra = _spread(extra, max_points - len(kept))
+	return np.sort(np.concatenate([kept, extra]))
+
+
+def _dictionary(values: Sequence[Any]) -> tuple[List[Any], List[int]]:
+	"""Dictionary encoding: distinct values (None included) in first-seen order, and each value's code"""
+	distinct = list(dict.fromkeys(values))
+	index = {v: i for i, v in enumerate(distinct)}
+	return distinct, list(map(index.__getitem__, values))
+
+
+def columnar(train_ids: List[str], movements: List[List[Any]]) -> Dict[str, Any]:
+	"""Parallel arrays for movements grouped by train
+
+	``movements[i]`` holds train ``train_ids[i]``'s rows, each starting
+	(train_id, station_id, section_id, event_type, planned_time,
+	actual_time, delay_minutes, status, platform) with times already in
+	epoch seconds. Train i owns rows ``train_offsets[i]:train_offsets[i + 1]``;
+	text columns are codes into the matching ``*_values`` list.
+	"""
+	offsets = [0]
+	for rows in movements:
+		offsets.append(offsets[-1] + len(rows))
+	flat = [row for rows in movements for row in rows]
+	columns = list(zip(*flat)) if flat else [()] * 9
+	station, section, event, planned, actual, delay, status, platform = columns[1:9]
+	out: Dict[str, Any] = {"train_ids": train_ids, "train_offsets": offsets}
+	for name, values in (("station", station), ("section", section), ("event_type", event), ("status", status), ("platform", platform)):
+		out[f"{name}_values"], out[name] = _dictionary(values)
+	out["planned_time"] = list(planned)
+	out["actual_time"] = list(actual)
+	out["delay_minutes"] = list(delay)
+	return out
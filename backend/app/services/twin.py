@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Train, TrainPosition
+
+
+logger = logging.getLogger(__name__)
+
+# Line speed by train class (km/h) when no restriction applies
+CLASS_MAX_SPEED_KMPH = {"express": 130.0, "local": 100.0, "freight": 75.0}
+DEFAULT_MAX_SPEED_KMPH = 110.0
+# Roughly 0.5 m/s² traction and 0.7 m/s² service braking, in km/h per second
+ACCEL_KMPH_S = 1.8
+DECEL_KMPH_S = 2.5
+# A follower stays at least one block behind the train ahead in its section
+BLOCK_KM = 1.0
+# Reported positions further than this from the model are snapped to, nearer ones are blended in
+SNAP_KM = 2.0
+# Share of the remaining position error corrected per tick
+CORRECTION_RATE = 0.5
+
+# (train_id, section_id, location_km, speed_kmph, observed at epoch seconds)
+Observation = Tuple[str, str, float, float, float]
+
+
+class DigitalTwin:
+	"""Kinematic model of every train, held as struct-of-arrays numpy buffers
+
+	Row i of each buffer is train ``train_ids[i]``. ``tick(dt)`` advances all
+	trains in one vectorized step: speeds move towards the last reported
+	speed within acceleration and braking limits, capped by the class line
+	speed and any section speed restriction; trains then advance, but never
+	to within ``BLOCK_KM`` of the train ahead in the same section (locations
+	increase in the direction of travel). ``observe`` reconciles with ingested
+	positions by blending small errors in over a few ticks and snapping
+	large ones. Trains without a report for ``stale_after_s`` stop moving and
+	are left out of frames.
+	"""
+
+	def __init__(self, stale_after_s: float = 300.0, capacity: int = 1024) -> None:
+		self.stale_after_s = stale_after_s
+		self._lock = threading.Lock()
+		self.train_ids: List[str] = []
+		self._train_index: Dict[str, int] = {}
+		self.section_ids: List[str] = []
+		self._section_index: Dict[str, int] = {}
+		self._section_limit = np.full(16, np.inf)
+		self._alloc(capacity)
+		self.ticked_at: float | None = None
+
+	def _alloc(self, capacity: int) -> None:
+		old = getattr(self, "_buffers", None)
+		self._buffers = {
+			"section": np.zeros(capacity, dtype=np.int32),
+			"location_km": np.zeros(capacity),
+			"speed_kmph": np.zeros(capacity),
+			"target_speed_kmph": np.zeros(capacity),
+			"max_speed_kmph": np.full(capacity, DEFAULT_MAX_SPEED_KMPH),
+			"correction_km": np.zeros(capacity),
+			"observed_at": np.full(capacity, -np.inf),
+		}
+		if old is not None:
+			for name, buf in self._buffers.items():
+				buf[: len(old[name])] = old[name]
+		for name, buf in self._buffers.items():
+			setattr(self, name, buf)
+
+	def _train(self, train_id: str) -> int:
+		i = self._train_index.get(train_id)
+		if i is None:
+			i = self._train_index[train_id] = len(self.train_ids)
+			self.train_ids.append(train_id)
+			if i >= len(self.location_km):
+				self._alloc(2 * len(self.location_km))
+		return i
+
+	def _section(self, section_id: str) -> int:
+		s = self._section_index.get(section_id)
+		if s is None:
+			s = self._section_index[section_id] = len(self.section_ids)
+			self.section_ids.append(section_id)
+			if s >= len(self._section_limit):
+				self._section_limit = np.concatenate((self._section_limit, np.full(len(self._section_limit), np.inf)))
+		return s
+
+	@property
+	def size(self) -> int:
+		return len(self.train_ids)
+
+	def set_train_classes(self, classes: Dict[str, str | None]) -> None:
+		with self._lock:
+			for train_id, class_type in classes.items():
+				i = self._train_index.get(train_id)
+				if i is not None:
+					self.max_speed_kmph[i] = CLASS_MAX_SPEED_KMPH.get((class_type or "").lower(), DEFAULT_MAX_SPEED_KMPH)
+
+	def observe(self, observations: Iterable[Observation], now: float | None = None) -> int:
+		"""Reconcile the model with reported positions; returns how many were applied"""
+		now = time.time() if now is None else now
+		applied = 0
+		with self._lock:
+			for train_id, section_id, km, kmph, ts in observations:
+				i = self._train(train_id)
+				s = self._section(section_id)
+				ts = min(ts, now)
+				if ts < self.observed_at[i]:
+					continue
+				# Where the report puts the train now
+				expected = km + kmph * (now - ts) / 3600.0
+				error = expected - self.location_km[i]
+				if self.section[i] != s or not np.isfinite(self.observed_at[i]) or abs(error) > SNAP_KM:
+					self.section[i] = s
+					self.location_km[i] = expected
+					self.speed_kmph[i] = kmph
+					self.correction_km[i] = 0.0
+				else:
+					self.correction_km[i] = error
+				self.target_speed_kmph[i] = kmph
+				self.observed_at[i] = ts
+				applied += 1
+		return applied
+
+	def set_speed_restriction(self, section_id: str, max_speed_kmph: float | None) -> None:
+		with self._lock:
+			self._section_limit[self._section(section_id)] = np.inf if max_speed_kmph is None else max_speed_kmph
+
+	def speed_restrictions(self) -> Dict[str, float]:
+		with self._lock:
+			return {
+				sid: float(self._section_limit[s])
+				for s, sid in enumerate(self.section_ids)
+				if np.isfinite(self._section_limit[s])
+			}
+
+	def tick(self, dt: float, now: float | None = None) -> int:
+		"""Advance every live train by ``dt`` seconds; returns how many moved"""
+		now = time.time() if now is None else now
+		with self._lock:
+			n = len(self.train_ids)
+			live = np.flatnonzero(now - self.observed_at[:n] <= self.stale_after_s)
+			self.ticked_at = now
+			if not len(live) or dt <= 0:
+				return 0
+			section = self.section[live]
+			location = self.location_km[live]
+			speed = self.speed_kmph[live]
+
+			limit = np.minimum(self.max_speed_kmph[live], self._section_limit[section])
+			desired = np.minimum(self.target_speed_kmph[live], limit)
+			speed += np.clip(desired - speed, -DECEL_KMPH_S * dt, ACCEL_KMPH_S * dt)
+			# A restriction applies at once rather than after braking down to it
+			np.minimum(speed, limit, out=speed)
+			np.maximum(speed, 0.0, out=speed)
+			advance = speed * dt / 3600.0
+
+			# Block occupancy: sorted by (section, km), each train's leader is the next row
+			order = np.lexsort((location, section))
+			gap = np.full(len(live), np.inf)
+			same = section[order[1:]] == section[order[:-1]]
+			gap[order[:-1]] = np.where(same, location[order[1:]] - location[order[:-1]], np.inf)
+			room = np.maximum(0.0, gap - BLOCK_KM)
+			held = advance > room
+			advance = np.minimum(advance, room)
+			speed = np.where(held, np.minimum(speed, room * 3600.0 / dt), speed)
+
+			correction = self.correction_km[live]
+			self.location_km[live] = location + advance + CORRECTION_RATE * correction
+			self.correction_km[live] = (1.0 - CORRECTION_RATE) * correction
+			self.speed_kmph[live] = speed
+			return len(live)
+
+	def frame(self, now: float | None = None) -> Dict[str, Any]:
+		"""Live trains as columns, ready to publish"""
+		now = time.time() if now is None else now
+		with self._lock:
+			n = len(self.train_ids)
+			live = np.flatnonzero(now - self.observed_at[:n] <= self.stale_after_s)
+			return {
+				"type": "twin",
+				"ts": self.ticked_at or now,
+				"train_id": [self.train_ids[i] for i in live.tolist()],
+				"section_id": [self.section_ids[s] for s in self.section[live].tolist()],
+				"location_km": np.round(self.location_km[live], 3).tolist(),
+				"speed_kmph": np.round(self.speed_kmph[live], 1).tolist(),
+			}
+
+	def load(self, db: Session, now: float | None = None) -> int:
+		"""Seed from each train's latest stored position (within the stale window) and train classes"""
+		now = time.time() if now is None else now
+		since = datetime.fromtimestamp(now, tz=timezone.utc) - timedelta(seconds=self.stale_after_s)
+		newest = (
+			select(TrainPosition.train_id, func.max(TrainPosition.timestamp).label("ts"))
+			.where(TrainPosition.timestamp >= since)
+			.group_by(TrainPosition.train_id)
+			.subquery()
+		)
+		rows = db.execute(
+			select(
+				TrainPosition.train_id,
+				TrainPosition.section_id,
+				TrainPosition.location_km,
+				TrainPosition.speed_kmph,
+				TrainPosition.timestamp,
+			).join(newest, and_(TrainPosition.train_id == newest.c.train_id, TrainPosition.timestamp == newest.c.ts))
+		).all()
+		applied = self.observe(
+			((t, s, km, v, (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp()) for t, s, km, v, ts in rows),
+			now,
+		)
+		self.set_train_classes(dict(db.execute(select(Train.id, Train.class_type)).all()))
+		return applied
+
+
+async def run_twin_loop(twin: DigitalTwin, publish: Callable[[], Awaitable[None]], interval_s: float) -> None:
+	"""Tick the twin every ``interval_s`` (by wall clock, so a slow tick is caught up) and publish"""
+	from app.db.session import SessionLocal
+
+	def seed() -> int:
+		with SessionLocal() as db:
+			return twin.load(db)
+
+	try:
+		await asyncio.to_thread(seed)
+	except Exception:
+		logger.exception("Digital twin could not be seeded from stored positions")
+	last = time.time()
+	while True:
+		await asyncio.sleep(max(0.0, last + interval_s - time.time()))
+		now = time.time()
+		twin.tick(now - last, now)
+		last = now
+		try:
+			await publish()
+		except Exception:
+			logger.exception("Digital twin frame could not be published")
+
+
+digital_twin = DigitalTwin(stale_after_s=settings.TWIN_STALE_SECONDS)
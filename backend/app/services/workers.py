@@ -0,0 +1,56 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.config import settings
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def pool_size() -> int:
+	"""Worker processes the shared pool runs with."""
+	return settings.WORKER_POOL_SIZE or os.cpu_count() or 1
+
+
+def _warm_worker() -> None:
+	# Runs once in every worker as it starts: a spawned process otherwise pays for importing
+	# OR-Tools and torch inside its first task, which then misses any race deadline
+	import app.services.optimizers.hybrid  # noqa: F401  (MILP, CP-SAT, QUBO, GNN)
+	import app.services.simulation  # noqa: F401
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+	"""Process pool shared by CPU-bound work (optimizer ensembles, simulations).
+
+	Created lazily with the 'spawn' start method so workers never inherit the
+	web server's threads or open DB connections. Each worker imports the
+	solver stacks as it starts.
+	"""
+	global _pool
+	if _pool is None:
+		with _pool_lock:
+			if _pool is None:
+				_pool = ProcessPoolExecutor(
+					max_workers=pool_size(), mp_context=multiprocessing.get_context("spawn"), initializer=_warm_worker
+				)
+	return _pool
+
+
+def warm_process_pool() -> None:
+	"""Start every worker now (without waiting for them) instead of on the first CPU-bound request"""
+	pool = get_process_pool()
+	# Workers are spawned on demand, one per task submitted while none is idle
+	for _ in range(pool_size()):
+		pool.submit(int)
+
+
+def reset_process_pool() -> None:
+	"""Drop a broken pool; the next get_process_pool() starts a fresh one."""
+	global _pool
+	with _pool_lock:
+		if _pool is not None:
+			_pool.shutdown(wait=False, cancel_futures=True)
+			_pool = None
@@ -4,7 +4,7 @@ Migration script to add new columns to existing database tables
 """
 import sys
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, inspect, text
 
 # Add the app directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
@@ -66,6 +66,19 @@ def migrate_database():
             conn.execute(text("CREATE INDEX IF NOT EXISTS idx_train_logs_event_type ON train_logs (event_type)"))
             conn.execute(text("CREATE INDEX IF NOT EXISTS idx_train_logs_timestamp ON train_logs (timestamp)"))
             
+            # Indexes declared on the models (composite time-series ones included) for tables present here
+            print("Creating model indexes...")
+            from app.db.models import Base
+            inspector = inspect(conn)
+            for table in Base.metadata.sorted_tables:
+                if inspector.has_table(table.name):
+                    for index in table.indexes:
+                        index.create(conn, checkfirst=True)
+            # Single-column indexes the composite ones replace
+            from app.db.session import SUPERSEDED_INDEXES
+            for name in SUPERSEDED_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            
             conn.commit()
             print("Database migration completed successfully!")
             
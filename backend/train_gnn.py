@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Train the GNN precedence scorer from train_logs, train_schedules and overrides
+and export it as TorchScript for SimpleGnnScorer.
+
+Run from backend/:  python train_gnn.py [--epochs 50] [--output path/to/gnn_scorer.pt]
+"""
+import argparse
+import time
+
+import torch
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.optimizers.gnn_training import export_scorer, iter_training_graphs, train_scorer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--window-minutes", type=int, default=30, help="Window that forms one training graph")
+    parser.add_argument("--lookback-minutes", type=int, default=60, help="Delay history used for node features")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows fetched per DB round trip")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--lr", type=float, default=0.01)
+    parser.add_argument("--hidden", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (0 = torch default)")
+    parser.add_argument("--output", default=settings.GNN_MODEL_PATH)
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        graphs = list(iter_training_graphs(db, window_minutes=args.window_minutes, delay_lookback_minutes=args.lookback_minutes, chunk_size=args.chunk_size))
+    if not graphs:
+        print("No labelled windows found (need overrides or conflicting departures); nothing to train")
+        return
+    labelled = sum(int(g.labels.shape[0]) for g in graphs)
+    print(f"Streamed {len(graphs)} graphs with {labelled} labelled nodes in {time.perf_counter() - started:.1f}s")
+
+    model, loss = train_scorer(graphs, epochs=args.epochs, lr=args.lr, hidden=args.hidden)
+    export_scorer(model, args.output)
+    print(f"Trained for {args.epochs} epochs (loss {loss:.4f}); exported TorchScript model to {args.output}")
+
+
+if __name__ == "__main__":
+    main()